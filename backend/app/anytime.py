@@ -0,0 +1,106 @@
+"""
+Anytime inference: classify a long upload from its first windows.
+
+Windows are featurized in order, in chunks that start at ANYTIME_CHUNK_WINDOWS
+and double up to MAX_CHUNK_WINDOWS. After every window the pooled embedding
+(running mean of the per-window MFCC means, exactly what `featurize_upload`
+averages over the whole clip) is classified, and the run stops as soon as
+the top-1 minus top-2 probability margin has stayed at or above `margin`
+for `patience` consecutive windows. Decoding is bounded too: only the
+first `max_seconds` of the upload are decoded.
+
+Trimming, VAD and peak normalization see the decoded (budgeted) audio, so
+a clip that fits the budget and never becomes confident gets exactly the
+full-clip prediction.
+"""
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+from app.utils import batch_window_mfcc_means, prepare_windows
+
+# Upper bound for the doubling chunk size (windows featurized per batch)
+MAX_CHUNK_WINDOWS = 16
+
+
+def top_margin(probs: np.ndarray) -> np.ndarray:
+    """Top-1 minus top-2 probability for each row of (batch, classes)."""
+    top2 = np.sort(probs, axis=-1)[..., -2:]
+    return top2[..., 1] - top2[..., 0]
+
+
+def anytime_predict(y: np.ndarray, sr: int, service, fast: bool = None, margin: float = None,
+                    patience: int = None, chunk_windows: int = None, n_mfcc: int = 13,
+                    truncated: bool = False) -> dict:
+    """Featurize and classify windows in order until the posterior is confident.
+
+    `service` is a ModelService (anything with `predict_proba`). Pass
+    `truncated=True` if `y` was cut at the audio budget, so running out of
+    windows is reported as 'budget' rather than 'complete'.
+
+    Returns a dict with 'state', 'confidence', 'margin', 'features' (the
+    pooled embedding the answer came from), 'windows_used', 'num_windows',
+    'seconds_used', 'seconds_decoded' and 'stopped' ('confident', 'budget'
+    or 'complete').
+    """
+    from app.model_service import STATE_MAPPING
+    fast = settings.FAST_PREPROCESS if fast is None else fast
+    margin = settings.ANYTIME_MARGIN if margin is None else margin
+    patience = max(1, settings.ANYTIME_PATIENCE if patience is None else patience)
+    chunk_windows = max(1, chunk_windows or settings.ANYTIME_CHUNK_WINDOWS)
+
+    prepared = prepare_windows(y, sr, window_sec=1.0, fast=fast)
+    windows, ends = prepared['windows'], prepared['window_ends']
+
+    total = np.zeros(n_mfcc)
+    streak = 0
+    used = 0
+    stopped = None
+    features: Optional[np.ndarray] = None
+    probs = None
+    start = 0
+    while start < len(windows):
+        means = batch_window_mfcc_means(windows[start:start + chunk_windows], sr, n_mfcc=n_mfcc)
+        # Pooled embedding after each window of this chunk, classified as one batch
+        counts = start + np.arange(1, len(means) + 1)
+        pooled = (total + np.cumsum(means, axis=0)) / counts[:, np.newaxis]
+        chunk_probs = service.predict_proba(pooled)
+        if chunk_probs is None:
+            break
+        margins = top_margin(chunk_probs)
+        for j, m in enumerate(margins):
+            streak = streak + 1 if m >= margin else 0
+            used = start + j + 1
+            features, probs = pooled[j], chunk_probs[j]
+            if streak >= patience:
+                stopped = 'confident'
+                break
+        if stopped:
+            break
+        total += means.sum(axis=0)
+        start += len(means)
+        # Batched MFCC is much cheaper per window, so grow the chunks as the run goes on
+        chunk_windows = min(2 * chunk_windows, MAX_CHUNK_WINDOWS)
+
+    if probs is None:
+        state, confidence, best_margin = 'unknown', 0.0, 0.0
+    else:
+        idx = int(np.argmax(probs))
+        state = STATE_MAPPING[idx] if idx < len(STATE_MAPPING) else 'unknown'
+        confidence, best_margin = float(probs[idx]), float(top_margin(probs))
+    if stopped is None:
+        stopped = 'budget' if truncated else 'complete'
+    seconds_used = min(ends[used - 1], len(y)) / float(sr) if used else 0.0
+    return {
+        'state': state,
+        'confidence': confidence,
+        'margin': best_margin,
+        'features': features,
+        'windows_used': used,
+        'num_windows': prepared['num_windows'],
+        'seconds_used': round(seconds_used, 3),
+        'seconds_decoded': round(len(y) / float(sr), 3),
+        'stopped': stopped,
+        'vad': prepared['vad'],
+    }
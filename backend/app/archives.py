@@ -0,0 +1,74 @@
+"""
+Helpers for reading audio clips out of uploaded zip/tar archives.
+
+Members are yielded one at a time so a large archive never has to be
+fully extracted into memory, and a member whose uncompressed size is over
+the per-clip limit is never read at all (a small zip can expand to
+gigabytes): it is yielded as an UploadTooLarge instead of its bytes.
+"""
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Tuple, Union
+
+from app.uploads import UploadTooLarge
+
+AUDIO_EXTENSIONS = {'.wav', '.flac', '.ogg', '.oga', '.opus', '.mp3', '.webm', '.m4a', '.mp4'}
+
+
+def is_audio_name(name: str) -> bool:
+    base = os.path.basename(name)
+    if not base or base.startswith('.') or '__MACOSX' in name:
+        return False
+    return os.path.splitext(base)[1].lower() in AUDIO_EXTENSIONS
+
+
+def archive_kind(fileobj: BinaryIO, filename: str = '') -> str:
+    """Return 'zip', 'tar' or None for a seekable file object."""
+    pos = fileobj.tell()
+    try:
+        if zipfile.is_zipfile(fileobj):
+            return 'zip'
+        fileobj.seek(pos)
+        try:
+            with tarfile.open(fileobj=fileobj, mode='r:*'):
+                return 'tar'
+        except tarfile.TarError:
+            return None
+    finally:
+        fileobj.seek(pos)
+
+
+def _read_member(name: str, size: int, open_member, max_bytes: int) -> Union[bytes, UploadTooLarge]:
+    too_large = UploadTooLarge(f"{name} is {size / 2 ** 20:.1f} MB uncompressed; "
+                               f"the limit is {max_bytes / 2 ** 20:g} MB")
+    if max_bytes and size > max_bytes:
+        return too_large
+    with open_member() as f:
+        # The declared size is checked again against what actually decompresses
+        data = f.read(max_bytes + 1) if max_bytes else f.read()
+    return too_large if max_bytes and len(data) > max_bytes else data
+
+
+def iter_archive_members(fileobj: BinaryIO, kind: str,
+                         max_bytes: int = 0) -> Iterator[Tuple[str, Union[bytes, UploadTooLarge]]]:
+    """Yield (member name, bytes) for each audio file in the archive.
+
+    With `max_bytes`, members larger than that uncompressed are yielded as
+    (member name, UploadTooLarge) without being read.
+    """
+    if kind == 'zip':
+        with zipfile.ZipFile(fileobj) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and is_audio_name(info.filename):
+                    yield info.filename, _read_member(info.filename, info.file_size,
+                                                      lambda: zf.open(info), max_bytes)
+    elif kind == 'tar':
+        # Stream mode: members are read sequentially, no random access needed
+        with tarfile.open(fileobj=fileobj, mode='r|*') as tf:
+            for member in tf:
+                if member.isfile() and is_audio_name(member.name):
+                    yield member.name, _read_member(member.name, member.size,
+                                                    lambda: tf.extractfile(member), max_bytes)
+    else:
+        raise ValueError(f"Unsupported archive type: {kind}")
@@ -0,0 +1,135 @@
+"""
+Dynamic micro-batching in front of the model.
+
+Callers submit one feature vector at a time and get a
+`concurrent.futures.Future` back. A single worker thread collects pending
+vectors until either `max_batch_size` is reached or the oldest one has
+waited `max_wait_ms`, runs one batched forward pass and resolves each
+caller's future with its own (state, confidence).
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+_STOP = object()
+
+
+class BatchStats:
+    """Thread-safe counters for batch sizes and queue wait times."""
+
+    def __init__(self, max_samples: int = 1024):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = {}
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self._recent_waits = deque(maxlen=max_samples)
+
+    def record(self, batch_size: int, waits_ms: List[float]):
+        with self._lock:
+            self.batches += 1
+            self.requests += batch_size
+            self.batch_sizes[batch_size] = self.batch_sizes.get(batch_size, 0) + 1
+            self.wait_ms_total += sum(waits_ms)
+            self.wait_ms_max = max(self.wait_ms_max, max(waits_ms, default=0.0))
+            self._recent_waits.extend(waits_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = np.array(self._recent_waits) if self._recent_waits else np.zeros(1)
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+                'batch_size_counts': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': {
+                    'mean': self.wait_ms_total / self.requests if self.requests else 0.0,
+                    'max': self.wait_ms_max,
+                    'p50_recent': float(np.percentile(recent, 50)),
+                    'p95_recent': float(np.percentile(recent, 95)),
+                    'p99_recent': float(np.percentile(recent, 99)),
+                },
+            }
+
+
+class MicroBatcher:
+    """Collect concurrent single-item predictions into batched forward passes.
+
+    `predict_batch` receives a 2D array (batch, features) and must return one
+    (state, confidence) tuple per row.
+    """
+
+    def __init__(self, predict_batch: Callable[[np.ndarray], List[Tuple[str, float]]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.stats = BatchStats()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, features: np.ndarray) -> Future:
+        """Queue one feature vector; the returned future resolves to (state, confidence)."""
+        self.start()
+        fut = Future()
+        self._queue.put((np.asarray(features, dtype=np.float32), time.perf_counter(), fut))
+        return fut
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = item[1] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    nxt = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        # Vectors of different shapes cannot share a forward pass
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[0].shape, []).append(item)
+
+        for items in groups.values():
+            waits_ms = [1000.0 * (started - enqueued) for _, enqueued, _ in items]
+            try:
+                results = self.predict_batch(np.stack([features for features, _, _ in items]))
+            except Exception as e:
+                for _, _, fut in items:
+                    fut.set_exception(e)
+                continue
+            self.stats.record(len(items), waits_ms)
+            for (_, _, fut), result in zip(items, results):
+                fut.set_result(result)
@@ -0,0 +1,163 @@
+"""
+Offline bulk scoring of a directory of audio files.
+
+Usage (from backend/):
+    python -m app.bulk_score /data/recordings --out scores.jsonl
+    python -m app.bulk_score /data/recordings --out scores.csv --workers 8 --full
+
+Decode, preprocessing and inference are fanned out over a process pool
+(one model copy per worker). Results are appended to the output file as
+each clip finishes, and every completed file is recorded in a manifest
+(`<out>.manifest` by default) together with the model version, so an
+interrupted run picks up where it stopped. Re-running after the model
+changes scores everything again.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from app import pipeline
+from app.config import settings
+from app.datasets import find_audio
+
+RESULT_FIELDS = ['file', 'state', 'confidence', 'audio_seconds', 'num_windows', 'elapsed_ms', 'error']
+
+
+def score_file(path: str, fast: bool) -> dict:
+    """Worker job: score one file. Never raises; errors are reported in the row."""
+    started = time.perf_counter()
+    row = {'file': path}
+    try:
+        with open(path, 'rb') as f:
+            contents = f.read()
+        result = pipeline.predict_upload(contents, fast=fast)
+        row.update({
+            'state': result['state'],
+            'confidence': round(result['confidence'], 6),
+            'audio_seconds': round(result['audio_shape'][0] / float(result['sr']), 3),
+            'num_windows': result['num_windows'],
+        })
+    except Exception as e:
+        row['error'] = str(e)
+    row['elapsed_ms'] = int((time.perf_counter() - started) * 1000)
+    row['model_version'] = pipeline.get_model_service().model_version
+    return row
+
+
+def load_manifest(path: Path, model_version: str) -> set:
+    """Files already scored with this model version."""
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # partially written last line of an interrupted run
+            if entry.get('model_version') == model_version:
+                done.add(entry['file'])
+    return done
+
+
+class ResultWriter:
+    """Append-only JSONL or CSV writer, flushed after every row."""
+
+    def __init__(self, path: Path, fmt: str):
+        self.fmt = fmt
+        new_file = not path.exists() or path.stat().st_size == 0
+        self._f = open(path, 'a', encoding='utf-8', newline='')
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._f, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, row: dict):
+        if self.fmt == 'csv':
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps({k: row[k] for k in RESULT_FIELDS if k in row}) + '\n')
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a directory of audio files with the current model.')
+    parser.add_argument('input_dir', type=Path)
+    parser.add_argument('--out', type=Path, required=True, help='results file (.jsonl or .csv)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='default: from --out suffix')
+    parser.add_argument('--manifest', type=Path, help='default: <out>.manifest')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--full', action='store_true', help='use the full (slower) preprocessing pipeline')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.out.suffix.lower() == '.csv' else 'jsonl')
+    manifest_path = args.manifest or args.out.with_name(args.out.name + '.manifest')
+    fast = settings.FAST_PREPROCESS and not args.full
+
+    model_version = pipeline.get_model_service().model_version
+    done = load_manifest(manifest_path, model_version)
+    root = args.input_dir.resolve()
+    todo = [p for p in find_audio(root) if str(p.relative_to(root)) not in done]
+    print(f"[BULK] {len(done)} files already scored with model {model_version}, {len(todo)} to go")
+    if not todo:
+        return 0
+
+    writer = ResultWriter(args.out, fmt)
+    manifest = open(manifest_path, 'a', encoding='utf-8')
+    files_done = errors = 0
+    audio_seconds = 0.0
+    started = time.perf_counter()
+    max_in_flight = args.workers * 4
+    pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=pipeline.init_worker)
+    try:
+        queue = iter(todo)
+        pending = set()
+        while True:
+            for path in queue:
+                pending.add(pool.submit(score_file, str(path), fast))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                row = fut.result()
+                rel = str(Path(row['file']).relative_to(root))
+                row['file'] = rel
+                writer.write(row)
+                manifest.write(json.dumps({'file': rel, 'model_version': row['model_version']}) + '\n')
+                manifest.flush()
+                files_done += 1
+                if row.get('error'):
+                    errors += 1
+                else:
+                    audio_seconds += row['audio_seconds']
+                if files_done % 100 == 0:
+                    print(f"[BULK] {files_done}/{len(todo)} files")
+    except KeyboardInterrupt:
+        print("[BULK] Interrupted; re-run the same command to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        writer.close()
+        manifest.close()
+    pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print(f"[BULK] Scored {files_done} files ({errors} errors) in {elapsed:.1f}s: "
+          f"{files_done / elapsed:.2f} files/s, {audio_seconds / elapsed:.1f} audio-s/s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Content-addressed caches for repeated uploads.
+
+Keys start with the SHA-256 of the uploaded bytes. Three tiers, each with its
+own memory budget, TTL and LRU eviction:
+  - audio:       decoded + resampled waveform, keyed by (digest, sample rate)
+  - features:    feature vectors / preprocess summaries, keyed by (digest, mode)
+  - predictions: (state, confidence), keyed by (digest, mode, model version)
+
+Caches are per process: with EXECUTOR=process every worker keeps its own.
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import settings
+
+
+def content_digest(data: bytes) -> str:
+    """SHA-256 hex digest of the uploaded bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def estimate_size(value) -> int:
+    """Approximate memory footprint of a cached value in bytes."""
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by total byte size, with per-entry TTL."""
+
+    def __init__(self, name: str, max_bytes: int, ttl_seconds: float = 0):
+        self.name = name
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl_seconds)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires = entry
+            if expires and expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self._data:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self.current_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class PipelineCache:
+    """The three cache tiers used by app.pipeline."""
+
+    def __init__(self):
+        mb = 1024 * 1024
+        self.audio = LRUCache('audio', settings.CACHE_AUDIO_MB * mb, settings.CACHE_AUDIO_TTL)
+        self.features = LRUCache('features', settings.CACHE_FEATURES_MB * mb, settings.CACHE_FEATURES_TTL)
+        self.predictions = LRUCache('predictions', settings.CACHE_PREDICTIONS_MB * mb, settings.CACHE_PREDICTIONS_TTL)
+
+    def tiers(self):
+        return (self.audio, self.features, self.predictions)
+
+    def stats(self) -> dict:
+        return {tier.name: tier.stats() for tier in self.tiers()}
+
+    def clear(self):
+        for tier in self.tiers():
+            tier.clear()
@@ -6,8 +6,89 @@ class Settings:
     # Model path - works both locally and in Docker
     BASE_DIR = Path(__file__).resolve().parent.parent.parent
     MODEL_PATH = os.getenv('MODEL_PATH', str(BASE_DIR / 'ml' / 'saved_models' / 'cnn_bn_final.pt'))
+    # Inference backend: eager, torchscript or onnx (export with `python -m app.export_model`)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager').lower()
+    # Eager backend precision on CPU: fp32, int8 (dynamic quantization) or bf16 (autocast)
+    INFERENCE_PRECISION = os.getenv('INFERENCE_PRECISION', 'fp32').lower()
+    # Run dummy batches through the model at startup
+    MODEL_WARMUP = bool(int(os.getenv('MODEL_WARMUP', '1')))
+    # Load the model on a background thread at startup; /health/ready turns true once loaded and warmed up
+    BACKGROUND_LOAD = bool(int(os.getenv('BACKGROUND_LOAD', '1')))
+    # Push synthetic audio through every preprocessing mode before reporting ready
+    STARTUP_WARMUP = bool(int(os.getenv('STARTUP_WARMUP', '1')))
+    # How long prediction requests arriving before readiness wait before getting a 503
+    READY_WAIT_SECONDS = float(os.getenv('READY_WAIT_SECONDS', 30))
+    # After a failed startup, the next request retries it once this many seconds have passed,
+    # doubling after every further failure up to 10 minutes (0 never retries)
+    STARTUP_RETRY_SECONDS = float(os.getenv('STARTUP_RETRY_SECONDS', 30))
+    # JSON bodies at least this large are gzip/brotli compressed when the client accepts it
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+    # Cache-Control max-age for static responses such as /recommend-cuisine/
+    STATIC_RESPONSE_MAX_AGE = int(os.getenv('STATIC_RESPONSE_MAX_AGE', 3600))
     SAMPLE_RATE = int(os.getenv('SAMPLE_RATE', 16000))
+    # Resampling tier for uploads and streams: hq (librosa's default soxr_hq), mq or fast
+    RESAMPLE_QUALITY = os.getenv('RESAMPLE_QUALITY', 'hq').lower()
+    # Let ffmpeg decode WebM/MP4 uploads straight to SAMPLE_RATE (when ffmpeg is installed)
+    DECODE_AT_TARGET_RATE = bool(int(os.getenv('DECODE_AT_TARGET_RATE', 1)))
+    # Augmented variants per segment in the full (FAST_PREPROCESS=0) pipeline, and an
+    # optional fixed seed (by default each request is seeded from its own audio)
+    AUGMENT_VARIANTS = int(os.getenv('AUGMENT_VARIANTS', 3))
+    AUGMENT_SEED = int(os.getenv('AUGMENT_SEED')) if os.getenv('AUGMENT_SEED') else None
     # Enable faster, lower-cost preprocessing by default (set FAST_PREPROCESS=0 to disable)
     FAST_PREPROCESS = bool(int(os.getenv('FAST_PREPROCESS', '1')))
+    # Features fed to the model: mfcc (13-dim pooled MFCC) or hubert ((300, 768) HuBERT
+    # sequences from a local save_pretrained directory, for the CNN1D_BN/BiLSTM heads)
+    FEATURE_TYPE = os.getenv('FEATURE_TYPE', 'mfcc').lower()
+    HUBERT_MODEL_DIR = os.getenv('HUBERT_MODEL_DIR', str(BASE_DIR / 'ml' / 'hubert-base-ls960'))
+    # Transformer layer the head was trained on (12 = last_hidden_state); later layers are dropped
+    HUBERT_LAYER = int(os.getenv('HUBERT_LAYER', 12))
+    HUBERT_MAX_FRAMES = int(os.getenv('HUBERT_MAX_FRAMES', 300))
+    # Anytime inference for /predict/: classify windows in order and stop once the top-1/top-2
+    # margin stays >= ANYTIME_MARGIN for ANYTIME_PATIENCE windows; decode at most ANYTIME_MAX_SECONDS
+    ANYTIME_INFERENCE = bool(int(os.getenv('ANYTIME_INFERENCE', 0)))
+    ANYTIME_MARGIN = float(os.getenv('ANYTIME_MARGIN', 0.3))
+    ANYTIME_PATIENCE = int(os.getenv('ANYTIME_PATIENCE', 3))
+    ANYTIME_MAX_SECONDS = float(os.getenv('ANYTIME_MAX_SECONDS', 20.0))
+    ANYTIME_CHUNK_WINDOWS = int(os.getenv('ANYTIME_CHUNK_WINDOWS', 2))
+    # Voice activity detection per preprocessing mode: off, frames (cut pauses) or
+    # windows (drop windows below VAD_MIN_SPEECH_RATIO). The WebSocket stream does not apply it.
+    VAD_FAST = os.getenv('VAD_FAST', 'off').lower()
+    VAD_FULL = os.getenv('VAD_FULL', 'off').lower()
+    VAD_MIN_SPEECH_RATIO = float(os.getenv('VAD_MIN_SPEECH_RATIO', 0.5))
+    # Opt-in dynamic micro-batching of concurrent /predict/ inference calls
+    BATCH_INFERENCE = bool(int(os.getenv('BATCH_INFERENCE', '0')))
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 16))
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))
+    # Where CPU-bound decode/feature/inference stages run: thread, process or inline
+    EXECUTOR = os.getenv('EXECUTOR', 'thread').lower()
+    EXECUTOR_WORKERS = int(os.getenv('EXECUTOR_WORKERS', min(4, os.cpu_count() or 1)))
+    # Content-addressed caches (per tier memory budget in MB and TTL in seconds)
+    CACHE_ENABLED = bool(int(os.getenv('CACHE_ENABLED', '1')))
+    CACHE_AUDIO_MB = float(os.getenv('CACHE_AUDIO_MB', 64))
+    CACHE_AUDIO_TTL = float(os.getenv('CACHE_AUDIO_TTL', 600))
+    CACHE_FEATURES_MB = float(os.getenv('CACHE_FEATURES_MB', 16))
+    CACHE_FEATURES_TTL = float(os.getenv('CACHE_FEATURES_TTL', 3600))
+    CACHE_PREDICTIONS_MB = float(os.getenv('CACHE_PREDICTIONS_MB', 4))
+    CACHE_PREDICTIONS_TTL = float(os.getenv('CACHE_PREDICTIONS_TTL', 3600))
+    # Server logs: level and format (text = key=value lines, json = one object per line)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+    # Single-clip uploads (/predict/, /preprocess/, see app.uploads): byte cap checked while the
+    # body arrives and decoded-duration cap, applied by those routes and /predict/stream/ only
+    # (0 disables either).
+    # UPLOAD_ALLOW_UNKNOWN=0 rejects containers that can't be sniffed from the first bytes
+    # instead of trying every decoder
+    UPLOAD_MAX_MB = float(os.getenv('UPLOAD_MAX_MB', 25))
+    UPLOAD_MAX_SECONDS = float(os.getenv('UPLOAD_MAX_SECONDS', 300))
+    UPLOAD_ALLOW_UNKNOWN = bool(int(os.getenv('UPLOAD_ALLOW_UNKNOWN', '1')))
+    # Whole-body cap for /predict/batch/ (files or archives; each clip still gets the caps above)
+    BATCH_UPLOAD_MAX_MB = float(os.getenv('BATCH_UPLOAD_MAX_MB', 500))
+    # Per-stage latency histograms and request counters at /metrics (Prometheus text format)
+    METRICS_ENABLED = bool(int(os.getenv('METRICS_ENABLED', '1')))
+    # Opt-in /predict/ trace capture for `python -m app.replay`: one JSON line per request in
+    # TRACE_FILE (a TRACE_SAMPLE fraction of them), uploads spooled to TRACE_AUDIO_DIR if set
+    TRACE_FILE = os.getenv('TRACE_FILE', '')
+    TRACE_AUDIO_DIR = os.getenv('TRACE_AUDIO_DIR', '')
+    TRACE_SAMPLE = float(os.getenv('TRACE_SAMPLE', 1.0))
 
 settings = Settings()
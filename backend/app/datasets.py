@@ -0,0 +1,51 @@
+"""
+Dataset helpers shared by the offline CLIs (feature store, bulk scoring,
+precision report): finding clips and saved sequences on disk, and the
+training notebooks' file-name labels.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+from app.archives import is_audio_name
+from app.models import INPUT_SHAPE
+
+# label_to_idx of the training notebooks (file name keyword -> class index)
+LABEL_KEYWORDS = {
+    'andhra': 0,
+    'gujrat': 1,
+    'jharkhand': 2,
+    'karnataka': 3,
+    'kerala': 4,
+    'tamil': 5,
+}
+
+
+def label_for(name: str):
+    name = name.lower()
+    return next((idx for keyword, idx in LABEL_KEYWORDS.items() if keyword in name), None)
+
+
+def find_audio(root: Path):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if is_audio_name(name):
+                yield Path(dirpath) / name
+
+
+def find_sequences(root: Path):
+    return sorted(p for p in root.rglob('*') if p.suffix in ('.pt', '.npy'))
+
+
+def load_sequence(path: Path, max_len: int = INPUT_SHAPE[0]) -> np.ndarray:
+    if path.suffix == '.npy':
+        x = np.load(path)
+    else:
+        import torch
+        x = torch.load(path, map_location='cpu').numpy()
+    x = np.asarray(x, dtype=np.float32)[:max_len]
+    if len(x) < max_len:
+        x = np.concatenate([x, np.zeros((max_len - len(x), x.shape[1]), dtype=np.float32)])
+    return x
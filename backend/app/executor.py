@@ -0,0 +1,68 @@
+"""
+Executor for the CPU-bound request stages.
+
+The async route handlers hand decode/feature/inference work to a pool so the
+event loop stays free for other requests (including the healthcheck).
+`EXECUTOR=thread` (default) shares the web process's model; `EXECUTOR=process`
+spreads work over several cores with one model copy per worker process;
+`EXECUTOR=inline` keeps the old behaviour of running on the event loop.
+"""
+import asyncio
+import mmap
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
+from app.config import settings
+from app import pipeline
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor() -> Executor:
+    """Return the shared pool, creating it on first use (None for inline mode)."""
+    global _executor
+    if settings.EXECUTOR == 'inline':
+        return None
+    with _lock:
+        if _executor is None:
+            if settings.EXECUTOR == 'process':
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.EXECUTOR_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=pipeline.init_worker,
+                    initargs=(settings.STARTUP_WARMUP,),
+                )
+            else:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.EXECUTOR_WORKERS,
+                    thread_name_prefix='pipeline',
+                )
+        return _executor
+
+
+def uses_process_pool() -> bool:
+    return settings.EXECUTOR == 'process'
+
+
+async def run(fn, *args):
+    """Run `fn(*args)` on the configured executor and await the result.
+
+    Process workers get bytes copies of mmap'ed uploads (app.uploads.read_upload).
+    """
+    executor = get_executor()
+    if executor is None:
+        return fn(*args)
+    if uses_process_pool():
+        args = tuple(bytes(a) if isinstance(a, (mmap.mmap, memoryview)) else a for a in args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, fn, *args)
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -0,0 +1,55 @@
+"""
+Export the classifier for the TorchScript and ONNX inference backends.
+
+Usage (from backend/):
+    python -m app.export_model                      # both formats, next to MODEL_PATH
+    python -m app.export_model --model path/to/cnn_bn_final.pt --format onnx
+
+Writes `<model>.ts` and/or `<model>.onnx`, which is where app.inference
+looks for them, and checks each export against the eager model.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.inference import (
+    artifact_path, example_input, export_onnx, export_torchscript,
+    EagerBackend, OnnxBackend, TorchScriptBackend,
+)
+from app.models import INPUT_SHAPE, load_module
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the model to TorchScript and/or ONNX.')
+    parser.add_argument('--model', type=Path, default=Path(settings.MODEL_PATH))
+    parser.add_argument('--format', choices=['torchscript', 'onnx', 'all'], default='all')
+    parser.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args(argv)
+
+    if not args.model.exists():
+        print(f"[EXPORT] Model file not found: {args.model}")
+        return 1
+    module = load_module(str(args.model), 'cpu')
+    eager = EagerBackend(module)
+    x = example_input(INPUT_SHAPE, 8).numpy()
+    expected = eager.run(x)
+
+    formats = ['torchscript', 'onnx'] if args.format == 'all' else [args.format]
+    for fmt in formats:
+        out = artifact_path(str(args.model), fmt)
+        if fmt == 'torchscript':
+            export_torchscript(module, out)
+            backend = TorchScriptBackend.from_file(out)
+        else:
+            export_onnx(module, out, opset=args.opset)
+            backend = OnnxBackend(out)
+        diff = float(np.max(np.abs(backend.run(x) - expected)))
+        print(f"[EXPORT] Wrote {out} (max |logit diff| vs eager: {diff:.2e})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""
+Memory-mapped HuBERT feature store for training the sequence heads.
+
+Usage (from backend/):
+    python -m app.feature_store extract /data/recordings /data/hubert_store --workers 8
+    python -m app.feature_store extract /data/recordings /data/layers_store --feature layers
+    python -m app.feature_store convert /content/hubert_sequence /data/hubert_store
+    python -m app.feature_store info /data/hubert_store
+
+Replaces the one-`torch.save`-per-clip layout of the training notebooks
+(`extract_hubert_sequence` / `extract_hubert_layers`). A store directory holds:
+  - store.json:    feature kind, row width, dtype and extraction settings
+  - chunk-*.bin:   raw row-major arrays (rows x dim). Every worker appends to
+                   its own chunk files and rolls over at --chunk-mb, so
+                   workers never coordinate and a clip never spans chunks
+  - index.jsonl:   one line per clip: clip id, chunk, row offset, row count, label
+
+Features:
+  - sequence: the (frames, 768) HuBERT sequence the serving path feeds the
+              heads (app.hubert), stored unpadded and cropped to --max-frames
+  - layers:   the notebooks' per-layer mean pool over the whole clip, (13, 768)
+`convert --feature ...` records which of the two the imported files hold.
+
+Extraction fans out over a process pool (one HuBERT copy per worker, one
+intra-op thread each). Clips already in the index are skipped, so an
+interrupted run resumes.
+
+FeatureStoreDataset reads clips as zero-copy slices of the memory-mapped
+chunks, so an epoch costs disk bandwidth rather than per-file opens and
+unpickling.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import settings
+from app.datasets import find_audio, find_sequences, label_for
+
+FEATURES = ('sequence', 'layers')
+DTYPES = ('float32', 'float16')
+STORE_VERSION = 1
+
+
+# ----------------------------- store layout -----------------------------
+def read_meta(root: Path) -> dict:
+    with open(Path(root) / 'store.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_meta(root: Path, meta: dict):
+    """Create store.json, or check an existing store was built the same way."""
+    path = Path(root) / 'store.json'
+    if path.exists():
+        existing = read_meta(root)
+        for key in ('feature', 'dim', 'dtype', 'max_frames'):
+            if existing.get(key) != meta.get(key):
+                raise ValueError(f"{root} was built with {key}={existing.get(key)}, not {meta.get(key)}")
+        return existing
+    Path(root).mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dict(meta, version=STORE_VERSION), f, indent=2)
+    return meta
+
+
+def read_index(root: Path) -> List[dict]:
+    """Index entries in write order (a torn last line from an interrupted run is ignored)."""
+    entries = []
+    path = Path(root) / 'index.jsonl'
+    if not path.exists():
+        return entries
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+class ChunkWriter:
+    """Appends (rows, dim) arrays to this process's own chunk files."""
+
+    def __init__(self, root: Path, dim: int, dtype: str, chunk_mb: float):
+        self.root = Path(root)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.chunk_bytes = int(chunk_mb * 1024 * 1024)
+        self._serial = 0
+        self._name = None
+        self._f = None
+
+    def _open_next(self):
+        if self._f is not None:
+            self._f.close()
+        # The pid keeps names unique across workers and across resumed runs
+        while True:
+            self._name = f"chunk-{os.getpid()}-{self._serial:04d}.bin"
+            self._serial += 1
+            if not (self.root / self._name).exists():
+                break
+        self._f = open(self.root / self._name, 'ab')
+
+    def append(self, x: np.ndarray) -> dict:
+        """Write one clip's rows; returns its chunk, offset and length."""
+        x = np.ascontiguousarray(x, dtype=self.dtype)
+        if x.ndim != 2 or x.shape[1] != self.dim:
+            raise ValueError(f"Expected (rows, {self.dim}) features, got {x.shape}")
+        if self._f is None or (self._f.tell() and self._f.tell() + x.nbytes > self.chunk_bytes):
+            self._open_next()
+        offset = self._f.tell() // (self.dim * self.dtype.itemsize)
+        self._f.write(x.tobytes())
+        self._f.flush()
+        return {'chunk': self._name, 'offset': int(offset), 'length': int(len(x))}
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+# ------------------------------ extraction ------------------------------
+def load_array(path) -> np.ndarray:
+    """A saved `.pt` tensor or `.npy` array as float32 numpy."""
+    path = Path(path)
+    if path.suffix == '.npy':
+        return np.asarray(np.load(path), dtype=np.float32)
+    import torch
+    return torch.load(path, map_location='cpu').float().numpy()
+
+
+def extract_layers(extractor, y: np.ndarray) -> np.ndarray:
+    """The notebooks' `extract_hubert_layers`: mean over time of every hidden state, (layers + 1, dim)."""
+    import torch
+    with torch.inference_mode():
+        out = extractor.model(torch.from_numpy(np.asarray(y, dtype=np.float32)[np.newaxis]).to(extractor.device),
+                              output_hidden_states=True)
+    return torch.stack([h.mean(dim=1)[0] for h in out.hidden_states]).float().cpu().numpy()
+
+
+def hidden_size(model_dir: str) -> int:
+    """Row width of a HuBERT checkpoint, read from its config (without loading the weights)."""
+    from transformers import HubertConfig
+    return int(HubertConfig.from_pretrained(model_dir, local_files_only=True).hidden_size)
+
+
+_worker = {}
+
+
+def init_worker(root: str, feature: str, convert: bool, dim: int, dtype: str, chunk_mb: float,
+                max_frames: int, model_dir: str = None, extractor=None):
+    """Process-pool initializer: one HuBERT copy and one chunk writer per worker."""
+    import torch
+    # N workers each running N intra-op threads would oversubscribe the CPU
+    torch.set_num_threads(1)
+    if not convert and extractor is None:
+        from app.hubert import HubertFeatureExtractor
+        # layers needs every hidden state, so the encoder is not truncated;
+        # sequence crops to max_frames itself (0 = keep every frame)
+        extractor = HubertFeatureExtractor(model_dir=model_dir, layer=0 if feature == 'layers' else None,
+                                           max_frames=max_frames or sys.maxsize)
+    _worker.update(feature=feature, convert=convert, extractor=extractor,
+                   max_frames=max_frames if feature == 'sequence' else 0,
+                   writer=ChunkWriter(Path(root), dim, dtype, chunk_mb))
+
+
+def extract_file(path: str, clip: str) -> dict:
+    """Worker job: featurize (or load) one file and append it to this worker's chunk. Never raises."""
+    from app.utils import read_audio_bytes
+    entry = {'clip': clip, 'label': label_for(clip)}
+    try:
+        if _worker['convert']:
+            x = load_array(path)
+        else:
+            with open(path, 'rb') as f:
+                y, sr = read_audio_bytes(f.read(), sr=16000)
+            extractor = _worker['extractor']
+            x = extract_layers(extractor, y) if _worker['feature'] == 'layers' else extractor.frames(y, sr)
+        if _worker['max_frames']:
+            x = x[:_worker['max_frames']]
+        entry.update(_worker['writer'].append(x))
+    except Exception as e:
+        entry['error'] = str(e)
+    return entry
+
+
+def build_store(input_dir: Path, store: Path, feature: str = 'sequence', convert: bool = False,
+                workers: int = None, dtype: str = 'float32', chunk_mb: float = 512,
+                max_frames: int = None, model_dir: str = None, extractor=None) -> dict:
+    """Featurize every audio file under `input_dir` into `store`. Returns run stats.
+
+    With convert=True the inputs are existing `.pt` / `.npy` arrays of kind
+    `feature` and are copied in as they are. workers=0 runs in this process
+    (`extractor` can then be passed in directly, e.g. a small random model).
+    """
+    input_dir, store = Path(input_dir).resolve(), Path(store)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    max_frames = settings.HUBERT_MAX_FRAMES if max_frames is None else max_frames
+    model_dir = str(model_dir or settings.HUBERT_MODEL_DIR)
+    files = find_sequences(input_dir) if convert else list(find_audio(input_dir))
+    if not files:
+        print(f"[STORE] No inputs under {input_dir}")
+        return {'done': 0, 'errors': 0, 'skipped': 0, 'rows': 0, 'seconds': 0.0}
+    if convert:
+        dim = load_array(files[0]).shape[-1]
+    else:
+        dim = extractor.hidden_size if extractor is not None else hidden_size(model_dir)
+    write_meta(store, {
+        'feature': feature,
+        'dim': int(dim),
+        'dtype': dtype,
+        'max_frames': int(max_frames) if feature == 'sequence' else None,
+        'hubert_layer': (extractor.layer if extractor is not None else settings.HUBERT_LAYER)
+        if feature == 'sequence' and not convert else None,
+        'model_dir': None if convert else model_dir,
+        'sample_rate': 16000,
+    })
+
+    indexed = {e['clip'] for e in read_index(store)}
+    todo = [p for p in files if str(p.relative_to(input_dir)) not in indexed]
+    print(f"[STORE] {len(indexed)} clips already in {store}, {len(todo)} to go")
+    if not todo:
+        return {'done': 0, 'errors': 0, 'skipped': len(indexed), 'rows': 0, 'seconds': 0.0}
+    init_args = (str(store), feature, convert, int(dim), dtype, chunk_mb, max_frames, model_dir)
+
+    index = open(store / 'index.jsonl', 'a', encoding='utf-8')
+    done = errors = rows = 0
+    started = time.perf_counter()
+
+    def record(entry):
+        nonlocal done, errors, rows
+        done += 1
+        if entry.get('error'):
+            errors += 1
+            print(f"[STORE] {entry['clip']}: {entry['error']}")
+        else:
+            rows += entry['length']
+            # One line per clip, flushed, so an interrupted run resumes from here
+            index.write(json.dumps(entry) + '\n')
+            index.flush()
+        if done % 100 == 0:
+            print(f"[STORE] {done}/{len(todo)} clips")
+
+    try:
+        if workers == 0:
+            init_worker(*init_args, extractor=extractor)
+            try:
+                for path in todo:
+                    record(extract_file(str(path), str(path.relative_to(input_dir))))
+            finally:
+                _worker['writer'].close()
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_worker, initargs=init_args)
+            try:
+                queue = iter(todo)
+                pending = set()
+                while True:
+                    for path in queue:
+                        pending.add(pool.submit(extract_file, str(path), str(path.relative_to(input_dir))))
+                        if len(pending) >= workers * 4:
+                            break
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        record(fut.result())
+            except KeyboardInterrupt:
+                print("[STORE] Interrupted; re-run the same command to resume")
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            pool.shutdown()
+    finally:
+        index.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"[STORE] Stored {done - errors} clips ({errors} errors, {rows} rows) in {elapsed:.1f}s"
+          + (f": {done / elapsed:.2f} clips/s" if done else ''))
+    return {'done': done, 'errors': errors, 'skipped': len(indexed), 'rows': rows, 'seconds': elapsed}
+
+
+# ------------------------------- reading --------------------------------
+class FeatureStoreDataset:
+    """Map-style dataset over a feature store: item i -> (features, label).
+
+    Features are zero-copy views into memory-mapped chunks, cropped to
+    `max_len` rows (not padded; `collate` pads a batch). Chunks are mapped
+    lazily per process, so the dataset is cheap to pickle into DataLoader
+    workers. float16 stores are widened to float32 per item (a copy).
+    """
+
+    def __init__(self, root, max_len: int = None, labeled_only: bool = True, as_tensor: bool = True):
+        self.root = Path(root)
+        self.meta = read_meta(self.root)
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.dim = int(self.meta['dim'])
+        self.max_len = max_len or self.meta.get('max_frames') or None
+        self.as_tensor = as_tensor
+        entries = [e for e in read_index(self.root) if not labeled_only or e.get('label') is not None]
+        self.clips = [e['clip'] for e in entries]
+        self.labels = np.array([-1 if e.get('label') is None else e['label'] for e in entries], dtype=np.int64)
+        self.offsets = np.array([e['offset'] for e in entries], dtype=np.int64)
+        self.lengths = np.array([e['length'] for e in entries], dtype=np.int64)
+        self.chunk_names = sorted({e['chunk'] for e in entries})
+        chunk_ids = {name: i for i, name in enumerate(self.chunk_names)}
+        self.chunk_of = np.array([chunk_ids[e['chunk']] for e in entries], dtype=np.int64)
+        self._maps: Dict[int, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.clips)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_maps'] = {}
+        return state
+
+    def _chunk(self, i: int, needed_rows: int) -> np.ndarray:
+        mm = self._maps.get(i)
+        if mm is None or len(mm) < needed_rows:
+            path = self.root / self.chunk_names[i]
+            rows = path.stat().st_size // (self.dim * self.dtype.itemsize)
+            # Copy-on-write: writable views for torch.from_numpy without touching the file
+            mm = np.memmap(path, dtype=self.dtype, mode='c', shape=(rows, self.dim))
+            self._maps[i] = mm
+        return mm
+
+    def array(self, idx: int) -> np.ndarray:
+        """The stored rows of item `idx` (cropped to max_len) as a view into the mmap, in the store's dtype."""
+        offset, length = int(self.offsets[idx]), int(self.lengths[idx])
+        if self.max_len:
+            length = min(length, self.max_len)
+        return self._chunk(int(self.chunk_of[idx]), offset + length)[offset:offset + length]
+
+    def __getitem__(self, idx):
+        x = self.array(idx)
+        label = int(self.labels[idx])
+        if not self.as_tensor:
+            return x.astype(np.float32, copy=False), label
+        import torch
+        # torch widens float16 several times faster than numpy does
+        return torch.from_numpy(x).float(), torch.tensor(label)
+
+
+def collate(batch, max_len: int = None):
+    """Zero-pad (rows, dim) items into one (batch, max_len, dim) tensor, like the notebooks' collate_fn.
+
+    max_len defaults to the longest item; pass the head's input length
+    (e.g. `functools.partial(collate, max_len=300)`) to pad every batch alike.
+    """
+    import torch
+    xs, ys = zip(*batch)
+    max_len = max_len or max(len(x) for x in xs)
+    out = torch.zeros((len(xs), max_len, xs[0].shape[1]), dtype=torch.float32)
+    for i, x in enumerate(xs):
+        n = min(len(x), max_len)
+        out[i, :n] = torch.as_tensor(x[:n])
+    return out, torch.stack([torch.as_tensor(y) for y in ys])
+
+
+def info(root: Path) -> dict:
+    meta = read_meta(root)
+    entries = read_index(root)
+    chunks = sorted({e['chunk'] for e in entries})
+    labels = {}
+    for e in entries:
+        labels[e.get('label')] = labels.get(e.get('label'), 0) + 1
+    return {
+        **meta,
+        'clips': len(entries),
+        'rows': int(sum(e['length'] for e in entries)),
+        'chunks': len(chunks),
+        'bytes': int(sum((Path(root) / c).stat().st_size for c in chunks)),
+        'labels': {str(k): v for k, v in sorted(labels.items(), key=lambda kv: (kv[0] is None, kv[0] or 0))},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build and inspect memory-mapped HuBERT feature stores.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('extract', 'featurize a directory of audio files'),
+                            ('convert', 'import existing .pt / .npy feature files')):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('input_dir', type=Path)
+        p.add_argument('store', type=Path)
+        p.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='0 = run in this process')
+        p.add_argument('--dtype', choices=DTYPES, default='float32')
+        p.add_argument('--chunk-mb', type=float, default=512)
+        p.add_argument('--max-frames', type=int, default=settings.HUBERT_MAX_FRAMES,
+                       help='rows kept per clip (0 = all)')
+        p.add_argument('--feature', choices=FEATURES, default='sequence')
+        if name == 'extract':
+            p.add_argument('--model-dir', default=settings.HUBERT_MODEL_DIR)
+    p = sub.add_parser('info', help='summarize a store')
+    p.add_argument('store', type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        print(json.dumps(info(args.store), indent=2))
+        return 0
+    stats = build_store(
+        args.input_dir, args.store,
+        feature=args.feature, convert=args.command == 'convert',
+        workers=args.workers, dtype=args.dtype, chunk_mb=args.chunk_mb, max_frames=args.max_frames,
+        model_dir=getattr(args, 'model_dir', None),
+    )
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Response-level caching and compression for JSON endpoints.
+
+  - PreparedJSON: a payload serialized once, with a strong ETag and
+    gzip/brotli variants computed up front (for data that never changes at
+    runtime, like the cuisine catalogue)
+  - `If-None-Match` handling: a matching ETag gets an empty 304
+  - Accept-Encoding negotiation: br (if the optional `brotli` package is
+    installed) or gzip, only for bodies of at least RESPONSE_COMPRESS_MIN_BYTES
+  - Accept negotiation for endpoints with more than one representation
+"""
+import gzip
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+def dumps(payload) -> bytes:
+    """Compact UTF-8 JSON, the same bytes JSONResponse would produce."""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def accepted_encodings(accept_encoding: str) -> dict:
+    """Parse an Accept-Encoding header into {coding: q}."""
+    codings = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[name] = q
+    return codings
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick 'br', 'gzip' or None (identity) for a request's Accept-Encoding."""
+    codings = accepted_encodings(accept_encoding)
+    wildcard = codings.get('*', 0.0)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for name in available:
+        q = codings.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def negotiate_media_type(accept: str, available) -> str:
+    """Pick from `available` (in server preference order) for a request's Accept header.
+
+    Exact types beat `type/*`, which beats `*/*`. Falls back to the first
+    available type when nothing acceptable is on offer.
+    """
+    ranges = accepted_encodings(accept)
+    if not ranges:
+        return available[0]
+    best, best_q = available[0], 0.0
+    for media_type in available:
+        q = ranges.get(media_type, ranges.get(media_type.split('/')[0] + '/*', ranges.get('*/*', 0.0)))
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    """Compress `body`; static payloads (compressed once) use the highest level."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if static else 5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if static else 6, mtime=0)
+    return body
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x"."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    target = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+class PreparedJSON:
+    """A JSON payload serialized, hashed and compressed once."""
+
+    def __init__(self, payload, cache_control: str = None):
+        self.body = dumps(payload)
+        self.etag = strong_etag(self.body)
+        self.cache_control = cache_control or f"public, max-age={settings.STATIC_RESPONSE_MAX_AGE}"
+        self.variants = {None: self.body}
+        if len(self.body) >= settings.RESPONSE_COMPRESS_MIN_BYTES:
+            for encoding in ('gzip', 'br') if brotli is not None else ('gzip',):
+                self.variants[encoding] = compress(self.body, encoding, static=True)
+
+    def etag_for(self, encoding) -> str:
+        """Each representation needs its own strong validator."""
+        return self.etag if encoding is None else self.etag[:-1] + '-' + encoding + '"'
+
+    def response(self, request: Request) -> Response:
+        encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+        if encoding not in self.variants:
+            encoding = None
+        headers = {'ETag': self.etag_for(encoding), 'Cache-Control': self.cache_control, 'Vary': 'Accept-Encoding'}
+        if_none_match = request.headers.get('if-none-match')
+        if any(etag_matches(if_none_match, self.etag_for(e)) for e in self.variants):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        return Response(self.variants[encoding], media_type='application/json', headers=headers)
+
+
+def json_response(request: Request, payload, status_code: int = 200,
+                  cache_control: str = 'no-store', vary: str = 'Accept-Encoding') -> Response:
+    """Serialize a dynamic payload, compressing it if it is large and the client accepts it."""
+    body = dumps(payload)
+    headers = {'Cache-Control': cache_control, 'Vary': vary}
+    if len(body) >= settings.RESPONSE_COMPRESS_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+    return Response(body, status_code=status_code, media_type='application/json', headers=headers)
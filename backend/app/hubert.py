@@ -0,0 +1,145 @@
+"""
+HuBERT sequence features for the CNN1D_BN / BiLSTM / Transformer heads.
+
+The heads in ml/saved_models were trained on HuBERT-base hidden states
+(T, 768), cropped or zero-padded to 300 frames. This stage produces the same
+(300, 768) input for the serving path (settings.FEATURE_TYPE='hubert'):
+  - weights come from a local directory (settings.HUBERT_MODEL_DIR, the
+    `save_pretrained` layout); nothing is downloaded from the hub
+  - the 1 s windows from `prepare_model_windows_from_audio` run as one
+    padded batch, with an attention mask over each window's real samples
+  - the encoder is truncated after settings.HUBERT_LAYER, the layer the head
+    was trained on (12 = last_hidden_state for the shipped heads)
+  - only the windows needed to fill the 300 frames are run at all
+
+Valid frames of consecutive windows are concatenated in order, then
+cropped/zero-padded exactly like the notebooks' collate_fn.
+
+Requires the optional `transformers` package. To populate the weights
+directory on a machine with network access:
+    HubertModel.from_pretrained('facebook/hubert-base-ls960').save_pretrained(HUBERT_MODEL_DIR)
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+import torch
+
+from app.config import settings
+from app.utils import prepare_model_windows_from_audio
+
+# HuBERT-base's convolutional front end: 20 ms frames at 16 kHz
+HUBERT_SAMPLE_RATE = 16000
+
+
+def truncate_layers(model, layer: int) -> int:
+    """Keep the first `layer` transformer layers of a HubertModel (<= 0: keep all)."""
+    total = len(model.encoder.layers)
+    layer = total if layer is None or layer <= 0 else min(int(layer), total)
+    if layer < total:
+        model.encoder.layers = model.encoder.layers[:layer]
+        model.config.num_hidden_layers = layer
+    return layer
+
+
+def frames_for_samples(model, lengths: Sequence[int]) -> np.ndarray:
+    """Number of HuBERT frames the conv front end produces for each input length."""
+    lengths = torch.as_tensor(list(lengths), dtype=torch.long)
+    return model._get_feat_extract_output_lengths(lengths).clamp(min=0).numpy()
+
+
+class HubertFeatureExtractor:
+    """Audio -> (max_frames, hidden) HuBERT sequence for the frame-wise heads."""
+
+    def __init__(self, model=None, model_dir: str = None, layer: int = None, max_frames: int = None,
+                 device=None):
+        if model is None:
+            from transformers import HubertModel
+            model_dir = model_dir or settings.HUBERT_MODEL_DIR
+            model = HubertModel.from_pretrained(model_dir, local_files_only=True)
+        self.device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+        self.layer = truncate_layers(model, settings.HUBERT_LAYER if layer is None else layer)
+        self.max_frames = int(max_frames or settings.HUBERT_MAX_FRAMES)
+        self.hidden_size = int(model.config.hidden_size)
+        self.model = model.eval().to(self.device)
+
+    @classmethod
+    def from_config(cls, config=None, seed: int = 0, **kwargs) -> 'HubertFeatureExtractor':
+        """Randomly initialised HuBERT (base-sized unless `config` says otherwise), for tests and benchmarks."""
+        from transformers import HubertConfig, HubertModel
+        torch.manual_seed(seed)
+        return cls(model=HubertModel(config or HubertConfig()), **kwargs)
+
+    def windows_needed(self, lengths: Sequence[int]) -> int:
+        """How many leading windows it takes to fill max_frames."""
+        frames = np.cumsum(frames_for_samples(self.model, lengths))
+        return int(min(len(lengths), np.searchsorted(frames, self.max_frames) + 1))
+
+    @torch.inference_mode()
+    def embed_windows(self, windows: List[np.ndarray], lengths: Sequence[int] = None) -> List[np.ndarray]:
+        """Run windows as one padded batch. Returns each window's valid frames (n_i, hidden)."""
+        lengths = [len(w) for w in windows] if lengths is None else list(lengths)
+        # Windows with no real samples (e.g. from silent clips) contribute no frames
+        windows = [w for w, n in zip(windows, lengths) if n > 0]
+        lengths = [n for n in lengths if n > 0]
+        if not windows:
+            return []
+        width = max(len(w) for w in windows)
+        batch = np.zeros((len(windows), width), dtype=np.float32)
+        mask = np.zeros((len(windows), width), dtype=np.int64)
+        for i, (w, n) in enumerate(zip(windows, lengths)):
+            batch[i, :len(w)] = w
+            mask[i, :n] = 1
+        hidden = self.model(torch.from_numpy(batch).to(self.device),
+                            attention_mask=torch.from_numpy(mask).to(self.device)).last_hidden_state
+        frames = frames_for_samples(self.model, lengths)
+        hidden = hidden.float().cpu().numpy()
+        return [hidden[i, :n] for i, n in enumerate(frames)]
+
+    def valid_frames(self, windows: List[np.ndarray], lengths: Sequence[int] = None) -> np.ndarray:
+        """(n <= max_frames, hidden): valid frames of the windows in order, cropped but not padded."""
+        lengths = [len(w) for w in windows] if lengths is None else list(lengths)
+        needed = self.windows_needed(lengths) if windows else 0
+        parts = self.embed_windows(windows[:needed], lengths[:needed])
+        if not parts:
+            return np.zeros((0, self.hidden_size), dtype=np.float32)
+        return np.concatenate(parts, axis=0)[:self.max_frames]
+
+    def sequence(self, windows: List[np.ndarray], lengths: Sequence[int] = None) -> np.ndarray:
+        """(max_frames, hidden): valid frames of the windows in order, cropped or zero-padded."""
+        seq = self.valid_frames(windows, lengths)
+        out = np.zeros((self.max_frames, self.hidden_size), dtype=np.float32)
+        out[:len(seq)] = seq
+        return out
+
+    def frames(self, y: np.ndarray, sr: int) -> np.ndarray:
+        """Unpadded HuBERT frames for a clip (what `__call__` zero-pads to max_frames)."""
+        if sr != HUBERT_SAMPLE_RATE:
+            raise ValueError(f"HuBERT expects {HUBERT_SAMPLE_RATE} Hz audio, got {sr} Hz")
+        # The heads were trained on HuBERT over raw audio, so skip pre-emphasis
+        # (peak normalization is harmless: the first conv layer is group-normalized)
+        windows, lengths = prepare_model_windows_from_audio(y, sr, window_sec=1.0, pre_emphasis=False,
+                                                            return_lengths=True)
+        return self.valid_frames(windows, lengths)
+
+    def __call__(self, y: np.ndarray, sr: int) -> np.ndarray:
+        seq = self.frames(y, sr)
+        out = np.zeros((self.max_frames, self.hidden_size), dtype=np.float32)
+        out[:len(seq)] = seq
+        return out
+
+
+_extractor: Optional[HubertFeatureExtractor] = None
+
+
+def get_hubert_extractor() -> HubertFeatureExtractor:
+    """Per-process HuBERT stage, loaded on first use."""
+    global _extractor
+    if _extractor is None:
+        _extractor = HubertFeatureExtractor()
+    return _extractor
+
+
+def set_hubert_extractor(extractor: Optional[HubertFeatureExtractor]):
+    """Use an already-built extractor (e.g. a randomly initialised one in tests)."""
+    global _extractor
+    _extractor = extractor
@@ -0,0 +1,181 @@
+"""
+Inference backends for the classifier.
+
+  - eager:       the PyTorch module as loaded
+  - torchscript: traced + frozen TorchScript (loaded from the exported
+                 `.ts` file if present, otherwise traced at startup)
+  - onnx:        ONNX Runtime on CPU (needs the exported `.onnx` file and
+                 the optional `onnxruntime` package)
+
+Every backend takes a float32 batch (batch, *input_shape) as a numpy array
+and returns logits (batch, classes). Export with:
+    python -m app.export_model
+
+The eager backend can also run at reduced precision on CPU:
+  - int8: dynamic quantization of Linear/LSTM weights (activations stay fp32)
+  - bf16: bfloat16 autocast
+Compare them against fp32 with `python -m app.precision_report`.
+"""
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from app.logs import get_logger
+from app.models import INPUT_SHAPE, load_module
+
+log = get_logger('inference')
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+PRECISIONS = ('fp32', 'int8', 'bf16')
+ARTIFACT_SUFFIXES = {'torchscript': '.ts', 'onnx': '.onnx'}
+
+
+def artifact_path(model_path: str, backend: str) -> Path:
+    """Where `app.export_model` writes the artifact for `backend`."""
+    return Path(model_path).with_suffix(ARTIFACT_SUFFIXES[backend])
+
+
+def example_input(input_shape=INPUT_SHAPE, batch_size: int = 1) -> torch.Tensor:
+    generator = torch.Generator().manual_seed(0)
+    return torch.randn((batch_size,) + tuple(input_shape), generator=generator)
+
+
+class InferenceBackend:
+    name = 'base'
+    precision = 'fp32'
+
+    def __init__(self, input_shape=INPUT_SHAPE):
+        self.input_shape = tuple(input_shape)
+
+    def run(self, features: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def warmup(self, batch_sizes=(1, 8)) -> float:
+        """Run dummy batches through the backend. Returns elapsed ms."""
+        started = time.perf_counter()
+        for n in batch_sizes:
+            self.run(example_input(self.input_shape, n).numpy())
+        return 1000.0 * (time.perf_counter() - started)
+
+
+class EagerBackend(InferenceBackend):
+    name = 'eager'
+
+    def __init__(self, module: torch.nn.Module, device='cpu', input_shape=INPUT_SHAPE,
+                 precision: str = 'fp32'):
+        super().__init__(input_shape)
+        self.precision = precision
+        self.device = torch.device(device)
+        if precision == 'int8':
+            # Dynamically quantized kernels are CPU-only
+            self.device = torch.device('cpu')
+            module = quantize_int8(module.to('cpu'))
+        elif precision != 'fp32' and precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision} (expected one of {', '.join(PRECISIONS)})")
+        self.module = module.eval()
+
+    def run(self, features: np.ndarray) -> np.ndarray:
+        bf16 = self.precision == 'bf16'
+        with torch.inference_mode(), torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=bf16):
+            x = torch.from_numpy(np.asarray(features, dtype=np.float32)).to(self.device)
+            out = self.module(x)
+            if isinstance(out, (list, tuple)):
+                out = out[0]
+            return out.float().cpu().numpy()
+
+
+class TorchScriptBackend(EagerBackend):
+    name = 'torchscript'
+
+    @classmethod
+    def from_module(cls, module: torch.nn.Module, input_shape=INPUT_SHAPE):
+        return cls(script_module(module, input_shape), input_shape=input_shape)
+
+    @classmethod
+    def from_file(cls, path, input_shape=INPUT_SHAPE):
+        return cls(torch.jit.load(str(path), map_location='cpu'), input_shape=input_shape)
+
+
+class OnnxBackend(InferenceBackend):
+    name = 'onnx'
+
+    def __init__(self, model, input_shape=INPUT_SHAPE, num_threads: int = None):
+        """`model` is a path to an .onnx file or the serialized model bytes."""
+        super().__init__(input_shape)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if isinstance(model, Path):
+            model = str(model)
+        self.session = ort.InferenceSession(model, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, features: np.ndarray) -> np.ndarray:
+        x = np.ascontiguousarray(features, dtype=np.float32)
+        return self.session.run(None, {self.input_name: x})[0]
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """Dynamic int8 quantization of the Linear and LSTM layers."""
+    from torch.ao.quantization import quantize_dynamic
+    if any(isinstance(m, torch.nn.TransformerEncoderLayer) for m in module.modules()):
+        # The fused attention fast path reads `.weight` as a tensor, which
+        # quantized Linear layers expose as a method
+        torch.backends.mha.set_fastpath_enabled(False)
+    return quantize_dynamic(module, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8)
+
+
+def script_module(module: torch.nn.Module, input_shape=INPUT_SHAPE):
+    """Trace `module` on CPU and freeze it (folds BatchNorm into the convolutions)."""
+    module = module.to('cpu').eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(module, example_input(input_shape, 2))
+    return torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+
+
+def export_torchscript(module: torch.nn.Module, path, input_shape=INPUT_SHAPE):
+    torch.jit.save(script_module(module, input_shape), str(path))
+
+
+def export_onnx(module: torch.nn.Module, path, input_shape=INPUT_SHAPE, opset: int = 17):
+    """Export with dynamic batch and frame axes. `path` may be a file object."""
+    module = module.to('cpu').eval()
+    dynamic_axes = {'features': {0: 'batch'}, 'logits': {0: 'batch'}}
+    if len(input_shape) > 1:
+        dynamic_axes['features'][1] = 'frames'
+    with torch.no_grad():
+        torch.onnx.export(
+            module, (example_input(input_shape, 2),), path if not isinstance(path, Path) else str(path),
+            input_names=['features'], output_names=['logits'],
+            dynamic_axes=dynamic_axes, opset_version=opset, dynamo=False,
+        )
+
+
+def load_backend(kind: str, model_path: str, device='cpu', precision: str = 'fp32') -> InferenceBackend:
+    """Build the `kind` backend for the model saved at `model_path`.
+
+    TorchScript falls back to tracing the eager module when no exported
+    file exists; ONNX requires the exported file. Reduced precision is
+    only available on the eager backend.
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {kind} (expected one of {', '.join(BACKENDS)})")
+    if precision != 'fp32' and kind != 'eager':
+        raise ValueError(f"{precision} precision requires the eager backend")
+    if kind == 'onnx':
+        path = artifact_path(model_path, 'onnx')
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found; run `python -m app.export_model` first")
+        return OnnxBackend(path)
+    if kind == 'torchscript':
+        path = artifact_path(model_path, 'torchscript')
+        if path.exists():
+            return TorchScriptBackend.from_file(path)
+        log.warning(f"{path} not found, tracing {model_path} at startup")
+        return TorchScriptBackend.from_module(load_module(model_path, 'cpu'))
+    module = load_module(model_path, device)
+    return EagerBackend(module, device, input_shape=getattr(module, 'input_shape', INPUT_SHAPE),
+                        precision=precision)
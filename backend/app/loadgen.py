@@ -0,0 +1,358 @@
+"""
+Load generator for the API: throughput, latency percentiles and the saturation point.
+
+Usage (from backend/):
+    python -m app.loadgen --url http://localhost:5000 --concurrency 1 2 4 8 16 --duration 20
+    python -m app.loadgen --url http://localhost:5000 --rate 1 2 5 10 20 --durations 3 8 --out load.json
+    python -m app.loadgen --endpoint preprocess --format webm --concurrency 4 --requests 200
+    python -m app.loadgen --endpoint recommend --rate 50 100 200 --slo-ms 50
+    python -m app.loadgen --in-process --concurrency 1 4 --requests 20 --target-rps 30
+
+Uploads are synthetic speech-like clips (see app.payloads.synthetic_wav) of
+--durations seconds, sent the way the frontend does (multipart `file`,
+`recording.webm`). --format webm encodes them to WebM/Opus with ffmpeg, which
+also exercises the server's ffmpeg decode path; wav needs nothing extra.
+--variants distinct clips are generated per duration and, for WAV, every
+upload gets a unique tail so the server's result cache never answers
+(--allow-cache keeps uploads identical within a variant).
+
+Each step is one load level, run for --duration seconds or --requests
+requests, whichever ends first:
+  --concurrency N ...  closed loop: N clients each send back to back
+  --rate R ...         open loop: Poisson arrivals at R requests/s, at most
+                       --max-in-flight outstanding (waiting for a slot shows
+                       up as `lag_ms`, i.e. the generator itself saturated)
+
+Per step it reports throughput (successful requests/s; in open loop, the
+completion rate next to the measured arrival rate), p50/p95/p99 latency,
+error rate and the status codes seen. The saturation point is the first step
+where errors exceed --max-error-rate, p95 exceeds --slo-ms, or throughput
+stops keeping up: in open loop it falls more than --knee short of the offered
+rate, in closed loop adding clients raises it by less than --knee. The step
+before it is the sustainable level; with --target-rps the report also gives
+the replicas needed for that traffic at that level. --out writes the full
+report as JSON; a text summary is always printed.
+"""
+import argparse
+import asyncio
+import json
+import math
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.payloads import synthetic_wav
+from app.replay import summarize
+
+ENDPOINTS = {
+    'predict': ('POST', '/predict/'),
+    'preprocess': ('POST', '/preprocess/'),
+    'recommend': ('GET', '/recommend-cuisine/'),
+}
+# Rotated through by --endpoint recommend (plus the unfiltered listing)
+RECOMMEND_STATES = (None, 'andhrapradesh', 'gujarath', 'kerala', 'karnataka', 'jharkhand', 'tamilnadu')
+# Latency percentiles in the text summary (the JSON has all of app.replay.PERCENTILES)
+SHOWN = (50, 95, 99)
+
+
+def encode_webm(wav: bytes, bitrate: str = '32k') -> bytes:
+    """WAV bytes -> WebM/Opus, the container browsers' MediaRecorder produces."""
+    if not shutil.which('ffmpeg'):
+        raise RuntimeError('--format webm needs ffmpeg on PATH')
+    proc = subprocess.run(['ffmpeg', '-nostdin', '-v', 'error', '-i', 'pipe:0', '-c:a', 'libopus',
+                           '-b:a', bitrate, '-f', 'webm', 'pipe:1'], input=wav, capture_output=True)
+    if proc.returncode != 0 or not proc.stdout:
+        raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip() or 'ffmpeg produced no output')
+    return proc.stdout
+
+
+def make_uploads(durations: List[float], fmt: str = 'wav', variants: int = 4, sr: int = 16000) -> List[dict]:
+    """`variants` clips per duration: [{'seconds', 'format', 'data'}, ...]."""
+    uploads = []
+    for seconds in durations:
+        for v in range(variants):
+            data = synthetic_wav(seconds, sr=sr, seed=1000 * v + int(seconds * 10))
+            if fmt == 'webm':
+                data = encode_webm(data)
+            uploads.append({'seconds': seconds, 'format': fmt, 'data': data})
+    return uploads
+
+
+def unique_wav(data: bytes, n: int) -> bytes:
+    """Overwrite the last four PCM_16 samples with the bytes of `n` (inaudible; new content digest)."""
+    tail = np.frombuffer(n.to_bytes(4, 'little'), dtype=np.uint8).astype('<i2')
+    return data[:-8] + tail.tobytes()
+
+
+class Target:
+    """Builds request i for one endpoint."""
+
+    def __init__(self, endpoint: str, uploads: List[dict] = None, unique: bool = True):
+        self.method, self.path = ENDPOINTS[endpoint]
+        self.endpoint = endpoint
+        self.uploads = uploads or []
+        self.unique = unique
+        self.counter = 0
+
+    def next(self) -> dict:
+        i, self.counter = self.counter, self.counter + 1
+        if self.method == 'GET':
+            state = RECOMMEND_STATES[i % len(RECOMMEND_STATES)]
+            return {'kwargs': {'params': {'state': state} if state else None}, 'bytes': 0, 'seconds': None}
+        upload = self.uploads[i % len(self.uploads)]
+        data = upload['data']
+        if self.unique and upload['format'] == 'wav':
+            data = unique_wav(data, i)
+        name = f"recording.{upload['format']}"
+        mime = 'audio/webm' if upload['format'] == 'webm' else 'audio/wav'
+        return {'kwargs': {'files': {'file': (name, data, mime)}}, 'bytes': len(data), 'seconds': upload['seconds']}
+
+
+async def _send(client, target: Target, request: dict, rows: list, lag: float = None):
+    row = {'bytes': request['bytes'], 'audio_seconds': request['seconds']}
+    if lag is not None:
+        row['lag_ms'] = round(1000.0 * lag, 1)
+    sent = time.perf_counter()
+    try:
+        response = await client.request(target.method, target.path, **request['kwargs'])
+        await response.aread()
+        row['status'] = response.status_code
+    except Exception as e:
+        row['status'] = None
+        row['error'] = type(e).__name__
+    row['sent'], row['done'] = sent, time.perf_counter()
+    row['latency_ms'] = round(1000.0 * (row['done'] - sent), 2)
+    rows.append(row)
+
+
+async def closed_loop(client, target: Target, concurrency: int, duration: float, requests: int = None) -> dict:
+    """`concurrency` clients sending back to back until `duration` or `requests` runs out."""
+    rows = []
+    budget = [requests if requests else math.inf]
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async def worker():
+        while time.perf_counter() < deadline and budget[0] > 0:
+            budget[0] -= 1
+            await _send(client, target, target.next(), rows)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return step_result('concurrency', concurrency, rows, time.perf_counter() - start)
+
+
+async def open_loop(client, target: Target, rate: float, duration: float, requests: int = None,
+                    max_in_flight: int = 256, seed: int = 0) -> dict:
+    """Poisson arrivals at `rate`/s for `duration` seconds (or `requests` arrivals)."""
+    rng = np.random.default_rng(seed)
+    slots = asyncio.Semaphore(max(1, max_in_flight))
+    rows, tasks = [], []
+
+    async def send(request, scheduled):
+        try:
+            await _send(client, target, request, rows, lag=time.perf_counter() - start - scheduled)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    scheduled = 0.0
+    while len(tasks) < (requests or math.inf):
+        scheduled += rng.exponential(1.0 / rate)
+        if scheduled > duration:
+            break
+        delay = start + scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await slots.acquire()
+        tasks.append(asyncio.ensure_future(send(target.next(), scheduled)))
+    await asyncio.gather(*tasks)
+    return step_result('rate', rate, rows, time.perf_counter() - start)
+
+
+def step_result(mode: str, level: float, rows: List[dict], elapsed: float) -> dict:
+    ok = [r for r in rows if r.get('status') == 200]
+    statuses = {}
+    for r in rows:
+        key = str(r.get('status') or r.get('error'))
+        statuses[key] = statuses.get(key, 0) + 1
+    result = {
+        mode: level,
+        'sent': len(rows),
+        'ok': len(ok),
+        'error_rate': round(1.0 - len(ok) / len(rows), 4) if rows else 0.0,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency_ms': summarize([r['latency_ms'] for r in ok]),
+        'statuses': dict(sorted(statuses.items())),
+    }
+    if mode == 'rate' and len(rows) > 1:
+        # Arrival rate vs completion rate over the same number of requests: a
+        # server that keeps up finishes them over (about) the span they arrived in
+        arrived = max(r['sent'] for r in rows) - min(r['sent'] for r in rows)
+        finished = max(r['done'] for r in rows) - min(r['done'] for r in rows)
+        result['offered_rps'] = round((len(rows) - 1) / arrived, 2) if arrived > 0 else 0.0
+        result['throughput_rps'] = round((len(ok) - 1) / finished, 2) if finished > 0 and ok else 0.0
+        result['lag_ms'] = summarize([r['lag_ms'] for r in rows])
+    return result
+
+
+def find_saturation(steps: List[dict], mode: str, slo_ms: float = None, max_error_rate: float = 0.01,
+                    knee: float = 0.1) -> Optional[dict]:
+    """First step past the knee of the curve, with the reason and the last sustainable step."""
+    for i, step in enumerate(steps):
+        reason = None
+        if step['error_rate'] > max_error_rate:
+            reason = f"error rate {step['error_rate']:.1%} > {max_error_rate:.1%}"
+        elif slo_ms and step['latency_ms'].get('p95', 0) > slo_ms:
+            reason = f"p95 {step['latency_ms']['p95']}ms > {slo_ms:g}ms"
+        elif mode == 'rate' and step['throughput_rps'] < (1 - knee) * step.get('offered_rps', step[mode]):
+            reason = f"throughput {step['throughput_rps']}/s short of offered {step.get('offered_rps')}/s"
+        elif mode == 'concurrency' and i > 0 and step['throughput_rps'] < (1 + knee) * steps[i - 1]['throughput_rps']:
+            reason = f"throughput {step['throughput_rps']}/s flat vs {steps[i - 1]['throughput_rps']}/s"
+        if reason:
+            last = steps[i - 1] if i > 0 else None
+            return {mode: step[mode], 'reason': reason,
+                    'sustainable': last[mode] if last else None,
+                    'sustainable_rps': last['throughput_rps'] if last else None}
+    return None
+
+
+def replicas_for(target_rps: float, steps: List[dict], saturation: Optional[dict]) -> Optional[int]:
+    """Replicas needed for `target_rps` at the sustainable per-replica throughput."""
+    if saturation is not None:
+        per_replica = saturation['sustainable_rps']
+    else:
+        per_replica = max((s['throughput_rps'] for s in steps), default=0)
+    return math.ceil(target_rps / per_replica) if per_replica else None
+
+
+def print_summary(report: dict):
+    meta, mode = report['meta'], report['meta']['mode']
+    uploads = f", {meta['format']} {'/'.join(f'{d:g}s' for d in meta['durations'])}" if meta['durations'] else ''
+    print(f"\n{meta['endpoint']} ({meta['target']}), {mode} steps{uploads}")
+    header = f"{mode:>11} {'sent':>6} " + (f"{'offered':>8} " if mode == 'rate' else '')
+    header += f"{'ok/s':>8} {'err':>6} " + ' '.join(f"{'p' + str(p):>8}" for p in SHOWN)
+    if mode == 'rate':
+        header += f" {'lag p95':>8}"
+    print(header)
+    saturated = (report['saturation'] or {}).get(mode)
+    for step in report['steps']:
+        lat = step['latency_ms']
+        line = f"{step[mode]:>11g} {step['sent']:>6} " + (f"{step.get('offered_rps', '-'):>8} " if mode == 'rate' else '')
+        line += (f"{step['throughput_rps']:>8} {step['error_rate']:>6.1%} "
+                 + ' '.join(f"{lat.get(f'p{p}', '-'):>8}" for p in SHOWN))
+        if mode == 'rate':
+            line += f" {step.get('lag_ms', {}).get('p95', '-'):>8}"
+        if mode == 'rate' and step.get('offered_rps', step[mode]) < 0.9 * step[mode]:
+            line += '  (generator could not keep the rate)'
+        print(line + ('  <- saturated' if step[mode] == saturated else ''))
+    sat = report['saturation']
+    if sat is None:
+        print(f"No saturation up to {mode} {report['steps'][-1][mode]:g} "
+              f"(max {report['max_throughput_rps']}/s)")
+    else:
+        print(f"Saturated at {mode} {sat[mode]:g}: {sat['reason']}")
+        if sat['sustainable'] is not None:
+            print(f"Sustainable: {mode} {sat['sustainable']:g} at {sat['sustainable_rps']}/s")
+    if report.get('replicas') is not None:
+        print(f"Replicas for {meta['target_rps']:g} req/s: {report['replicas']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test /predict/, /preprocess/ or /recommend-cuisine/.')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--in-process', action='store_true', help="drive this checkout's app through ASGI")
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='predict')
+    levels = parser.add_mutually_exclusive_group()
+    levels.add_argument('--concurrency', type=int, nargs='+', help='closed-loop client counts, one step each')
+    levels.add_argument('--rate', type=float, nargs='+', help='open-loop arrival rates (req/s), one step each')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per step')
+    parser.add_argument('--requests', type=int, help='requests per step (ends the step early)')
+    parser.add_argument('--warmup', type=int, default=2, help='requests sent before the first step')
+    parser.add_argument('--durations', type=float, nargs='+', default=[3.0], help='upload lengths in seconds')
+    parser.add_argument('--format', choices=('wav', 'webm'), default='wav')
+    parser.add_argument('--variants', type=int, default=4, help='distinct clips per duration')
+    parser.add_argument('--allow-cache', action='store_true', help='send identical WAV bytes per variant')
+    parser.add_argument('--max-in-flight', type=int, default=256, help='open-loop cap on outstanding requests')
+    parser.add_argument('--slo-ms', type=float, help='p95 latency above this counts as saturated')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--knee', type=float, default=0.1, help='throughput shortfall/gain that marks the knee')
+    parser.add_argument('--target-rps', type=float, help='report the replicas needed for this traffic')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--out', type=Path)
+    args = parser.parse_args(argv)
+
+    try:
+        import httpx
+    except ImportError:
+        print("app.loadgen needs httpx to send requests: pip install httpx")
+        return 2
+    mode = 'rate' if args.rate else 'concurrency'
+    steps_to_run = args.rate or args.concurrency or [1]
+    uploads = []
+    if ENDPOINTS[args.endpoint][0] == 'POST':
+        try:
+            uploads = make_uploads(args.durations, args.format, max(1, args.variants))
+        except RuntimeError as e:
+            print(e)
+            return 2
+    target = Target(args.endpoint, uploads, unique=not args.allow_cache)
+    if args.in_process:
+        from app.main import app
+        transport, base_url = httpx.ASGITransport(app=app), 'http://loadgen'
+    else:
+        transport, base_url = None, args.url
+    limits = httpx.Limits(max_connections=max(max(steps_to_run) if mode == 'concurrency' else args.max_in_flight, 1))
+
+    async def go():
+        steps = []
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout,
+                                     limits=limits) as client:
+            for _ in range(args.warmup):
+                await _send(client, target, target.next(), [])
+            for level in steps_to_run:
+                if mode == 'rate':
+                    step = await open_loop(client, target, level, args.duration, args.requests,
+                                           args.max_in_flight, seed=len(steps))
+                else:
+                    step = await closed_loop(client, target, level, args.duration, args.requests)
+                steps.append(step)
+                print(f"  {mode} {level:g}: {step['sent']} sent, {step['throughput_rps']}/s, "
+                      f"p95 {step['latency_ms'].get('p95', '-')}ms, errors {step['error_rate']:.1%}")
+        return steps
+
+    print(f"Load-testing {ENDPOINTS[args.endpoint][1]}"
+          + (" in-process" if args.in_process else f" at {args.url}") + f", {mode} {steps_to_run}")
+    steps = asyncio.run(go())
+    saturation = find_saturation(steps, mode, args.slo_ms, args.max_error_rate, args.knee)
+    report = {
+        'meta': {
+            'endpoint': ENDPOINTS[args.endpoint][1],
+            'target': 'in-process' if args.in_process else args.url,
+            'mode': mode,
+            'durations': args.durations if uploads else [],
+            'format': args.format,
+            'duration_per_step': args.duration, 'requests_per_step': args.requests,
+            'slo_ms': args.slo_ms, 'max_error_rate': args.max_error_rate, 'knee': args.knee,
+            'target_rps': args.target_rps,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'steps': steps,
+        'max_throughput_rps': max((s['throughput_rps'] for s in steps), default=0.0),
+        'saturation': saturation,
+        'replicas': replicas_for(args.target_rps, steps, saturation) if args.target_rps else None,
+    }
+    print_summary(report)
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.out}")
+    return 0 if any(s['ok'] for s in steps) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
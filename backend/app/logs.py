@@ -0,0 +1,111 @@
+"""
+Leveled, structured, buffered logging for the server.
+
+    from app.logs import get_logger
+    log = get_logger('predict')
+    log.info("Prediction", extra={'state': state, 'confidence': confidence})
+
+Records go through a QueueHandler: the calling thread (often the event loop)
+only enqueues, and a QueueListener thread formats and writes them to
+stdout. Fields passed in `extra` become JSON keys (LOG_FORMAT=json) or
+`key=value` pairs after the message (LOG_FORMAT=text). LOG_LEVEL sets the
+level of every `auraldine.*` logger. The queue is flushed at exit.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+from app.config import settings
+
+ROOT = 'auraldine'
+# Attributes every LogRecord has; anything else came in through `extra`
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_lock = threading.Lock()
+_listener = None
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS}
+
+
+def _timestamp(record: logging.LogRecord) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, then the record's extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            'ts': _timestamp(record),
+            'level': record.levelname.lower(),
+            'logger': record.name[len(ROOT) + 1:] or record.name,
+            'msg': record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            out['exc'] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """`ts LEVEL [logger] message key=value ...` for reading in a terminal."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = ' '.join(f'{k}={v}' for k, v in record_fields(record).items())
+        line = (f"{_timestamp(record)} {record.levelname:<7} [{record.name[len(ROOT) + 1:] or record.name}] "
+                f"{record.getMessage()}" + (f" {fields}" if fields else ''))
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def configure(level: str = None, fmt: str = None, stream=None, force: bool = False):
+    """Install the queue handler on the `auraldine` logger (once per process unless `force`)."""
+    global _listener
+    with _lock:
+        if _listener is not None and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+        root = logging.getLogger(ROOT)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter() if (fmt or settings.LOG_FORMAT) == 'json' else TextFormatter())
+        records = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.setLevel((level or settings.LOG_LEVEL).upper())
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+        _listener.start()
+
+
+def flush():
+    """Write out everything queued so far (stops and restarts the listener thread)."""
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def shutdown():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown)
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure()
+    return logging.getLogger(f'{ROOT}.{name}')
@@ -1,9 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app import routes
+from app import routes, executor, logs, traces
+from app.metrics import MetricsMiddleware
+from app.uploads import UploadLimitMiddleware
 
 app = FastAPI(title="native-language-id Backend")
 
+# Byte and duration caps on /predict/ and /preprocess/ bodies, checked as they arrive
+# (innermost, so its 413/415 responses still get CORS headers)
+app.add_middleware(UploadLimitMiddleware)
+
 # Allow CORS from frontend
 app.add_middleware(
     CORSMiddleware,
@@ -13,9 +19,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts, latency and body sizes for /metrics (outermost, so it sees every response)
+app.add_middleware(MetricsMiddleware)
+
 # include routes
 app.include_router(routes.router)
 
+@app.on_event("startup")
+def start_model_load():
+    # Returns immediately with BACKGROUND_LOAD=1; /health/ready reports progress
+    routes.startup_state.start(routes.model_service)
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown()
+    traces.shutdown()
+    logs.flush()
+
 @app.get("/")
 def root():
     return {"message": "native-language-id backend running"}
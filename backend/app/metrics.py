@@ -0,0 +1,220 @@
+"""
+Per-stage latency histograms and request counters, exposed at /metrics.
+
+Pipeline code wraps each stage in `stage(name)`:
+  decode, resample, trim, vad, windowing, mfcc, hubert, inference, serialization
+
+Inside `collect()` (the pipeline entry points open one) stage durations
+accumulate in a per-thread dict that is returned with the result, so the
+web process records them even when the work ran in a process-pool worker.
+Outside a collection (e.g. the micro-batcher thread) `stage` observes the
+histogram directly. The HTTP middleware counts every request by route
+template and status, with its latency (until the last body chunk, so
+streamed NDJSON is timed in full) and request body size.
+
+Rendered in the Prometheus text exposition format; no client library is
+needed. Counts are per process: with several uvicorn workers, scrape each.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.config import settings
+
+# Seconds: sub-millisecond inference up to multi-second HuBERT passes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(2 ** k) for k in range(10, 28, 2))  # 1 KiB .. 128 MiB
+AUDIO_SECONDS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(n, '')) for n in self.labelnames), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float], labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # label values -> [count per bucket (last = +Inf), sum]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, '')) for n in self.labelnames)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels.get(n, '')) for n in self.labelnames))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        for key, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                running += n
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {running}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {running}"
+
+
+STAGE_SECONDS = Histogram('auraldine_stage_seconds', 'Time spent in each pipeline stage.',
+                          LATENCY_BUCKETS, ('stage',))
+REQUEST_SECONDS = Histogram('auraldine_request_seconds', 'HTTP request latency by route.',
+                            LATENCY_BUCKETS, ('method', 'route'))
+REQUESTS = Counter('auraldine_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status'))
+REQUEST_BYTES = Histogram('auraldine_request_bytes', 'HTTP request body size by route.',
+                          SIZE_BUCKETS, ('method', 'route'))
+AUDIO_SECONDS = Histogram('auraldine_audio_seconds', 'Decoded audio duration per scored clip.',
+                          AUDIO_SECONDS_BUCKETS, ('endpoint',))
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, REQUEST_BYTES, AUDIO_SECONDS]
+
+
+# ------------------------------ stage timing -----------------------------
+_local = threading.local()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage (repeated stages in one collection add up)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+        elif settings.METRICS_ENABLED:
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+
+@contextmanager
+def collect():
+    """Collect stage timings of this thread into a dict (None when nested in an outer collection)."""
+    if getattr(_local, 'timings', None) is not None:
+        yield None
+        return
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+def timed_stages(fn):
+    """Decorate a pipeline entry point: its result dict gains 'timings' (stage -> seconds)."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with collect() as timings:
+            result = fn(*args, **kwargs)
+        if timings is not None and isinstance(result, dict):
+            result['timings'] = timings
+        return result
+    return wrapper
+
+
+def record_stages(timings: Optional[dict]):
+    """Observe timings returned by a pipeline entry point."""
+    if settings.METRICS_ENABLED and timings:
+        for name, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+# ---------------------------- HTTP middleware -----------------------------
+class MetricsMiddleware:
+    """ASGI middleware counting requests by route template, status, latency and body size."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                status['finished'] = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            # The route template (not the raw path) keeps label cardinality bounded
+            path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            REQUESTS.inc(method=method, route=path, status=status['code'])
+            REQUEST_SECONDS.observe(status.get('finished', time.perf_counter()) - start, method=method, route=path)
+            length = dict(scope.get('headers') or []).get(b'content-length')
+            if length is not None and length.isdigit():
+                REQUEST_BYTES.observe(int(length), method=method, route=path)
@@ -1,10 +1,16 @@
 """
 Model service: load model and make predictions
 """
+import hashlib
 import os
 import torch
 import numpy as np
 from app.config import settings
+from app.logs import get_logger
+from app.metrics import stage
+from app.models import INPUT_SHAPE
+
+log = get_logger('model')
 
 # Mapping indices to states (example mapping)
 STATE_MAPPING = [
@@ -16,49 +22,136 @@ class ModelService:
         self.model_path = model_path or settings.MODEL_PATH
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = None
+        self.backend = None
+        self.batcher = None
+        # Identifies the loaded weights (used in prediction cache keys)
+        self.model_version = 'dummy'
 
     def load_model(self):
         if self.model is not None:
             return self.model
         
-        print(f"Loading model from: {self.model_path}")
+        log.info("Loading model", extra={'path': self.model_path})
         
         if not os.path.exists(self.model_path):
-            print(f"Warning: Model file not found at {self.model_path}")
-            print("Using deterministic dummy predictions instead")
+            log.warning("Model file not found, using deterministic dummy predictions instead",
+                        extra={'path': self.model_path})
             self.model = None
             return None
         try:
-            self.model = torch.load(self.model_path, map_location=self.device)
-            self.model.eval()
-            print("Model loaded successfully")
-            return self.model
+            self.backend = self._load_backend(settings.INFERENCE_BACKEND, settings.INFERENCE_PRECISION)
+            self.model = getattr(self.backend, 'module', self.backend)
+            self.model_version = self._file_digest(self.model_path)
+            if self.backend.precision != 'fp32':
+                # Reduced precision changes outputs, so keep its cached predictions apart
+                self.model_version += f':{self.backend.precision}'
+            log.info("Model loaded", extra={'backend': self.backend.name, 'precision': self.backend.precision})
+            expected = INPUT_SHAPE if settings.FEATURE_TYPE == 'hubert' else (13,)
+            if tuple(self.backend.input_shape) != expected:
+                log.warning(f"Model expects input {tuple(self.backend.input_shape)} but FEATURE_TYPE="
+                            f"{settings.FEATURE_TYPE} produces {expected}")
         except Exception as e:
-            print(f"Warning: failed to load model: {e}")
-            self.model = None
+            log.warning(f"Failed to load model: {e}")
+            self.model = self.backend = None
             return None
+        if settings.MODEL_WARMUP:
+            self.warmup()
+        return self.model
+
+    def _load_backend(self, kind: str, precision: str = 'fp32'):
+        """Load the configured backend, falling back towards eager fp32."""
+        from app.inference import load_backend
+        attempts = []
+        for attempt in ((kind, precision), ('eager', precision), ('eager', 'fp32')):
+            if attempt not in attempts:
+                attempts.append(attempt)
+        for i, (k, p) in enumerate(attempts):
+            try:
+                return load_backend(k, self.model_path, self.device, p)
+            except Exception as e:
+                if i == len(attempts) - 1:
+                    raise
+                log.warning(f"{k} backend at {p} unavailable ({e}), falling back")
+
+    def warmup(self, batch_sizes=(1, 8)):
+        """Run dummy batches through the backend so the first request doesn't pay for it."""
+        if self.backend is None:
+            return
+        try:
+            elapsed = self.backend.warmup(batch_sizes)
+            log.info("Warmed up backend", extra={'backend': self.backend.name, 'ms': round(elapsed)})
+        except Exception as e:
+            log.warning(f"Warmup failed: {e}")
+
+    @staticmethod
+    def _file_digest(path: str) -> str:
+        from app import weights
+        if weights.is_weights_file(path):
+            # Recorded at save time; hashing would fault in every mapped page
+            return weights.read_header(path)['digest']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def enable_batching(self, max_batch_size: int = None, max_wait_ms: float = None):
+        """Route predictions through a dynamic micro-batcher (see app.batching)."""
+        from app.batching import MicroBatcher
+        if self.batcher is None:
+            self.batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch_size=max_batch_size or settings.BATCH_MAX_SIZE,
+                max_wait_ms=settings.BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+            )
+            self.batcher.start()
+        return self.batcher
 
     def predict_from_features(self, features: np.ndarray):
         """Predict state index from feature vector. Returns (state, confidence)."""
-        # If model is not available, return deterministic dummy prediction
+        return self.predict_batch(np.asarray(features)[np.newaxis, ...])[0]
+
+    def predict_batch(self, features: np.ndarray):
+        """Predict a batch of feature vectors (batch, ...) in one forward pass.
+
+        Returns a list of (state, confidence) tuples, one per row.
+        """
+        probs = self.predict_proba(features)
+        if probs is None:
+            return [('unknown', 0.0)] * len(features)
+        results = []
+        for row in probs:
+            idx = int(np.argmax(row))
+            state = STATE_MAPPING[idx] if idx < len(STATE_MAPPING) else 'unknown'
+            results.append((state, float(row[idx])))
+        return results
+
+    def predict_proba(self, features: np.ndarray):
+        """Class probabilities (batch, num_classes) for a batch of feature vectors.
+
+        Returns None if the forward pass fails.
+        """
+        # If model is not available, return deterministic dummy probabilities
         if self.model is None:
-            # Simple heuristic: sum features to pick index
-            idx = int(abs(int(np.sum(features))) % len(STATE_MAPPING))
-            return STATE_MAPPING[idx], 0.5
+            # Simple heuristic: sum features to pick index (0.5 there, the rest shared out)
+            with stage('inference'):
+                probs = np.full((len(features), len(STATE_MAPPING)), 0.5 / (len(STATE_MAPPING) - 1))
+                for i, row in enumerate(features):
+                    probs[i, int(abs(int(np.sum(row))) % len(STATE_MAPPING))] = 0.5
+            return probs
 
+        backend = self.backend
+        if backend is None or getattr(backend, 'module', backend) is not self.model:
+            from app.inference import EagerBackend
+            backend = EagerBackend(self.model, self.device)
         try:
-            # Convert features to tensor
-            import torch
-            with torch.no_grad():
-                x = torch.from_numpy(features).float().unsqueeze(0).to(self.device)
-                out = self.model(x)
-                if isinstance(out, (list, tuple)):
-                    out = out[0]
-                probs = torch.softmax(out, dim=-1).cpu().numpy()[0]
-                idx = int(np.argmax(probs))
-                conf = float(probs[idx])
-                state = STATE_MAPPING[idx] if idx < len(STATE_MAPPING) else 'unknown'
-                return state, conf
+            with stage('inference'):
+                logits = backend.run(np.asarray(features, dtype=np.float32))
+            # Softmax in numpy: backends other than eager return numpy logits
+            logits = logits - logits.max(axis=-1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=-1, keepdims=True)
+            return probs
         except Exception as e:
-            print(f"Prediction failed: {e}")
-            return 'unknown', 0.0
+            log.error(f"Prediction failed: {e}")
+            return None
@@ -0,0 +1,148 @@
+"""
+Classifier architectures trained in ml/saved_models/*.ipynb.
+
+The notebooks save `cnn_bn_final.pt` (and the other heads) as state_dicts,
+so the class definitions have to live here for the backend to rebuild the
+module. The architecture and its sizes are recovered from the parameter
+names and shapes.
+"""
+import re
+
+import torch
+import torch.nn as nn
+
+# HuBERT sequences the heads were trained on: (frames, hidden size)
+INPUT_SHAPE = (300, 768)
+
+
+class CNN1D_BN(nn.Module):
+    """CNN baseline + batch normalization (input: (batch, frames, 768))."""
+
+    def __init__(self, num_classes: int = 6):
+        super().__init__()
+        self.conv = nn.Sequential(
+            nn.Conv1d(768, 256, 5, padding=2),
+            nn.BatchNorm1d(256),
+            nn.ReLU(),
+            nn.Conv1d(256, 128, 5, padding=2),
+            nn.BatchNorm1d(128),
+            nn.ReLU(),
+            nn.AdaptiveAvgPool1d(1)
+        )
+        self.fc = nn.Linear(128, num_classes)
+
+    def forward(self, x):
+        x = x.transpose(1, 2)   # (B, 768, T)
+        x = self.conv(x).squeeze(-1)
+        return self.fc(x)
+
+
+class BiLSTM(nn.Module):
+    """BiLSTM head (and its Small / DeepDrop / Large variants); last time step -> fc."""
+
+    def __init__(self, num_classes: int = 6, hidden_size: int = 256, num_layers: int = 1, dropout: float = 0.0):
+        super().__init__()
+        self.lstm = nn.LSTM(768, hidden_size, num_layers=num_layers, batch_first=True,
+                            bidirectional=True, dropout=dropout if num_layers > 1 else 0.0)
+        self.fc = nn.Linear(2 * hidden_size, num_classes)
+
+    def forward(self, x):
+        out, _ = self.lstm(x)
+        out = out[:, -1, :]
+        return self.fc(out)
+
+
+class TransformerModel(nn.Module):
+    """Transformer encoder head (and its Small / Wide / Deep variants); mean pooling -> fc."""
+
+    def __init__(self, num_classes: int = 6, nhead: int = 8, dim_feedforward: int = 1024,
+                 num_layers: int = 2, activation: str = 'relu'):
+        super().__init__()
+        encoder_layer = nn.TransformerEncoderLayer(
+            d_model=768,
+            nhead=nhead,
+            batch_first=True,
+            dim_feedforward=dim_feedforward,
+            activation=activation,
+        )
+        self.tf = nn.TransformerEncoder(encoder_layer, num_layers=num_layers)
+        self.fc = nn.Linear(768, num_classes)
+
+    def forward(self, x):
+        out = self.tf(x)
+        out = out.mean(dim=1)   # average pooling
+        return self.fc(out)
+
+
+# Architecture names stored in `.weights` artifacts (see app.weights)
+ARCHITECTURES = {
+    'CNN1D_BN': CNN1D_BN,
+    'BiLSTM': BiLSTM,
+    'TransformerModel': TransformerModel,
+}
+
+
+def describe(module: nn.Module) -> tuple:
+    """(architecture name, constructor kwargs) that rebuild `module` from ARCHITECTURES."""
+    if isinstance(module, CNN1D_BN):
+        return 'CNN1D_BN', {'num_classes': module.fc.out_features}
+    if isinstance(module, BiLSTM):
+        lstm = module.lstm
+        return 'BiLSTM', {'num_classes': module.fc.out_features, 'hidden_size': lstm.hidden_size,
+                          'num_layers': lstm.num_layers, 'dropout': lstm.dropout}
+    if isinstance(module, TransformerModel):
+        layer = module.tf.layers[0]
+        activation = getattr(layer.activation, '__name__', 'relu')
+        return 'TransformerModel', {'num_classes': module.fc.out_features,
+                                    'nhead': layer.self_attn.num_heads,
+                                    'dim_feedforward': layer.linear1.out_features,
+                                    'num_layers': len(module.tf.layers),
+                                    'activation': activation}
+    raise ValueError(f"{type(module).__name__} is not a registered architecture")
+
+
+def build(architecture: str, config: dict, device='meta') -> nn.Module:
+    """Instantiate a registered architecture (by default on the meta device: no weight memory allocated)."""
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture {architecture!r} (expected one of {', '.join(ARCHITECTURES)})")
+    with torch.device(device):
+        return ARCHITECTURES[architecture](**config)
+
+
+def _count_layers(state: dict, pattern: str) -> int:
+    return len({m.group(1) for k in state for m in [re.match(pattern, k)] if m})
+
+
+def module_from_state_dict(state: dict, **kwargs) -> nn.Module:
+    """Rebuild the notebook architecture a state_dict was saved from.
+
+    Head count and activation are not recoverable from the weights and
+    default to the baseline Transformer (8 heads, relu); pass them as kwargs
+    for the other variants.
+    """
+    num_classes = state['fc.weight'].shape[0]
+    if 'conv.1.running_mean' in state:
+        module = CNN1D_BN(num_classes=num_classes)
+    elif 'lstm.weight_ih_l0' in state:
+        module = BiLSTM(num_classes=num_classes,
+                        hidden_size=state['lstm.weight_hh_l0'].shape[1],
+                        num_layers=_count_layers(state, r'lstm\.weight_ih_l(\d+)$'), **kwargs)
+    elif 'tf.layers.0.linear1.weight' in state:
+        module = TransformerModel(num_classes=num_classes,
+                                  dim_feedforward=state['tf.layers.0.linear1.weight'].shape[0],
+                                  num_layers=_count_layers(state, r'tf\.layers\.(\d+)\.'), **kwargs)
+    else:
+        raise ValueError("Unrecognised state_dict: expected a CNN1D_BN, BiLSTM or Transformer head")
+    module.load_state_dict(state)
+    return module
+
+
+def load_module(path: str, device='cpu') -> nn.Module:
+    """Load a saved model: a `.weights` artifact, a pickled nn.Module or a state_dict of a notebook head."""
+    from app import weights
+    if weights.is_weights_file(path):
+        return weights.load(path, device)
+    obj = torch.load(path, map_location=device, weights_only=False)
+    if isinstance(obj, dict):
+        obj = module_from_state_dict(obj.get('state_dict', obj))
+    return obj.to(device).eval()
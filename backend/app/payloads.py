@@ -0,0 +1,135 @@
+"""
+Response bodies for /preprocess/: JSON and compact binary representations.
+
+The endpoint negotiates one of MEDIA_TYPES from the Accept header:
+  - application/json (default): per-window MFCC means as nested float lists
+    and the preview WAV base64-encoded, as the frontend reads it
+  - application/vnd.auraldine.arrays (or application/octet-stream): an
+    ARRAYS_MAGIC tag, a little-endian uint32 header length, a JSON header
+    and the raw arrays, each ARRAY_ALIGN-aligned so a browser can view them
+    in place (new Float32Array(body, offset, n)). The header carries the
+    summary fields plus, per array, dtype, shape and offset from the start
+    of the array data
+  - application/x-npz: numpy's .npz (uncompressed), with the summary fields
+    as a JSON string in the `meta` member, for np.load(..., allow_pickle=False)
+In the binary formats mfcc_means is float32 (n_windows, n_mfcc) and the
+preview is the WAV file as uint8 bytes (`preview_wav`).
+
+`synthetic_wav` encodes speech-like audio the same way, for the startup
+warmup and for tools that need uploads without recordings (app.replay,
+app.loadgen, the benchmarks).
+"""
+import base64
+import io
+import json
+import struct
+
+import numpy as np
+
+JSON = 'application/json'
+ARRAYS = 'application/vnd.auraldine.arrays'
+NPZ = 'application/x-npz'
+# Server preference order (the first is the fallback when nothing matches)
+MEDIA_TYPES = (JSON, ARRAYS, 'application/octet-stream', NPZ)
+ARRAYS_MAGIC = b'ADARRAY1'
+ARRAY_ALIGN = 16
+
+
+def wav_bytes(y: np.ndarray, sr: int) -> bytes:
+    """Mono 16-bit PCM WAV of float audio in [-1, 1] (out-of-range samples are clipped)."""
+    pcm = (np.clip(np.asarray(y, dtype=np.float32), -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    header = struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + len(pcm), b'WAVE', b'fmt ', 16, 1, 1,
+                         int(sr), 2 * int(sr), 2, 16, b'data', len(pcm))
+    return header + pcm
+
+
+def synthetic_wav(seconds: float = 3.0, sr: int = 16000, seed: int = 0) -> bytes:
+    """Speech-like WAV: voiced bursts over a noise floor, burst rate and pitch drawn from `seed`."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(max(1, int(seconds * sr))) / sr
+    envelope = 0.05 + 0.8 * (np.sin(2 * np.pi * rng.uniform(2, 5) * t) > 0)
+    f0 = rng.uniform(100, 250) + 50 * np.sin(2 * np.pi * 0.5 * t)
+    return wav_bytes(envelope * (0.4 * np.sin(2 * np.pi * f0 * t) + 0.05 * rng.standard_normal(t.size)), sr)
+
+
+def _meta(summary: dict) -> dict:
+    return {
+        'sr': summary['sr'],
+        'original_samples': summary['original_samples'],
+        'num_segments': summary['num_segments'],
+        'num_windows': summary['num_windows'],
+        'vad': summary.get('vad'),
+    }
+
+
+def _preview(summary: dict):
+    first = summary.get('first_window')
+    return wav_bytes(first, summary['sr']) if summary['num_windows'] > 0 and first is not None else None
+
+
+def preprocess_json(summary: dict, preview: bool = True, windows: bool = True) -> dict:
+    """The JSON body; skipped parts are null."""
+    wav = _preview(summary) if preview else None
+    return {
+        **_meta(summary),
+        # mfcc_means is already plain lists
+        'mfcc_means': summary['mfcc_means'] if windows else None,
+        'preview_wav_b64': base64.b64encode(wav).decode('ascii') if wav is not None else None,
+    }
+
+
+def preprocess_arrays(summary: dict, preview: bool = True, windows: bool = True) -> tuple:
+    """(summary fields, {name: ndarray}) for the binary formats; skipped parts are left out."""
+    arrays = {}
+    if windows:
+        means = summary['mfcc_means']
+        arrays['mfcc_means'] = (np.asarray(means, dtype='<f4').reshape(len(means), -1) if len(means)
+                                else np.zeros((0, 13), dtype='<f4'))
+    wav = _preview(summary) if preview else None
+    if wav is not None:
+        arrays['preview_wav'] = np.frombuffer(wav, dtype=np.uint8)
+    return _meta(summary), arrays
+
+
+def pack(meta: dict, arrays: dict) -> bytes:
+    """Encode as application/vnd.auraldine.arrays."""
+    specs, offset = {}, 0
+    for name, a in arrays.items():
+        specs[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset += -(-a.nbytes // ARRAY_ALIGN) * ARRAY_ALIGN
+    header = json.dumps({**meta, 'arrays': specs}, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(len(ARRAYS_MAGIC) + 4 + len(header)) % ARRAY_ALIGN)
+    body = bytearray(len(ARRAYS_MAGIC) + 4 + len(header) + offset)
+    body[:len(ARRAYS_MAGIC)] = ARRAYS_MAGIC
+    body[len(ARRAYS_MAGIC):len(ARRAYS_MAGIC) + 4] = len(header).to_bytes(4, 'little')
+    base = len(ARRAYS_MAGIC) + 4
+    body[base:base + len(header)] = header
+    base += len(header)
+    for name, a in arrays.items():
+        start = base + specs[name]['offset']
+        body[start:start + a.nbytes] = np.ascontiguousarray(a).tobytes()
+    return bytes(body)
+
+
+def unpack(body: bytes) -> tuple:
+    """Decode application/vnd.auraldine.arrays into (summary fields, {name: ndarray})."""
+    if body[:len(ARRAYS_MAGIC)] != ARRAYS_MAGIC:
+        raise ValueError('Not an arrays payload')
+    length = int.from_bytes(body[len(ARRAYS_MAGIC):len(ARRAYS_MAGIC) + 4], 'little')
+    base = len(ARRAYS_MAGIC) + 4
+    meta = json.loads(body[base:base + length])
+    base += length
+    arrays = {}
+    for name, spec in meta.pop('arrays').items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(body, dtype=dtype, count=count,
+                                     offset=base + spec['offset']).reshape(spec['shape'])
+    return meta, arrays
+
+
+def npz(meta: dict, arrays: dict) -> bytes:
+    """Encode as an uncompressed .npz with the summary fields in `meta`."""
+    buf = io.BytesIO()
+    np.savez(buf, meta=np.array(json.dumps(meta)), **arrays)
+    return buf.getvalue()
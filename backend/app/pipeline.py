@@ -0,0 +1,262 @@
+"""
+Request pipeline stages (decode -> features -> inference) as plain functions.
+
+These run inside the executor configured in app.executor, so they must be
+module-level and only take/return picklable values. Each process keeps its
+own ModelService: the web process registers the one created in app.routes,
+process-pool workers load (and warm) their own once in `init_worker`. Each stage
+consults the per-process content-addressed cache (app.cache) first. Entry
+points return their stage timings under 'timings' (see app.metrics).
+"""
+import os
+
+import numpy as np
+
+from app.cache import PipelineCache, content_digest
+from app.config import settings
+from app.metrics import stage, timed_stages
+from app.model_service import ModelService
+from app.uploads import UploadTooLarge
+from app.utils import read_audio_bytes, preprocess_audio, extract_mfcc
+
+_model_service = None
+_cache = None
+# Audio decoded past UPLOAD_MAX_SECONDS to tell a clip at the limit from a longer one
+UPLOAD_CAP_MARGIN = 0.25
+
+
+def set_model_service(service: ModelService):
+    """Use an already-loaded ModelService for in-process stages."""
+    global _model_service
+    _model_service = service
+
+
+def get_model_service() -> ModelService:
+    global _model_service
+    if _model_service is None:
+        _model_service = ModelService()
+        _model_service.load_model()
+    return _model_service
+
+
+def get_cache():
+    """Per-process PipelineCache, or None when CACHE_ENABLED=0."""
+    global _cache
+    if _cache is None and settings.CACHE_ENABLED:
+        _cache = PipelineCache()
+    return _cache
+
+
+def preprocess_mode(fast: bool) -> str:
+    """Cache-key component describing how features were produced.
+
+    Covers every setting that changes the decoded waveform (rate, resampler,
+    ffmpeg decode at the target rate) as well as the feature settings.
+    """
+    decode = (f"sr={settings.SAMPLE_RATE}:rs={settings.RESAMPLE_QUALITY}"
+              f":dec={'target' if settings.DECODE_AT_TARGET_RATE else 'native'}")
+    if settings.FEATURE_TYPE == 'hubert':
+        # HuBERT sequences do not depend on the fast/full MFCC pipeline or VAD
+        return (f"hubert:{decode}:layer={settings.HUBERT_LAYER}"
+                f":frames={settings.HUBERT_MAX_FRAMES}:dir={settings.HUBERT_MODEL_DIR}")
+    vad = settings.VAD_FAST if fast else settings.VAD_FULL
+    if vad != 'off':
+        vad = f"{vad}@{settings.VAD_MIN_SPEECH_RATIO}"
+    mode = f"{'fast' if fast else 'full'}:{decode}:win=1.0:n_mfcc=13:vad={vad}"
+    if not fast:
+        # The full pipeline averages over seeded augmented variants
+        mode += f":aug={settings.AUGMENT_VARIANTS}@{settings.AUGMENT_SEED}"
+    return mode
+
+
+def init_worker(warm: bool = False):
+    """Process-pool initializer: load the model once per worker process.
+
+    With `warm` the preprocessing warmup runs here too, so every worker
+    process warms exactly once, before it takes its first job.
+    """
+    import torch
+    # N worker processes each running N intra-op threads would oversubscribe the CPU
+    torch.set_num_threads(1)
+    get_model_service()
+    if settings.FEATURE_TYPE == 'hubert':
+        from app.hubert import get_hubert_extractor
+        get_hubert_extractor()
+    if warm:
+        from app.startup import warm_pipeline
+        warm_pipeline()
+
+
+def worker_pid() -> int:
+    """Process-pool job used at startup to make the pool start (and initialize) a worker."""
+    return os.getpid()
+
+
+def decode_upload(contents: bytes, digest: str = None, max_seconds: float = None, cap_seconds: float = None):
+    """Decode uploaded bytes to (y, sr), using the audio cache tier.
+
+    With `max_seconds` only the start of the upload is decoded (and cached
+    separately from the full decode). With `cap_seconds` (the HTTP routes
+    pass UPLOAD_MAX_SECONDS) decoding stops just past it, and a clip longer
+    than that raises UploadTooLarge; CLI callers leave it unset.
+    """
+    cap = cap_seconds or 0
+    if cap > 0 and (max_seconds is None or max_seconds > cap):
+        y, sr = _decode_upload(contents, digest, cap + UPLOAD_CAP_MARGIN)
+        if len(y) > int(np.ceil(cap * sr)):
+            raise UploadTooLarge(f"Audio is longer than the {cap:g}s limit")
+        return y, sr
+    return _decode_upload(contents, digest, max_seconds)
+
+
+def _decode_upload(contents: bytes, digest: str = None, max_seconds: float = None):
+    cache = get_cache()
+    if cache is None:
+        return read_audio_bytes(contents, max_seconds=max_seconds)
+    key = (digest or content_digest(contents), settings.SAMPLE_RATE, settings.RESAMPLE_QUALITY,
+           settings.DECODE_AT_TARGET_RATE, max_seconds)
+    hit = cache.audio.get(key)
+    if hit is not None:
+        return hit
+    y, sr = read_audio_bytes(contents, max_seconds=max_seconds)
+    # Cached waveforms are shared between requests, so guard against in-place edits
+    y.setflags(write=False)
+    cache.audio.put(key, (y, sr))
+    return y, sr
+
+
+@timed_stages
+def featurize_upload(contents: bytes, fast: bool = None, digest: str = None,
+                     cap_seconds: float = None) -> dict:
+    """Decode uploaded bytes and build the model input.
+
+    That is the pooled MFCC vector, or the (300, 768) HuBERT sequence when
+    settings.FEATURE_TYPE is 'hubert'.
+    """
+    fast = settings.FAST_PREPROCESS if fast is None else fast
+    cache = get_cache()
+    if cache is not None:
+        digest = digest or content_digest(contents)
+        key = ('features', digest, preprocess_mode(fast))
+        hit = cache.features.get(key)
+        if hit is not None:
+            return dict(hit)
+
+    y, sr = decode_upload(contents, digest, cap_seconds=cap_seconds)
+
+    if settings.FEATURE_TYPE == 'hubert':
+        from app.hubert import get_hubert_extractor
+        with stage('hubert'):
+            features = get_hubert_extractor()(y, sr)
+        result = {
+            'audio_shape': tuple(y.shape),
+            'sr': int(sr),
+            'features': features,
+        }
+        if cache is not None:
+            cache.features.put(key, dict(result))
+        return result
+
+    # Run preprocessing pipeline to obtain windows and per-window MFCC means
+    summary = preprocess_audio(y, sr, window_sec=1.0, n_mfcc=13, fast=fast)
+
+    # If we have per-window embeddings, average them to form final features
+    mfcc_means = summary.get('mfcc_means', [])
+    if len(mfcc_means) > 0:
+        features = np.mean(np.array(mfcc_means), axis=0)
+    else:
+        # Fallback to existing extract_mfcc which returns an aggregated vector
+        features = extract_mfcc(y, sr=sr, n_mfcc=13, fast=fast)
+
+    result = {
+        'audio_shape': tuple(y.shape),
+        'sr': int(sr),
+        'num_segments': summary.get('num_segments'),
+        'num_windows': summary.get('num_windows'),
+        'vad': summary.get('vad'),
+        'features': np.asarray(features),
+    }
+    if cache is not None:
+        cache.features.put(key, dict(result))
+    return result
+
+
+@timed_stages
+def predict_upload(contents: bytes, fast: bool = None, digest: str = None,
+                   cap_seconds: float = None) -> dict:
+    """Decode, featurize and classify one upload in the current process."""
+    fast = settings.FAST_PREPROCESS if fast is None else fast
+    cache = get_cache()
+    service = get_model_service()
+    if cache is not None:
+        digest = digest or content_digest(contents)
+        key = (digest, preprocess_mode(fast), service.model_version)
+        hit = cache.predictions.get(key)
+        if hit is not None:
+            return dict(hit)
+
+    result = featurize_upload(contents, fast=fast, digest=digest, cap_seconds=cap_seconds)
+    state, confidence = service.predict_from_features(result['features'])
+    result['state'] = state
+    result['confidence'] = float(confidence)
+    if cache is not None and state != 'unknown':
+        cache.predictions.put(key, dict(result))
+    return result
+
+
+@timed_stages
+def anytime_upload(contents: bytes, fast: bool = None, digest: str = None,
+                   cap_seconds: float = None) -> dict:
+    """Classify an upload from as few windows as it takes (see app.anytime)."""
+    from app.anytime import anytime_predict
+    fast = settings.FAST_PREPROCESS if fast is None else fast
+    cache = get_cache()
+    service = get_model_service()
+    if cache is not None:
+        digest = digest or content_digest(contents)
+        key = ('anytime', digest, preprocess_mode(fast), service.model_version, settings.ANYTIME_MARGIN,
+               settings.ANYTIME_PATIENCE, settings.ANYTIME_MAX_SECONDS)
+        hit = cache.predictions.get(key)
+        if hit is not None:
+            return dict(hit)
+
+    max_seconds = settings.ANYTIME_MAX_SECONDS or None
+    y, sr = decode_upload(contents, digest, max_seconds=max_seconds, cap_seconds=cap_seconds)
+    # A decode that filled the budget (to within one sample) was cut short
+    truncated = max_seconds is not None and len(y) >= int(max_seconds * sr) - 1
+    result = anytime_predict(y, sr, service, fast=fast, truncated=truncated)
+    result.update({'audio_shape': tuple(y.shape), 'sr': int(sr)})
+    if cache is not None and result['state'] != 'unknown':
+        cache.predictions.put(key, dict(result))
+    return result
+
+
+@timed_stages
+def preprocess_upload(contents: bytes, fast: bool = None, digest: str = None,
+                      cap_seconds: float = None) -> dict:
+    """Preprocessing summary for /preprocess/.
+
+    Only the first window is returned (for the WAV preview) so process-pool
+    workers do not ship every window back to the web process.
+    """
+    fast = settings.FAST_PREPROCESS if fast is None else fast
+    cache = get_cache()
+    if cache is not None:
+        digest = digest or content_digest(contents)
+        key = ('summary', digest, preprocess_mode(fast))
+        hit = cache.features.get(key)
+        if hit is not None:
+            return dict(hit)
+
+    y, sr = decode_upload(contents, digest, cap_seconds=cap_seconds)
+    summary = preprocess_audio(y, sr, window_sec=1.0, n_mfcc=13, fast=fast)
+    windows = summary.pop('windows')
+    summary['first_window'] = windows[0] if windows else None
+    if cache is not None:
+        cache.features.put(key, dict(summary))
+    return summary
+
+
+def cache_stats() -> dict:
+    cache = get_cache()
+    return cache.stats() if cache is not None else {}
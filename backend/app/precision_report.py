@@ -0,0 +1,156 @@
+"""
+Compare reduced-precision inference modes against fp32.
+
+Usage (from backend/):
+    python -m app.precision_report /data/hubert_sequences
+    python -m app.precision_report /data/hubert_sequences --model ../ml/saved_models/cnn_bn_final.pt \
+        --modes fp32 int8 bf16 --json precision.json
+
+The folder holds HuBERT sequences saved as `.pt` tensors or `.npy` arrays of
+shape (frames, 768), padded/cropped to 300 frames like the training
+notebooks. Labels come from the file name in the same way as the notebooks'
+SeqDataset (e.g. `kerala_0012.pt`); unlabeled files still count towards
+drift. Each mode runs in a fresh process so resident memory is not
+shared between modes. Reported per mode:
+  - accuracy on the labeled files
+  - agreement with fp32 top-1 and max/mean |probability - fp32 probability|
+  - latency (p50/p95 ms) at batch size 1 and --batch-size
+  - RSS after loading the model and peak RSS
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.datasets import find_sequences, label_for, load_sequence
+from app.models import INPUT_SHAPE
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def latency_ms(backend, x: np.ndarray, repeats: int):
+    backend.run(x)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend.run(x)
+        times.append(1000.0 * (time.perf_counter() - start))
+    return {'p50': float(np.percentile(times, 50)), 'p95': float(np.percentile(times, 95))}
+
+
+def measure_mode(model_path: str, precision: str, files, batch_size: int, repeats: int, threads: int) -> dict:
+    """Runs in a child process: load the model at `precision` and score every file."""
+    import torch
+    from app.inference import load_backend
+    torch.set_num_threads(threads)
+    base_rss = rss_mb()
+    started = time.perf_counter()
+    backend = load_backend('eager', model_path, 'cpu', precision)
+    load_ms = 1000.0 * (time.perf_counter() - started)
+    model_rss = rss_mb() - base_rss
+
+    probs = []
+    for i in range(0, len(files), batch_size):
+        batch = np.stack([load_sequence(Path(f)) for f in files[i:i + batch_size]])
+        probs.append(softmax(backend.run(batch)))
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(batch_size,) + INPUT_SHAPE).astype(np.float32)
+    return {
+        'precision': precision,
+        'probs': np.concatenate(probs) if probs else np.zeros((0, 0)),
+        'load_ms': load_ms,
+        'latency_ms': {'1': latency_ms(backend, x[:1], repeats), str(batch_size): latency_ms(backend, x, repeats)},
+        'model_rss_mb': model_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def fmt(value, spec: str) -> str:
+    return format(value, spec) if value is not None else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Accuracy drift, latency and memory per inference precision.')
+    parser.add_argument('data_dir', type=Path)
+    parser.add_argument('--model', type=Path, default=Path(settings.MODEL_PATH))
+    parser.add_argument('--modes', nargs='+', choices=['fp32', 'int8', 'bf16'], default=['fp32', 'int8', 'bf16'])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--json', type=Path, help='also write the report here')
+    args = parser.parse_args(argv)
+
+    if not args.model.exists():
+        print(f"[PRECISION] Model file not found: {args.model}")
+        return 1
+    files = [str(p) for p in find_sequences(args.data_dir)]
+    labels = np.array([-1 if label_for(Path(f).name) is None else label_for(Path(f).name) for f in files])
+    print(f"[PRECISION] {len(files)} sequences ({int((labels >= 0).sum())} labeled) from {args.data_dir}")
+    modes = ['fp32'] + [m for m in args.modes if m != 'fp32']
+
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for mode in modes:
+        with ctx.Pool(1) as pool:
+            results[mode] = pool.apply(measure_mode, (str(args.model), mode, files, args.batch_size,
+                                                      args.repeats, args.threads))
+
+    reference = results['fp32']['probs']
+    labeled = labels >= 0
+    report = []
+    print(f"{'mode':<6} {'acc':>6} {'agree':>6} {'max|dp|':>8} {'mean|dp|':>9} "
+          f"{'p50@1':>8} {'p50@' + str(args.batch_size):>8} {'load ms':>8} {'model MB':>9} {'peak MB':>8}")
+    for mode in modes:
+        r = results[mode]
+        probs = r['probs']
+        row = {
+            'mode': mode,
+            'files': len(files),
+            'accuracy': float((probs.argmax(1)[labeled] == labels[labeled]).mean()) if labeled.any() else None,
+            'agreement': float((probs.argmax(1) == reference.argmax(1)).mean()) if len(files) else None,
+            'max_prob_diff': float(np.abs(probs - reference).max()) if len(files) else None,
+            'mean_prob_diff': float(np.abs(probs - reference).mean()) if len(files) else None,
+            'latency_ms': r['latency_ms'],
+            'load_ms': r['load_ms'],
+            'model_rss_mb': r['model_rss_mb'],
+            'peak_rss_mb': r['peak_rss_mb'],
+        }
+        report.append(row)
+        print(f"{mode:<6} {fmt(row['accuracy'], '6.3f'):>6} {fmt(row['agreement'], '6.3f'):>6} "
+              f"{fmt(row['max_prob_diff'], '8.4f'):>8} {fmt(row['mean_prob_diff'], '9.5f'):>9} "
+              f"{r['latency_ms']['1']['p50']:>8.2f} {r['latency_ms'][str(args.batch_size)]['p50']:>8.2f} "
+              f"{r['load_ms']:>8.0f} {r['model_rss_mb']:>9.1f} {r['peak_rss_mb']:>8.1f}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
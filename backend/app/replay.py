@@ -0,0 +1,261 @@
+"""
+Replay captured /predict/ traffic and compare latency between builds.
+
+Usage (from backend/):
+    python -m app.replay run traces.jsonl --url http://localhost:5000 --audio-dir spool --out build_a.json
+    python -m app.replay run traces.jsonl --url http://localhost:5000 --speed 4 --out build_b.json
+    python -m app.replay run traces.jsonl --in-process --limit 200 --out local.json
+    python -m app.replay compare build_a.json build_b.json [--fail-over 0.1]
+
+`run` re-drives a trace file written with TRACE_FILE (see app.traces) open
+loop: request i is sent at its original offset from the first arrival,
+divided by --speed (2 = twice the original rate; 0 = back to back). At most
+--max-in-flight requests are outstanding; a request that had to wait for a
+slot reports the delay as `lag_ms`. The upload is the spooled audio
+(TRACE_AUDIO_DIR) when present, otherwise a synthetic speech-like WAV of the
+recorded duration (--no-synthesize skips such requests). --in-process
+drives this checkout's app through ASGI instead of over HTTP. Replayed
+uploads are byte-identical, so point it at a freshly started server (or one
+with CACHE_ENABLED=0) and keep TRACE_FILE off there.
+
+`compare` prints client latency and the server's own duration_ms for two
+runs (a trace file can stand in for the production run) at p50/p90/p95/p99,
+the median per-request ratio, and a two-sample Kolmogorov-Smirnov test. With
+--fail-over it exits 1 when B's p95 latency is more than that fraction above A's.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app import payloads
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def load_traces(path: Path, limit: int = None) -> List[dict]:
+    traces = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                continue  # a torn last line from a running server
+            if trace.get('endpoint', '/predict/') == '/predict/':
+                traces.append(trace)
+    traces.sort(key=lambda t: t['ts'])
+    return traces[:limit] if limit else traces
+
+
+def payload_for(trace: dict, audio_dir: Optional[Path], synthesize: bool) -> Optional[bytes]:
+    if audio_dir is not None:
+        name = trace.get('audio') or f"{trace['digest']}.{trace.get('container', 'wav')}"
+        path = audio_dir / name
+        if path.exists():
+            return path.read_bytes()
+    if synthesize and trace.get('audio_seconds'):
+        seed = int(trace['digest'][:8], 16) if trace.get('digest') else 0
+        return payloads.synthetic_wav(trace['audio_seconds'], seed=seed)
+    return None
+
+
+def summarize(values, elapsed: float = None) -> dict:
+    values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    if values.size == 0:
+        return {'count': 0}
+    out = {'count': int(values.size), 'mean': round(float(values.mean()), 2), 'max': round(float(values.max()), 2)}
+    for p in PERCENTILES:
+        out[f'p{p}'] = round(float(np.percentile(values, p)), 2)
+    if elapsed:
+        out['rps'] = round(values.size / elapsed, 2)
+    return out
+
+
+async def replay(traces: List[dict], client, speed: float = 1.0, max_in_flight: int = 64,
+                 audio_dir: Path = None, synthesize: bool = True) -> dict:
+    """Send every trace's upload to `client` (an httpx.AsyncClient) on the trace's schedule."""
+    t0 = traces[0]['ts'] if traces else 0.0
+    slots = asyncio.Semaphore(max(1, max_in_flight))
+    rows, tasks = [], []
+    skipped = 0
+
+    async def send(i, trace, data, scheduled):
+        sent = time.perf_counter()
+        row = {'i': i, 'digest': trace.get('digest'), 'bytes': len(data), 'audio_seconds': trace.get('audio_seconds'),
+               'scheduled_ms': round(1000.0 * scheduled, 1), 'lag_ms': round(1000.0 * (sent - start - scheduled), 1),
+               'original_ms': trace.get('duration_ms')}
+        try:
+            response = await client.post('/predict/', files={'file': (f"{trace.get('digest', i)}."
+                                                                     f"{trace.get('container', 'wav')}",
+                                                                     data, 'application/octet-stream')})
+            row['status'] = response.status_code
+            if response.status_code == 200:
+                row['server_ms'] = response.json().get('duration_ms')
+        except Exception as e:
+            row['status'] = None
+            row['error'] = str(e)
+        finally:
+            slots.release()
+        row['latency_ms'] = round(1000.0 * (time.perf_counter() - sent), 2)
+        rows.append(row)
+
+    start = time.perf_counter()
+    for i, trace in enumerate(traces):
+        data = payload_for(trace, audio_dir, synthesize)
+        if data is None:
+            skipped += 1
+            continue
+        scheduled = (trace['ts'] - t0) / speed if speed > 0 else 0.0
+        delay = start + scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await slots.acquire()
+        tasks.append(asyncio.ensure_future(send(i, trace, data, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    rows.sort(key=lambda r: r['i'])
+    ok = [r for r in rows if r.get('status') == 200]
+    return {
+        'summary': {
+            'sent': len(rows),
+            'skipped': skipped,
+            'errors': len(rows) - len(ok),
+            'seconds': round(elapsed, 3),
+            'latency_ms': summarize([r['latency_ms'] for r in ok], elapsed),
+            'server_ms': summarize([r.get('server_ms') for r in ok]),
+            'lag_ms': summarize([r['lag_ms'] for r in rows]),
+        },
+        'requests': rows,
+    }
+
+
+def load_run(path: Path) -> dict:
+    """A replay result, or a trace file (its recorded durations as the latencies)."""
+    try:
+        run = json.loads(Path(path).read_text(encoding='utf-8'))
+        if isinstance(run, dict) and 'requests' in run:
+            return run
+    except ValueError:
+        pass  # JSON lines
+    rows = [{'i': i, 'digest': t.get('digest'), 'status': t.get('status'),
+             'latency_ms': t.get('duration_ms'), 'server_ms': t.get('duration_ms')}
+            for i, t in enumerate(load_traces(path))]
+    return {'meta': {'label': Path(path).name}, 'requests': rows}
+
+
+def compare(a: dict, b: dict, field: str = 'latency_ms') -> dict:
+    from scipy.stats import ks_2samp
+    ok_a = {r['i']: r[field] for r in a['requests'] if r.get('status') == 200 and r.get(field) is not None}
+    ok_b = {r['i']: r[field] for r in b['requests'] if r.get('status') == 200 and r.get(field) is not None}
+    out = {'a': summarize(list(ok_a.values())), 'b': summarize(list(ok_b.values()))}
+    common = sorted(set(ok_a) & set(ok_b))
+    ratios = [ok_b[i] / ok_a[i] for i in common if ok_a[i] > 0]
+    out['paired'] = len(common)
+    out['median_ratio'] = round(float(np.median(ratios)), 3) if ratios else None
+    if ok_a and ok_b:
+        ks = ks_2samp(list(ok_a.values()), list(ok_b.values()))
+        out['ks_statistic'], out['ks_pvalue'] = round(float(ks.statistic), 4), float(ks.pvalue)
+    return out
+
+
+def print_comparison(name_a: str, name_b: str, field: str, result: dict):
+    print(f"\n{field}: A={name_a}  B={name_b}")
+    print(f"{'':>6} {'A':>10} {'B':>10} {'change':>8}")
+    for key in ['count', 'mean'] + [f'p{p}' for p in PERCENTILES] + ['max']:
+        va, vb = result['a'].get(key), result['b'].get(key)
+        if va is None or vb is None:
+            continue
+        change = f"{(vb - va) / va:+.1%}" if key != 'count' and va else ''
+        print(f"{key:>6} {va:>10} {vb:>10} {change:>8}")
+    if result.get('median_ratio') is not None:
+        print(f"paired requests {result['paired']}, median B/A {result['median_ratio']}")
+    if 'ks_statistic' in result:
+        print(f"KS statistic {result['ks_statistic']} (p={result['ks_pvalue']:.3g})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay captured /predict/ traffic and compare builds.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run', help='re-drive a trace file against a server')
+    p.add_argument('traces', type=Path)
+    p.add_argument('--url', default='http://localhost:5000')
+    p.add_argument('--in-process', action='store_true', help="drive this checkout's app through ASGI")
+    p.add_argument('--speed', type=float, default=1.0, help='rate multiplier (0 = back to back)')
+    p.add_argument('--max-in-flight', type=int, default=64)
+    p.add_argument('--audio-dir', type=Path, help='TRACE_AUDIO_DIR of the capture')
+    p.add_argument('--no-synthesize', action='store_true', help='skip traces whose audio was not spooled')
+    p.add_argument('--limit', type=int)
+    p.add_argument('--timeout', type=float, default=120.0)
+    p.add_argument('--label', help='name for this run in comparisons (default: the output file name)')
+    p.add_argument('--out', type=Path)
+    p = sub.add_parser('compare', help='compare the latency distributions of two runs')
+    p.add_argument('a', type=Path)
+    p.add_argument('b', type=Path)
+    p.add_argument('--fail-over', type=float, help='exit 1 if B p95 latency exceeds A by this fraction')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        a, b = load_run(args.a), load_run(args.b)
+        name_a = a.get('meta', {}).get('label') or args.a.name
+        name_b = b.get('meta', {}).get('label') or args.b.name
+        latency = compare(a, b, 'latency_ms')
+        print_comparison(name_a, name_b, 'latency_ms', latency)
+        print_comparison(name_a, name_b, 'server_ms', compare(a, b, 'server_ms'))
+        if args.fail_over is not None and latency['a'].get('p95') and latency['b'].get('p95'):
+            if latency['b']['p95'] > latency['a']['p95'] * (1 + args.fail_over):
+                print(f"\nB p95 is more than {args.fail_over:.0%} above A")
+                return 1
+        return 0
+
+    try:
+        import httpx
+    except ImportError:
+        print("app.replay needs httpx to send requests: pip install httpx")
+        return 2
+    traces = load_traces(args.traces, args.limit)
+    if not traces:
+        print(f"No /predict/ traces in {args.traces}")
+        return 1
+    span = traces[-1]['ts'] - traces[0]['ts']
+    print(f"Replaying {len(traces)} requests (captured over {span:.1f}s) at speed {args.speed:g}"
+          + (" in-process" if args.in_process else f" against {args.url}"))
+    if args.in_process:
+        from app.main import app
+        transport, base_url = httpx.ASGITransport(app=app), 'http://replay'
+    else:
+        transport, base_url = None, args.url
+
+    async def go():
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+            return await replay(traces, client, speed=args.speed, max_in_flight=args.max_in_flight,
+                                audio_dir=args.audio_dir, synthesize=not args.no_synthesize)
+
+    result = asyncio.run(go())
+    result['meta'] = {
+        'label': args.label or (args.out.stem if args.out else None),
+        'traces': str(args.traces), 'target': 'in-process' if args.in_process else args.url,
+        'speed': args.speed, 'max_in_flight': args.max_in_flight,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    summary = result['summary']
+    print(f"Sent {summary['sent']} ({summary['skipped']} skipped, {summary['errors']} errors) "
+          f"in {summary['seconds']}s")
+    for key in ('latency_ms', 'server_ms', 'lag_ms'):
+        stats = summary[key]
+        if stats.get('count'):
+            print(f"  {key:<11} " + ' '.join(f"p{p}={stats[f'p{p}']}" for p in PERCENTILES)
+                  + f" max={stats['max']}")
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2))
+        print(f"Wrote {args.out}")
+    return 0 if summary['sent'] and not summary['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
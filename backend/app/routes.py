@@ -1,15 +1,32 @@
+import asyncio
 import time
 import json
 import os
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from typing import List
+
+import numpy as np
+from fastapi import APIRouter, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from app.model_service import ModelService
 from app.config import settings
-from app.utils import read_audio_bytes, extract_mfcc
+from app import executor, metrics, payloads, pipeline, traces, uploads
+from app.archives import archive_kind, iter_archive_members
+from app.cache import content_digest
+from app.http_cache import PreparedJSON, json_response, negotiate_media_type
+from app.logs import get_logger
+from app.startup import StartupState
+from app.streaming import StreamingFeatureState
+from app.uploads import UploadTooLarge
+from app.utils import sniff_container
 
 router = APIRouter()
+log = get_logger('routes')
 model_service = ModelService()
-model_service.load_model()
+# The model is loaded (and warmed up) by startup_state.start() from the app's startup event
+startup_state = StartupState()
+if settings.BATCH_INFERENCE:
+    model_service.enable_batching()
+pipeline.set_model_service(model_service)
 
 # Load image URIs from JSON file
 def load_image_uris():
@@ -21,7 +38,7 @@ def load_image_uris():
             with open(image_uri_path, 'r') as f:
                 return json.load(f)
     except Exception as e:
-        print(f"Warning: Could not load image_uris.json: {e}")
+        log.warning(f"Could not load image_uris.json: {e}")
     return {}
 
 IMAGE_URIS = load_image_uris()
@@ -157,44 +174,76 @@ if _available_images:
 
 
 
+async def _ready() -> bool:
+    """Wait (up to READY_WAIT_SECONDS) for the model to be loaded and warmed up.
+
+    A failed startup answers at once; start() retries it after a backoff.
+    """
+    startup_state.start(model_service)
+    if startup_state.ready:
+        return True
+    if startup_state.phase == 'failed':
+        return False
+    return await asyncio.to_thread(startup_state.wait, settings.READY_WAIT_SECONDS)
+
+
+def _not_ready():
+    return HTTPException(status_code=503, detail=f"Model is not ready ({startup_state.phase})",
+                         headers={"Retry-After": "5"})
+
+
+@router.get("/health/live")
+def health_live():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+def health_ready():
+    """Readiness: model loaded and warmup finished. 503 until then."""
+    snapshot = startup_state.snapshot()
+    return JSONResponse(snapshot, status_code=200 if startup_state.ready else 503)
+
+
 @router.post("/predict/")
 async def predict(file: UploadFile = File(...)):
     """Accept an uploaded audio file and return predicted language and confidence."""
     start_time = time.time()
+    if not await _ready():
+        raise _not_ready()
+    contents, digest, audio_seconds = b'', None, None
     try:
         if not file.filename:
             raise ValueError("No file uploaded")
         
-        contents = await file.read()
+        contents = await asyncio.to_thread(uploads.read_upload, file)
         if not contents:
             raise ValueError("File is empty")
         
-        print(f"[PREDICT] Received {len(contents)} bytes from {file.filename}")
-        
-        # Read audio bytes
-        y, sr = read_audio_bytes(contents)
-        print("Received audio:", file.filename)
-        print(f"[PREDICT] Audio loaded: {y.shape}, sr={sr}")
-
-        # Run preprocessing pipeline to obtain windows and per-window MFCC means
-        from app.utils import preprocess_audio
-        summary = preprocess_audio(y, sr, window_sec=1.0, n_mfcc=13, fast=settings.FAST_PREPROCESS)
-        print("Processed segments:", summary.get('num_segments'))
-        print("Processed windows:", summary.get('num_windows'))
-
-        # If we have per-window embeddings, average them to form final features
-        mfcc_means = summary.get('mfcc_means', [])
-        import numpy as _np
-        if len(mfcc_means) > 0:
-            features = _np.mean(_np.array(mfcc_means), axis=0)
+        # Decode, preprocess and (unless micro-batching) classify off the event loop
+        digest = content_digest(contents)
+        cap = uploads.max_seconds()
+        anytime = settings.ANYTIME_INFERENCE and settings.FEATURE_TYPE == 'mfcc'
+        if anytime:
+            # Several small forward passes per request, so this bypasses the micro-batcher
+            result = await executor.run(pipeline.anytime_upload, contents, settings.FAST_PREPROCESS, digest, cap)
+        elif model_service.batcher is not None:
+            result = await executor.run(pipeline.featurize_upload, contents, settings.FAST_PREPROCESS, digest, cap)
         else:
-            # Fallback to existing extract_mfcc which returns an aggregated vector
-            features = extract_mfcc(y, sr=sr, n_mfcc=13, fast=settings.FAST_PREPROCESS)
-
-        print(f"[PREDICT] Features prepared: shape={getattr(features, 'shape', None)}")
+            result = await executor.run(pipeline.predict_upload, contents, settings.FAST_PREPROCESS, digest, cap)
+        timings = result.pop('timings', None) or {}
+        audio_seconds = result['audio_shape'][0] / float(result['sr'])
+        metrics.AUDIO_SECONDS.observe(audio_seconds, endpoint='predict')
+        features = result['features']
 
-        state, confidence = model_service.predict_from_features(_np.asarray(features))
-        print("Final prediction:", state, confidence)
+        if model_service.batcher is not None and not anytime:
+            # Join a micro-batch with other in-flight requests (queue wait + shared forward pass)
+            batch_started = time.perf_counter()
+            state, confidence = await asyncio.wrap_future(model_service.batcher.submit(features))
+            timings['batched_inference'] = time.perf_counter() - batch_started
+        else:
+            state, confidence = result['state'], result['confidence']
+        seconds_used = result['seconds_used'] if 'seconds_used' in result else round(audio_seconds, 3)
         
         # Get language from state
         language = STATE_LANGUAGES.get(state, "Unknown")
@@ -202,89 +251,384 @@ async def predict(file: UploadFile = File(...)):
         
         # Calculate processing time
         duration_ms = int((time.time() - start_time) * 1000)
-        print(f"[PREDICT] Processing time: {duration_ms}ms")
+        startup_state.record_request(duration_ms)
 
-        return JSONResponse({
-            "language": language,
-            "confidence": float(confidence),
-            "duration_ms": duration_ms,
-            "state": state,
-            "cuisines": cuisines
-        })
+        fields = {
+            'file': file.filename, 'bytes': len(contents), 'audio_seconds': round(audio_seconds, 3),
+            'windows': result.get('num_windows'), 'state': state, 'confidence': round(float(confidence), 4),
+            'duration_ms': duration_ms,
+        }
+        vad = result.get('vad') or {}
+        if vad.get('mode', 'off') != 'off':
+            fields.update(vad=vad['mode'], vad_removed_seconds=vad['removed_seconds'],
+                          vad_windows_removed=vad['windows_removed'])
+        if 'stopped' in result:
+            fields.update(anytime_stopped=result['stopped'], seconds_used=seconds_used,
+                          windows_used=result['windows_used'])
+        log.info("Prediction", extra=fields)
+
+        with metrics.collect() as route_timings, metrics.stage('serialization'):
+            response = JSONResponse({
+                "language": language,
+                "confidence": float(confidence),
+                "duration_ms": duration_ms,
+                "state": state,
+                "cuisines": cuisines,
+                "seconds_used": seconds_used,
+                "early_exit": result.get('stopped') == 'confident',
+                "vad": result.get('vad'),
+            })
+        timings.update(route_timings or {})
+        metrics.record_stages(timings)
+        _capture_trace(start_time, contents, digest, audio_seconds, timings, 200, anytime=anytime)
+        return response
+    except UploadTooLarge as e:
+        log.warning(f"Upload rejected: {e}", extra={'file': file.filename, 'bytes': len(contents)})
+        _capture_trace(start_time, contents, digest, audio_seconds, None, 413, error=str(e))
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        import traceback
-        print(f"[PREDICT] Error: {str(e)}")
-        traceback.print_exc()
+        log.exception(f"Prediction failed: {e}", extra={'file': file.filename})
+        _capture_trace(start_time, contents, digest, audio_seconds, None, 400, error=str(e))
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _capture_trace(arrived: float, contents: bytes, digest: str, audio_seconds: float, timings: dict,
+                   status: int, anytime: bool = None, error: str = None):
+    """Queue a trace of this /predict/ request when TRACE_FILE is set (see app.traces)."""
+    recorder = traces.get_recorder()
+    if recorder is None or not contents or not recorder.sampled():
+        return
+    if anytime is None:
+        anytime = settings.ANYTIME_INFERENCE and settings.FEATURE_TYPE == 'mfcc'
+    recorder.record({
+        'ts': round(arrived, 6),
+        'endpoint': '/predict/',
+        'bytes': len(contents),
+        'container': sniff_container(contents),
+        'digest': digest or content_digest(contents),
+        'audio_seconds': round(audio_seconds, 3) if audio_seconds is not None else None,
+        'mode': pipeline.preprocess_mode(settings.FAST_PREPROCESS),
+        'feature_type': settings.FEATURE_TYPE,
+        'anytime': anytime,
+        'batching': model_service.batcher is not None,
+        'stages_ms': {k: round(1000.0 * v, 3) for k, v in (timings or {}).items()},
+        'duration_ms': int((time.time() - arrived) * 1000),
+        'status': status,
+        'error': error,
+    }, contents)
+
+
+def _iter_batch_items(files):
+    """Yield (name, bytes) for every clip in the upload, expanding zip/tar archives.
+
+    A clip over the per-clip UPLOAD_MAX_MB is yielded as an UploadTooLarge
+    instead of its bytes, without being read.
+    """
+    limit = uploads.max_bytes()
+    for upload in files:
+        kind = archive_kind(upload.file, upload.filename or '')
+        if kind is not None:
+            for name, data in iter_archive_members(upload.file, kind, max_bytes=limit):
+                yield f"{upload.filename}/{name}", data
+            continue
+        name = upload.filename or 'upload'
+        upload.file.seek(0, os.SEEK_END)
+        size = upload.file.tell()
+        upload.file.seek(0)
+        if limit and size > limit:
+            yield name, UploadTooLarge(f"{name} is over the {settings.UPLOAD_MAX_MB:g} MB limit")
+        else:
+            yield name, upload.file.read()
+
+
+@router.post("/predict/batch/")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """Score many clips (separate files or one zip/tar archive) in one request.
+
+    Clips are decoded and featurized in parallel on the executor, inference
+    runs in batches through ModelService.predict_batch, and one NDJSON line is
+    streamed back per clip as soon as its batch finishes, followed by a
+    final {"type": "summary"} line.
+    """
+    if not await _ready():
+        raise _not_ready()
+    max_in_flight = max(2, settings.EXECUTOR_WORKERS * 2)
+
+    async def score():
+        start_time = time.time()
+        items = enumerate(_iter_batch_items(files))
+        pending = {}
+        done_count = errors = 0
+        exhausted = False
+
+        while True:
+            # Keep a bounded number of featurize jobs in flight
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    # Reading the upload and decompressing archive members blocks, so not on the loop
+                    item = await asyncio.to_thread(next, items, None)
+                except Exception as e:
+                    exhausted = True
+                    errors += 1
+                    yield json.dumps({"type": "error", "detail": f"Could not read upload: {e}"}) + "\n"
+                    break
+                if item is None:
+                    exhausted = True
+                    break
+                index, (name, data) = item
+                if isinstance(data, UploadTooLarge):
+                    errors += 1
+                    yield json.dumps({"type": "result", "index": index, "file": name, "error": str(data)}) + "\n"
+                    continue
+                # Same per-clip duration cap as /predict/
+                task = asyncio.ensure_future(executor.run(
+                    pipeline.featurize_upload, data, settings.FAST_PREPROCESS, content_digest(data),
+                    uploads.max_seconds()))
+                pending[task] = (index, name, time.time())
+            if not pending:
+                break
+
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            ready = []
+            for task in finished:
+                index, name, started = pending.pop(task)
+                try:
+                    result = task.result()
+                    metrics.record_stages(result.get('timings'))
+                    metrics.AUDIO_SECONDS.observe(result['audio_shape'][0] / float(result['sr']), endpoint='batch')
+                    ready.append((index, name, started, result['features']))
+                except Exception as e:
+                    errors += 1
+                    yield json.dumps({"type": "result", "index": index, "file": name, "error": str(e)}) + "\n"
+
+            # Everything that finished together shares one forward pass
+            for i in range(0, len(ready), settings.BATCH_MAX_SIZE):
+                chunk = ready[i:i + settings.BATCH_MAX_SIZE]
+                features = np.stack([f for _, _, _, f in chunk])
+                predictions = await asyncio.to_thread(model_service.predict_batch, features)
+                for (index, name, started, _), (state, confidence) in zip(chunk, predictions):
+                    done_count += 1
+                    yield json.dumps({
+                        "type": "result",
+                        "index": index,
+                        "file": name,
+                        "state": state,
+                        "language": STATE_LANGUAGES.get(state, "Unknown"),
+                        "confidence": float(confidence),
+                        "duration_ms": int((time.time() - started) * 1000),
+                    }) + "\n"
+
+        duration_ms = int((time.time() - start_time) * 1000)
+        log.info("Batch scored", extra={'scored': done_count, 'errors': errors, 'duration_ms': duration_ms})
+        yield json.dumps({
+            "type": "summary",
+            "scored": done_count,
+            "errors": errors,
+            "duration_ms": duration_ms,
+        }) + "\n"
+
+    return StreamingResponse(score(), media_type="application/x-ndjson")
+
+
+async def _classify(features):
+    """Classify one feature vector without blocking the event loop."""
+    if model_service.batcher is not None:
+        return await asyncio.wrap_future(model_service.batcher.submit(features))
+    return await asyncio.to_thread(model_service.predict_from_features, features)
+
+
+@router.websocket("/predict/stream/")
+async def predict_stream(websocket: WebSocket):
+    """Streaming prediction while the user is still speaking.
+
+    Protocol:
+      1. client sends {"type": "start", "sample_rate": 48000, "encoding": "f32le" | "s16le"}
+      2. client sends mono PCM chunks as binary messages
+      3. server pushes {"type": "interim", ...} whenever a new window completes
+      4. client sends {"type": "stop"}; server replies {"type": "final", ...}
+         with the same fields as /predict/ and closes the socket
+    """
+    await websocket.accept()
+    if not await _ready():
+        # 1013: try again later
+        await websocket.close(code=1013, reason=f"Model is not ready ({startup_state.phase})")
+        return
+    stream = None
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                return
+
+            if message.get('bytes') is not None:
+                if stream is None:
+                    raise ValueError("Send a start message before audio")
+                # Feature state is per connection and only touched by this coroutine
+                new_windows = await asyncio.to_thread(stream.append, message['bytes'])
+                # Interim results come from the incremental MFCC state only
+                if new_windows and settings.FEATURE_TYPE == 'mfcc':
+                    features = stream.interim_features()
+                    state, confidence = await _classify(features)
+                    await websocket.send_json({
+                        "type": "interim",
+                        "state": state,
+                        "language": STATE_LANGUAGES.get(state, "Unknown"),
+                        "confidence": float(confidence),
+                        "audio_seconds": round(stream.seconds, 3),
+                    })
+                continue
+
+            msg = json.loads(message.get('text') or '{}')
+            kind = msg.get('type')
+            if kind == 'start':
+                stream = StreamingFeatureState(
+                    int(msg.get('sample_rate', settings.SAMPLE_RATE)),
+                    fast=settings.FAST_PREPROCESS,
+                    encoding=msg.get('encoding', 'f32le'),
+                    max_seconds=uploads.max_seconds(),
+                )
+                await websocket.send_json({"type": "ready", "sample_rate": stream.input_sr})
+            elif kind == 'stop':
+                if stream is None or stream.seconds == 0:
+                    raise ValueError("No audio received")
+                stop_time = time.time()
+                summary = await asyncio.to_thread(stream.finalize)
+                features = summary['features']
+                if settings.FEATURE_TYPE == 'hubert':
+                    from app.hubert import get_hubert_extractor
+                    features = await asyncio.to_thread(get_hubert_extractor(), stream.audio, stream.sr)
+                state, confidence = await _classify(features)
+                metrics.AUDIO_SECONDS.observe(stream.seconds, endpoint='stream')
+                log.info("Stream prediction", extra={
+                    'state': state, 'confidence': round(float(confidence), 4),
+                    'audio_seconds': round(stream.seconds, 3), 'windows': summary['num_windows'],
+                    'windows_precomputed': summary['windows_reused']})
+                await websocket.send_json({
+                    "type": "final",
+                    "language": STATE_LANGUAGES.get(state, "Unknown"),
+                    "confidence": float(confidence),
+                    "duration_ms": int((time.time() - stop_time) * 1000),
+                    "state": state,
+                    "cuisines": STATE_CUISINES.get(state, []),
+                    "audio_seconds": round(stream.seconds, 3),
+                    "num_windows": summary['num_windows'],
+                })
+                await websocket.close()
+                return
+            else:
+                raise ValueError(f"Unknown message type: {kind}")
+    except WebSocketDisconnect:
+        return
+    except UploadTooLarge as e:
+        log.warning(f"Stream rejected: {e}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        # 1009: message too big
+        await websocket.close(code=1009)
+    except Exception as e:
+        log.warning(f"Stream failed: {e}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+
+
+@router.get("/batching/stats/")
+async def batching_stats():
+    """Return micro-batching statistics (batch-size distribution, queue wait)."""
+    if model_service.batcher is None:
+        return JSONResponse({
+            "enabled": False,
+        })
+    return JSONResponse({
+        "enabled": True,
+        "max_batch_size": model_service.batcher.max_batch_size,
+        "max_wait_ms": model_service.batcher.max_wait * 1000.0,
+        **model_service.batcher.stats.snapshot(),
+    })
+
+
+@router.get("/cache/stats/")
+async def cache_stats():
+    """Return hit/miss counters and memory use for each cache tier.
+
+    With EXECUTOR=process the tiers live in the worker processes, so only
+    the web process's (unused) tiers are visible here.
+    """
+    return JSONResponse({
+        "enabled": settings.CACHE_ENABLED,
+        "executor": settings.EXECUTOR,
+        "tiers": pipeline.cache_stats(),
+    })
+
+
+@router.get("/metrics")
+async def metrics_endpoint():
+    """Per-stage latency histograms and request counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# STATE_CUISINES never changes at runtime: serialize, hash and compress each
+# response once, on first use
+_CUISINE_RESPONSES = {}
+
+
+def _cuisine_response(state: str = None) -> PreparedJSON:
+    key = state if state in STATE_CUISINES else None
+    prepared = _CUISINE_RESPONSES.get(key)
+    if prepared is None:
+        if key is not None:
+            cuisines = STATE_CUISINES[key]
+            payload = {"state": key, "cuisines": cuisines, "count": len(cuisines)}
+        else:
+            payload = {"all_cuisines": STATE_CUISINES, "total_states": len(STATE_CUISINES)}
+        prepared = _CUISINE_RESPONSES[key] = PreparedJSON(payload)
+    return prepared
+
+
 @router.get("/recommend-cuisine/")
-async def recommend_cuisine(state: str = None):
+async def recommend_cuisine(request: Request, state: str = None):
     """Return cuisine recommendations for a given state.
     
     If state is provided, return cuisines for that state.
     Otherwise, return all available cuisines grouped by state.
+    Responses carry an ETag (304 on If-None-Match) and are gzip/brotli
+    encoded when large enough.
     """
-    if state and state in STATE_CUISINES:
-        cuisines = STATE_CUISINES[state]
-        return JSONResponse({
-            "state": state,
-            "cuisines": cuisines,
-            "count": len(cuisines)
-        })
-    
-    # Return all cuisines
-    return JSONResponse({
-        "all_cuisines": STATE_CUISINES,
-        "total_states": len(STATE_CUISINES)
-    })
+    return _cuisine_response(state).response(request)
 
 
 @router.post("/preprocess/")
-async def preprocess(file: UploadFile = File(...)):
+async def preprocess(request: Request, file: UploadFile = File(...), preview: bool = True, windows: bool = True):
     """Accept an uploaded audio file and return preprocessing summary.
 
-    The endpoint returns a JSON object containing sample rate, original
-    sample count, number of segments, number of fixed windows, per-window
-    MFCC mean vectors and a small WAV preview (base64) for the first window.
+    The endpoint returns sample rate, original sample count, number of
+    segments, number of fixed windows, per-window MFCC mean vectors and a
+    small WAV preview for the first window. The body is JSON (preview
+    base64-encoded) unless the Accept header asks for one of the binary
+    formats in app.payloads. `?preview=0` and `?windows=0` leave out the
+    preview and the per-window vectors.
     """
     try:
-        contents = await file.read()
+        contents = await asyncio.to_thread(uploads.read_upload, file)
         if not contents:
             raise ValueError("File is empty")
 
-        y, sr = read_audio_bytes(contents)
-        # Use util helper
-        from app.utils import preprocess_audio
-        summary = preprocess_audio(y, sr, window_sec=1.0, n_mfcc=13, fast=settings.FAST_PREPROCESS)
-
-        # Prepare a WAV preview for the first window (if available)
-        preview_b64 = None
-        if summary['num_windows'] > 0:
-            import io, base64, wave, struct
-            first_w = summary['windows'][0]
-            # Convert float32 [-1,1] to int16
-            max_amp = max(1e-9, float(max(abs(first_w))))
-            scaled = (first_w * 32767).astype('int16')
-            buf = io.BytesIO()
-            with wave.open(buf, 'wb') as wf:
-                wf.setnchannels(1)
-                wf.setsampwidth(2)
-                wf.setframerate(int(sr))
-                wf.writeframes(struct.pack('<' + 'h'*len(scaled), *scaled))
-            buf.seek(0)
-            preview_b64 = base64.b64encode(buf.read()).decode('ascii')
-
-        # Convert mfcc_means numpy lists to plain lists are already lists
-        return JSONResponse({
-            'sr': summary['sr'],
-            'original_samples': summary['original_samples'],
-            'num_segments': summary['num_segments'],
-            'num_windows': summary['num_windows'],
-            'mfcc_means': summary['mfcc_means'],
-            'preview_wav_b64': preview_b64,
-        })
+        summary = await executor.run(pipeline.preprocess_upload, contents, settings.FAST_PREPROCESS,
+                                     content_digest(contents), uploads.max_seconds())
+        metrics.record_stages(summary.pop('timings', None))
+        metrics.AUDIO_SECONDS.observe(summary['original_samples'] / float(summary['sr']), endpoint='preprocess')
+
+        with metrics.stage('serialization'):
+            media_type = negotiate_media_type(request.headers.get('accept'), payloads.MEDIA_TYPES)
+            if media_type == payloads.JSON:
+                # Large bodies are compressed if accepted
+                return json_response(request, payloads.preprocess_json(summary, preview, windows),
+                                     vary='Accept, Accept-Encoding')
+            meta, arrays = payloads.preprocess_arrays(summary, preview, windows)
+            body = payloads.npz(meta, arrays) if media_type == payloads.NPZ else payloads.pack(meta, arrays)
+            return Response(body, media_type=media_type,
+                            headers={'Cache-Control': 'no-store', 'Vary': 'Accept, Accept-Encoding'})
+    except UploadTooLarge as e:
+        log.warning(f"Upload rejected: {e}", extra={'file': file.filename})
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        log.exception(f"Preprocess failed: {e}", extra={'file': file.filename})
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,194 @@
+"""
+Readiness-gated startup: background model load and JIT pre-warming.
+
+The web process starts serving `/health/live` immediately. The model is
+loaded on a background thread, then a warmup pass pushes synthetic audio
+through every preprocessing mode (decode + resample, fast and full
+preprocessing, rolling windows, streaming state) so librosa/numba JIT
+compilation and the first-call costs of the model happen before
+`/health/ready` turns green. With EXECUTOR=process each pool worker runs the
+same warmup once.
+
+Numba's compilation cache is written to NUMBA_CACHE_DIR (a volume in
+docker-compose), so restarted containers load compiled code instead of
+compiling it again.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.logs import get_logger
+
+log = get_logger('startup')
+
+
+def _process_start_time() -> float:
+    """Wall-clock time the current process was created (Linux), else now."""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 (starttime) is in clock ticks since boot; skip past "(comm)"
+            fields = f.read().rsplit(')', 1)[1].split()
+        started_after_boot = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - started_after_boot)
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED = _process_start_time()
+
+
+def warm_pipeline() -> dict:
+    """Run synthetic audio through every preprocessing mode. Returns ms per step."""
+    from app.metrics import collect
+    # Collected and dropped, so warmup passes don't show up in /metrics
+    with collect():
+        return _warm_pipeline()
+
+
+def _warm_pipeline() -> dict:
+    from app.payloads import synthetic_wav
+    from app.streaming import StreamingFeatureState
+    from app.utils import read_audio_bytes, preprocess_audio, extract_mfcc, rolling_windows
+
+    timings = {}
+
+    def step(name, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings[name] = round(1000.0 * (time.perf_counter() - started), 1)
+        return result
+
+    # Not at SAMPLE_RATE, so decoding resamples
+    y, sr = step('decode_resample', read_audio_bytes, synthetic_wav(sr=44100))
+    for fast in (True, False):
+        mode = 'fast' if fast else 'full'
+        step(f'preprocess_{mode}', preprocess_audio, y, sr, window_sec=1.0, n_mfcc=13, fast=fast)
+        step(f'extract_mfcc_{mode}', extract_mfcc, y, sr=sr, n_mfcc=13, fast=fast)
+    step('rolling_windows', rolling_windows, y, sr, window_sec=1.0, hop_sec=0.5, n_mfcc=13)
+
+    def stream():
+        state = StreamingFeatureState(input_sr=48000, encoding='s16le')
+        state.append((0.3 * 32767 * np.sin(np.arange(96000) * 0.02)).astype('<i2').tobytes())
+        return state.finalize()
+    step('streaming', stream)
+    if settings.FEATURE_TYPE == 'hubert':
+        from app.hubert import get_hubert_extractor
+        step('hubert', get_hubert_extractor(), y, sr)
+    return timings
+
+
+class StartupState:
+    """Tracks the startup phase and the timings reported by /health/ready."""
+
+    def __init__(self):
+        self.phase = 'starting'
+        self.error = None
+        self.timings_ms = {}
+        self.ready_at = None
+        self.first_request_ms = None
+        self.attempts = 0
+        self.failed_at = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self, model_service, background: bool = None):
+        """Load and warm up once (idempotent). Runs on a thread unless background=False.
+
+        After a failure, calling it again retries once the backoff has passed.
+        """
+        background = settings.BACKGROUND_LOAD if background is None else background
+        with self._lock:
+            if self.ready or (self._thread is not None and not self._retry_due()):
+                return
+            if self.attempts:
+                log.info("Retrying startup", extra={'attempt': self.attempts + 1})
+            self.attempts += 1
+            self.phase = 'starting'
+            self._thread = threading.Thread(target=self._run, args=(model_service,),
+                                            name='startup', daemon=True)
+            if background:
+                self._thread.start()
+        if not background:
+            self._run(model_service)
+
+    def _retry_due(self) -> bool:
+        if self.phase != 'failed' or settings.STARTUP_RETRY_SECONDS <= 0:
+            return False
+        backoff = min(settings.STARTUP_RETRY_SECONDS * 2 ** (self.attempts - 1), 600.0)
+        return time.time() - self.failed_at >= backoff
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _timed(self, name, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        self.timings_ms[name] = round(1000.0 * (time.perf_counter() - started), 1)
+        return result
+
+    def _run(self, model_service):
+        try:
+            self.phase = 'loading_model'
+            self._timed('load_model', model_service.load_model)
+            if settings.FEATURE_TYPE == 'hubert':
+                from app.hubert import get_hubert_extractor
+                self.phase = 'loading_features'
+                self._timed('load_hubert', get_hubert_extractor)
+            if settings.STARTUP_WARMUP:
+                self.phase = 'warming_up'
+                self.timings_ms['warmup'] = self._timed('warmup_total', warm_pipeline)
+                self._timed('warm_workers', _warm_executor)
+            self.ready_at = time.time()
+            self.error = None
+            self.phase = 'ready'
+            self._ready.set()
+            log.info("Ready", extra={'cold_start_to_ready_ms': self.snapshot()['cold_start_to_ready_ms']})
+        except Exception as e:
+            self.failed_at = time.time()
+            self.error = str(e)
+            self.phase = 'failed'
+            log.exception(f"Failed: {e}")
+
+    def record_request(self, duration_ms: int):
+        """Remember the latency of the first request served after readiness."""
+        if self.first_request_ms is None:
+            self.first_request_ms = duration_ms
+
+    def snapshot(self) -> dict:
+        return {
+            'status': 'ready' if self.ready else ('failed' if self.phase == 'failed' else 'starting'),
+            'phase': self.phase,
+            'error': self.error,
+            'attempts': self.attempts,
+            'cold_start_to_ready_ms': int(1000 * (self.ready_at - PROCESS_STARTED)) if self.ready_at else None,
+            'uptime_ms': int(1000 * (time.time() - PROCESS_STARTED)),
+            'timings_ms': self.timings_ms,
+            'first_request_ms': self.first_request_ms,
+        }
+
+
+def _warm_executor():
+    """With EXECUTOR=process, start the workers before the first request.
+
+    The warmup itself runs in each worker's initializer (`pipeline.init_worker`),
+    so every process warms exactly once however the jobs below are spread;
+    they only make the pool start its processes now. A worker the pool only
+    starts later still warms before it takes its first job.
+    """
+    from app import executor, pipeline
+    if not executor.uses_process_pool():
+        return
+    pool = executor.get_executor()
+    futures = [pool.submit(pipeline.worker_pid) for _ in range(settings.EXECUTOR_WORKERS)]
+    for fut in futures:
+        fut.result()
@@ -0,0 +1,235 @@
+"""
+Incremental feature state for streaming (WebSocket) prediction.
+
+Audio arrives as raw PCM chunks. Each chunk is resampled with a streaming
+soxr resampler (bit-identical to the one-shot `resample_audio` used by
+`read_audio_bytes`, at the same RESAMPLE_QUALITY tier), appended to a growing buffer, and every window that
+is now complete gets its log-mel frames computed once and kept.
+
+The batch pipeline trims silence and peak-normalizes over the whole clip
+before windowing, so those steps are handled as follows:
+  - windows are laid out relative to the current trim start; if a louder
+    later chunk moves the trim start, cached windows are recomputed
+  - peak normalization only shifts log-mel values by -20*log10(peak) dB, so
+    it is applied at pooling time instead of to the cached frames
+`finalize()` recomputes the exact trim bounds and peak over the full clip
+and only featurizes windows that were not already cached, which yields the
+same feature vector as `preprocess_audio` on the same audio.
+"""
+import math
+from typing import List, Optional
+
+import numpy as np
+import soxr
+
+from app.config import settings
+from app.uploads import UploadTooLarge
+from app.utils import (
+    RESAMPLE_QUALITIES, trim_bounds, batch_window_log_mel, pool_window_log_mel,
+)
+
+# librosa.power_to_db floor (10 * log10(amin) with amin=1e-10). Cached frames
+# use a far lower amin so the floor can be re-applied after the normalization shift.
+_LOG_MEL_FLOOR_DB = -100.0
+_CACHE_AMIN = 1e-30
+
+PCM_ENCODINGS = {
+    'f32le': np.dtype('<f4'),
+    's16le': np.dtype('<i2'),
+}
+
+
+class StreamingFeatureState:
+    """Accumulate PCM audio and maintain per-window MFCC state incrementally."""
+
+    def __init__(self, input_sr: int, fast: bool = None, sr: int = None,
+                 window_sec: float = 1.0, n_mfcc: int = 13, encoding: str = 'f32le',
+                 max_seconds: float = None):
+        if encoding not in PCM_ENCODINGS:
+            raise ValueError(f"Unsupported PCM encoding: {encoding}")
+        self.input_sr = int(input_sr)
+        self.sr = int(sr or settings.SAMPLE_RATE)
+        self.fast = settings.FAST_PREPROCESS if fast is None else bool(fast)
+        self.n_mfcc = n_mfcc
+        self.encoding = encoding
+        # Audio past this raises UploadTooLarge instead of growing the buffer further
+        self.max_samples = int(max_seconds * self.sr) if max_seconds else None
+        # Same layout as preprocess_audio: 1.0 s (fast) or 1.5 s (full) segments,
+        # each split into fixed windows of window_sec
+        self.seg_samples = int((1.0 if self.fast else 1.5) * self.sr)
+        self.win_samples = int(window_sec * self.sr)
+        self.windows_per_segment = int(math.ceil(self.seg_samples / self.win_samples))
+
+        self._resampler = None
+        if self.input_sr != self.sr:
+            quality = RESAMPLE_QUALITIES[settings.RESAMPLE_QUALITY]
+            self._resampler = soxr.ResampleStream(self.input_sr, self.sr, 1, dtype='float32', quality=quality)
+        self._buffer = np.zeros(self.sr * 8, dtype=np.float32)
+        self._length = 0
+        self._finished = False
+
+        # Trim start the cached windows are aligned to, and their log-mel frames
+        self._start = None
+        self._frames = {}
+        self._next_check = 0
+        self.windows_computed = 0
+
+    # ----------------------------- input -----------------------------
+    @property
+    def audio(self) -> np.ndarray:
+        """Resampled audio received so far."""
+        return self._buffer[:self._length]
+
+    @property
+    def seconds(self) -> float:
+        return self._length / float(self.sr)
+
+    def decode_chunk(self, data: bytes) -> np.ndarray:
+        """Convert a binary PCM message to float32 samples in [-1, 1]."""
+        pcm = np.frombuffer(data, dtype=PCM_ENCODINGS[self.encoding])
+        if self.encoding == 's16le':
+            return pcm.astype(np.float32) / 32768.0
+        return pcm.astype(np.float32)
+
+    def append(self, data: bytes) -> int:
+        """Add a binary PCM chunk. Returns the number of newly featurized windows."""
+        return self.append_samples(self.decode_chunk(data))
+
+    def append_samples(self, samples: np.ndarray, last: bool = False) -> int:
+        samples = np.asarray(samples, dtype=np.float32)
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples, last=last)
+        self._extend(samples)
+        return self._update()
+
+    def _extend(self, samples: np.ndarray):
+        needed = self._length + len(samples)
+        if self.max_samples is not None and needed > self.max_samples:
+            raise UploadTooLarge(f"Stream is longer than the {self.max_samples / self.sr:g}s limit")
+        if needed > len(self._buffer):
+            size = 2 * len(self._buffer)
+            if self.max_samples is not None:
+                size = min(size, self.max_samples)
+            grown = np.zeros(max(needed, size), dtype=np.float32)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._buffer[self._length:needed] = samples
+        self._length = needed
+
+    # ---------------------------- windows ----------------------------
+    def _window_range(self, index: int):
+        """Sample range [a, b) of window `index` relative to the trim start."""
+        seg, j = divmod(index, self.windows_per_segment)
+        a = seg * self.seg_samples + j * self.win_samples
+        b = min(a + self.win_samples, (seg + 1) * self.seg_samples)
+        return a, b
+
+    def _window_samples(self, y: np.ndarray, start: int, end: int, index: int) -> np.ndarray:
+        """Pre-emphasized (not yet normalized) samples of one window."""
+        a, b = self._window_range(index)
+        a, b = start + a, min(start + b, end)
+        w = y[a:b].astype(np.float32)
+        if w.size == 0:
+            return w
+        prev = y[a - 1] if a > start else None
+        emph = np.empty_like(w)
+        emph[1:] = w[1:] - 0.97 * w[:-1]
+        emph[0] = w[0] if prev is None else w[0] - 0.97 * prev
+        return emph
+
+    def _featurize(self, y: np.ndarray, start: int, end: int, indices: List[int]):
+        if not indices:
+            return
+        windows = [self._window_samples(y, start, end, i) for i in indices]
+        frames = batch_window_log_mel(windows, self.sr, win_samples=self.win_samples, amin=_CACHE_AMIN)
+        for i, f in zip(indices, frames):
+            self._frames[i] = f
+        self.windows_computed += len(indices)
+
+    def _update(self) -> int:
+        """Featurize windows that became complete with the audio received so far."""
+        y = self.audio
+        # The trim start never moves earlier as audio arrives, so no window can
+        # complete before this point; skip the O(n) trim scan until then.
+        if len(y) == 0 or len(y) < self._next_check:
+            return 0
+        start, _ = trim_bounds(y, top_db=20)
+        if start != self._start:
+            # Trim start moved: every cached window is misaligned
+            self._start = start
+            self._frames = {}
+        new = []
+        index = 0
+        while True:
+            a, b = self._window_range(index)
+            if start + b > len(y):
+                break
+            if index not in self._frames:
+                new.append(index)
+            index += 1
+        self._next_check = start + self._window_range(index)[1]
+        self._featurize(y, start, len(y), new)
+        return len(new)
+
+    # ---------------------------- pooling ----------------------------
+    def _pool(self, frames: List[np.ndarray], peak: float) -> np.ndarray:
+        block = np.stack(frames, axis=0)
+        # Peak normalization == constant dB shift, then re-apply power_to_db's floor
+        shift = 20.0 * math.log10(peak + 1e-9) if peak > 0 else 0.0
+        block = np.maximum(block - shift, _LOG_MEL_FLOOR_DB)
+        return pool_window_log_mel(block, n_mfcc=self.n_mfcc)
+
+    def interim_features(self) -> Optional[np.ndarray]:
+        """Pooled feature vector over the complete windows so far (None if none yet)."""
+        if not self._frames:
+            return None
+        y = self.audio
+        peak = float(np.max(np.abs(y[self._start:]))) if len(y) > self._start else 0.0
+        indices = sorted(self._frames)
+        means = self._pool([self._frames[i] for i in indices], peak)
+        return np.mean(means, axis=0)
+
+    def finalize(self) -> dict:
+        """Flush the resampler and return the same summary `preprocess_audio` would.
+
+        Keys: 'sr', 'original_samples', 'num_segments', 'num_windows',
+        'mfcc_means', plus 'features' (mean over windows) and
+        'windows_reused' (how many windows came from the incremental state).
+        """
+        if not self._finished and self._resampler is not None:
+            self._extend(self._resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+        self._finished = True
+
+        y = self.audio
+        start, end = trim_bounds(y, top_db=20)
+        if start != self._start:
+            self._frames = {}
+            self._start = start
+        length = end - start
+        num_segments = max(1, int(math.ceil(length / self.seg_samples)))
+        num_windows = num_segments * self.windows_per_segment
+
+        reused = 0
+        missing = []
+        for i in range(num_windows):
+            _, b = self._window_range(i)
+            # Windows touching the final trim end (or beyond) are recomputed
+            if i in self._frames and b <= length:
+                reused += 1
+            else:
+                missing.append(i)
+        for i in missing:
+            self._frames.pop(i, None)
+        self._featurize(y, start, end, missing)
+
+        peak = float(np.max(np.abs(y[start:end]))) if length > 0 else 0.0
+        means = self._pool([self._frames[i] for i in range(num_windows)], peak)
+        return {
+            'sr': self.sr,
+            'original_samples': int(len(y)),
+            'num_segments': num_segments,
+            'num_windows': num_windows,
+            'mfcc_means': means.tolist(),
+            'features': np.mean(means, axis=0),
+            'windows_reused': reused,
+        }
@@ -0,0 +1,119 @@
+"""
+Opt-in capture of /predict/ traffic for offline replay (see app.replay).
+
+With TRACE_FILE set, every sampled request (TRACE_SAMPLE, default all)
+appends one JSON line:
+  ts            arrival time (unix seconds)
+  bytes         upload size
+  container     sniffed container (wav, webm, mp3, ...)
+  digest        content digest (the spool file name)
+  audio_seconds decoded duration
+  mode          preprocessing mode (pipeline.preprocess_mode), plus
+                feature_type and anytime
+  stages_ms     per-stage timings (app.metrics stage names)
+  duration_ms, status, error
+
+With TRACE_AUDIO_DIR set the upload itself is spooled there as
+`<digest>.<container>`; identical uploads are stored once. Writing
+happens on a background thread, so the request only pays for a queue put.
+"""
+import json
+import os
+import queue
+import random
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+_STOP = object()
+
+
+class TraceRecorder:
+    """Appends trace lines (and spools audio) from a background thread."""
+
+    def __init__(self, path: str, audio_dir: str = None, sample: float = 1.0):
+        self.path = Path(path)
+        self.audio_dir = Path(audio_dir) if audio_dir else None
+        self.sample = sample
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def sampled(self) -> bool:
+        return self.sample >= 1.0 or random.random() < self.sample
+
+    def record(self, trace: dict, audio: bytes = None):
+        self._start()
+        self._queue.put((trace, audio if self.audio_dir is not None else None))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                if self.audio_dir is not None:
+                    self.audio_dir.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is _STOP:
+                        return
+                    trace, audio = item
+                    if audio is not None:
+                        self._spool(trace, audio)
+                    f.write(json.dumps(trace, default=str) + '\n')
+                    # Flush once the queue drains rather than per line
+                    if self._queue.empty():
+                        f.flush()
+                except Exception as e:
+                    from app.logs import get_logger
+                    get_logger('traces').warning(f"Could not write trace: {e}")
+                finally:
+                    self._queue.task_done()
+
+    def _spool(self, trace: dict, audio: bytes):
+        path = self.audio_dir / f"{trace['digest']}.{trace['container']}"
+        if not path.exists():
+            tmp = path.with_suffix(path.suffix + '.tmp')
+            tmp.write_bytes(audio)
+            os.replace(tmp, path)
+        trace['audio'] = path.name
+
+    def flush(self):
+        """Block until everything recorded so far is on disk."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+
+_recorder: Optional[TraceRecorder] = None
+
+
+def get_recorder() -> Optional[TraceRecorder]:
+    """Per-process recorder, or None when TRACE_FILE is not set."""
+    global _recorder
+    if not settings.TRACE_FILE:
+        return None
+    if _recorder is None or str(_recorder.path) != settings.TRACE_FILE:
+        if _recorder is not None:
+            _recorder.close()
+        _recorder = TraceRecorder(settings.TRACE_FILE, settings.TRACE_AUDIO_DIR or None, settings.TRACE_SAMPLE)
+    return _recorder
+
+
+def shutdown():
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
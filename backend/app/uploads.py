@@ -0,0 +1,171 @@
+"""
+Size and duration limits for uploads.
+
+UploadLimitMiddleware checks the request body as it arrives, before
+FastAPI parses the multipart form. /predict/batch/ (archives, many clips)
+only has its total body capped at BATCH_UPLOAD_MAX_MB; each of its clips
+is then held to the per-clip limits by app.archives and the route. For
+the single-clip LIMITED_PATHS:
+  - a Content-Length above UPLOAD_MAX_MB gets a 413 without the body being
+    read; a body without one is counted and cut off at the cap
+  - the head of the `file` part is sniffed: a WAV header declaring more
+    than UPLOAD_MAX_SECONDS of audio is a 413, and with
+    UPLOAD_ALLOW_UNKNOWN=0 a container the decoders don't recognise is a 415
+Other containers can't be measured from their first bytes, so the routes
+pass `max_seconds()` to the pipeline as its `cap_seconds`: decoding stops
+just past it and raises UploadTooLarge instead of decoding the rest (the
+batch route passes it per clip; CLI callers of app.pipeline don't pass a
+cap). /predict/stream/ gives
+the same cap to its StreamingFeatureState, which closes the socket (1009)
+once the audio received goes past it.
+
+`read_upload` hands the route starlette's spooled upload: its bytes while
+it is small enough to stay in memory (at most starlette's 1 MB spool), a
+read-only mmap of its temporary file, not a copy, once it has rolled to disk.
+"""
+import io
+import mmap
+import os
+import re
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.utils import sniff_container
+
+# Endpoints that take exactly one audio clip (the batch endpoint takes archives)
+LIMITED_PATHS = ('/predict/', '/preprocess/')
+BATCH_PATH = '/predict/batch/'
+# Bytes of the file part to collect before sniffing it, and how far into
+# the body to look for the part at all
+PROBE_BYTES = 4096
+SEARCH_BYTES = 64 * 1024
+_FILE_PART = re.compile(rb'name="file"[^\r\n]*\r\n(?:[^\r\n]+\r\n)*\r\n')
+
+
+class UploadTooLarge(ValueError):
+    """The upload is over UPLOAD_MAX_MB or decodes to more than UPLOAD_MAX_SECONDS (HTTP 413)."""
+
+
+def _mb(value: float) -> int:
+    return int(value * 1024 * 1024) if value > 0 else 0
+
+
+def max_bytes() -> int:
+    return _mb(settings.UPLOAD_MAX_MB)
+
+
+def body_limit(path: str):
+    """(byte cap, its setting in MB) for a request body to `path`; cap 0 means none."""
+    if path == BATCH_PATH:
+        return _mb(settings.BATCH_UPLOAD_MAX_MB), settings.BATCH_UPLOAD_MAX_MB
+    return max_bytes(), settings.UPLOAD_MAX_MB
+
+
+def max_seconds():
+    """The decoded-duration cap the single-clip routes pass to app.pipeline, or None."""
+    return settings.UPLOAD_MAX_SECONDS if settings.UPLOAD_MAX_SECONDS > 0 else None
+
+
+def wav_seconds(head: bytes):
+    """Duration a RIFF/WAVE header declares, or None if it doesn't (streamed, RF64, truncated head)."""
+    if head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        return None
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(head):
+        chunk, size = head[pos:pos + 4], int.from_bytes(head[pos + 4:pos + 8], 'little')
+        if chunk == b'fmt ' and pos + 20 <= len(head):
+            byte_rate = int.from_bytes(head[pos + 16:pos + 20], 'little')
+        elif chunk == b'data':
+            if not byte_rate or size in (0, 0xFFFFFFFF):
+                return None
+            return size / float(byte_rate)
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def probe(head: bytes):
+    """Reason to reject a file part from its first bytes, as (status, detail), or None."""
+    if settings.UPLOAD_MAX_SECONDS > 0:
+        seconds = wav_seconds(head)
+        if seconds is not None and seconds > settings.UPLOAD_MAX_SECONDS:
+            return 413, f"Audio is {seconds:.0f}s long; the limit is {settings.UPLOAD_MAX_SECONDS:g}s"
+    if not settings.UPLOAD_ALLOW_UNKNOWN and head and sniff_container(head) == 'unknown':
+        return 415, "Unsupported audio format"
+    return None
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware applying the upload limits to LIMITED_PATHS and BATCH_PATH."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path')
+        if (scope['type'] != 'http' or scope['method'] != 'POST'
+                or (path not in LIMITED_PATHS and path != BATCH_PATH)):
+            return await self.app(scope, receive, send)
+        limit, limit_mb = body_limit(path)
+        length = dict(scope['headers']).get(b'content-length')
+        if limit and length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse({'detail': f"Upload is over the {limit_mb:g} MB limit"},
+                                    status_code=413, headers={'Connection': 'close'})
+            return await response(scope, receive, send)
+
+        received = 0
+        head = bytearray()
+        # Only a single-clip body has one `file` part worth sniffing
+        probing = path in LIMITED_PATHS
+
+        async def checked_receive():
+            nonlocal received, probing
+            message = await receive()
+            if message['type'] != 'http.request':
+                return message
+            chunk = message.get('body', b'')
+            received += len(chunk)
+            if limit and received > limit:
+                raise HTTPException(413, f"Upload is over the {limit_mb:g} MB limit")
+            if probing:
+                head.extend(chunk[:SEARCH_BYTES + PROBE_BYTES - len(head)])
+                match = _FILE_PART.search(head)
+                part = head[match.end():] if match else b''
+                done = not message.get('more_body', False)
+                if match and (len(part) >= PROBE_BYTES or done):
+                    probing = False
+                    rejected = probe(bytes(part[:PROBE_BYTES]))
+                    if rejected:
+                        raise HTTPException(*rejected)
+                elif done or len(head) >= SEARCH_BYTES + PROBE_BYTES:
+                    probing = False
+            return message
+
+        return await self.app(scope, checked_receive, send)
+
+
+def read_upload(file):
+    """The uploaded bytes of a starlette UploadFile.
+
+    Returns bytes while the spool is in memory, or a read-only mmap of the
+    rolled-over spool file. Both work wherever the pipeline takes
+    `contents`; app.executor turns an mmap into bytes for process workers.
+    """
+    spool = file.file
+    spool.seek(0)
+    # A SpooledTemporaryFile has no name until it rolls over to a real file
+    if getattr(spool, 'name', None) is None:
+        return spool.read()
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.seek(0)
+    if size == 0:
+        return b''
+    limit = max_bytes()
+    if limit and size > limit:
+        raise UploadTooLarge(f"Upload is over the {settings.UPLOAD_MAX_MB:g} MB limit")
+    try:
+        return mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return spool.read()
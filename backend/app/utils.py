@@ -13,48 +13,278 @@ callsites.
 """
 
 import io
+import shutil
+import subprocess
 import tempfile
+import zlib
 from typing import List, Tuple
 
 import numpy as np
 import librosa
+import scipy.fft
+import soundfile as sf
+import soxr
 from pathlib import Path
 
 from app.config import settings
+from app.metrics import stage
 
 
-def read_audio_bytes(data: bytes, sr: int = None) -> Tuple[np.ndarray, int]:
-    """Read raw audio bytes into a numpy array and return (y, sr).
+# Containers libsndfile can decode straight from memory. Anything else
+# (WebM/Matroska, MP4/M4A, unknown) still goes through a temporary file so
+# librosa/audioread can hand it to ffmpeg.
+IN_MEMORY_CONTAINERS = ('wav', 'flac', 'ogg', 'mp3')
+
+_CONTAINER_SUFFIXES = {
+    'wav': '.wav',
+    'flac': '.flac',
+    'ogg': '.ogg',
+    'mp3': '.mp3',
+    'webm': '.webm',
+    'mp4': '.m4a',
+}
+
 
-    Supports WebM, MP3, WAV and other formats by writing the bytes to a
-    temporary file and letting librosa detect the format.
+def sniff_container(data: bytes) -> str:
+    """Guess the audio container from its leading magic bytes.
+
+    Returns one of 'wav', 'flac', 'ogg', 'mp3', 'webm', 'mp4' or 'unknown'.
     """
-    sr = sr or settings.SAMPLE_RATE
+    head = bytes(data[:12])
+    if head[:4] in (b'RIFF', b'RF64') and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    if head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+        return 'mp3'
+    return 'unknown'
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only file object over any buffer (an mmap, a memoryview) without copying it.
+
+    io.BytesIO shares a bytes object's memory but copies every other buffer.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data).cast('B')
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def _decode_in_memory(data: bytes, max_seconds: float = None) -> Tuple[np.ndarray, int]:
+    """Decode a libsndfile-supported container from an in-memory buffer (bytes, or an mmap)."""
+    with sf.SoundFile(io.BytesIO(data) if isinstance(data, bytes) else BufferReader(data)) as f:
+        file_sr = f.samplerate
+        frames = -1 if max_seconds is None else int(max_seconds * file_sr)
+        y = f.read(frames=frames, dtype='float32', always_2d=False)
+    if y.ndim > 1:
+        # Down-mix to mono the same way librosa.load does
+        y = np.mean(y, axis=1)
+    return np.ascontiguousarray(y, dtype=np.float32), int(file_sr)
+
+
+def _decode_via_tempfile(data: bytes, suffix: str = '.webm', max_seconds: float = None) -> Tuple[np.ndarray, int]:
+    """Write the bytes to a temporary file and let librosa detect the format."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(data)
+        tmp_path = tmp.name
+
     try:
-        with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as tmp:
-            tmp.write(data)
-            tmp_path = tmp.name
+        y, file_sr = librosa.load(tmp_path, sr=None, duration=max_seconds)
+        return y, int(file_sr)
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+# Resampling quality tiers (settings.RESAMPLE_QUALITY) -> soxr recipe. 'hq' is
+# what librosa.resample uses by default, so 'hq' features are unchanged; the
+# lower tiers trade stopband attenuation and passband width for CPU.
+# soxr already runs a single polyphase stage for integer ratios (48k -> 16k).
+RESAMPLE_QUALITIES = {'hq': 'HQ', 'mq': 'MQ', 'fast': 'LQ'}
+
+# The same tiers for ffmpeg's aresample filter when decoding at the target rate
+_FFMPEG_RESAMPLERS = {
+    'hq': 'aresample=resampler=soxr:precision=20',
+    'mq': 'aresample=resampler=soxr:precision=16',
+    'fast': 'aresample=resampler=swr',
+}
+
 
+def resample_audio(y: np.ndarray, orig_sr: int, target_sr: int, quality: str = None) -> np.ndarray:
+    """Resample mono float32 audio with the given quality tier.
+
+    The output has ceil(len(y) * target_sr / orig_sr) samples, like librosa.resample.
+    """
+    quality = quality or settings.RESAMPLE_QUALITY
+    if quality not in RESAMPLE_QUALITIES:
+        raise ValueError(f"Unknown resample quality: {quality} (expected one of {', '.join(RESAMPLE_QUALITIES)})")
+    if orig_sr == target_sr:
+        return y
+    n_samples = int(np.ceil(len(y) * float(target_sr) / orig_sr))
+    y_hat = soxr.resample(np.asarray(y, dtype=np.float32), orig_sr, target_sr, quality=RESAMPLE_QUALITIES[quality])
+    return librosa.util.fix_length(y_hat, size=n_samples)
+
+
+def _decode_ffmpeg(data: bytes, sr: int, quality: str = None, max_seconds: float = None) -> Tuple[np.ndarray, int]:
+    """Decode through ffmpeg straight to mono float32 at `sr` (decode and resample in one pass)."""
+    quality = quality or settings.RESAMPLE_QUALITY
+    cmd = ['ffmpeg', '-nostdin', '-v', 'error', '-i', 'pipe:0', '-af', _FFMPEG_RESAMPLERS[quality],
+           '-ac', '1', '-ar', str(int(sr))]
+    if max_seconds is not None:
+        cmd += ['-t', str(max_seconds)]
+    cmd += ['-f', 'f32le', 'pipe:1']
+    proc = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    y = np.frombuffer(proc.stdout, dtype=np.float32)
+    if y.size == 0:
+        raise RuntimeError(proc.stderr.decode('utf-8', 'replace').strip() or 'ffmpeg produced no audio')
+    return y.copy(), int(sr)
+
+
+def decode_audio(data: bytes, target_sr: int = None, max_seconds: float = None) -> Tuple[np.ndarray, int]:
+    """Decode raw audio bytes, at their native sample rate unless the decoder can resample.
+
+    WAV, FLAC, OGG and MP3 are decoded from memory. Other containers, or
+    in-memory decodes that libsndfile rejects (e.g. an Ogg codec the
+    installed libsndfile lacks), go through ffmpeg at `target_sr` when it is
+    given and ffmpeg is installed, and otherwise fall back to the
+    temporary-file path. Check the returned rate: it is only `target_sr` when
+    the decoder resampled. With `max_seconds` only the start of the clip is
+    decoded.
+    """
+    container = sniff_container(data)
+    if container in IN_MEMORY_CONTAINERS:
         try:
-            y, file_sr = librosa.load(tmp_path, sr=None)
-            if file_sr != sr:
-                y = librosa.resample(y, orig_sr=file_sr, target_sr=sr)
-            return y, sr
-        finally:
-            Path(tmp_path).unlink(missing_ok=True)
+            return _decode_in_memory(data, max_seconds)
+        except Exception:
+            pass
+    if target_sr and shutil.which('ffmpeg'):
+        try:
+            return _decode_ffmpeg(data, target_sr, max_seconds=max_seconds)
+        except Exception:
+            pass
+    return _decode_via_tempfile(data, suffix=_CONTAINER_SUFFIXES.get(container, '.webm'), max_seconds=max_seconds)
+
+
+def read_audio_bytes(data: bytes, sr: int = None, quality: str = None,
+                     max_seconds: float = None) -> Tuple[np.ndarray, int]:
+    """Read raw audio bytes into a numpy array and return (y, sr).
+
+    Supports WebM, MP3, WAV and other formats. The container is sniffed
+    from its magic bytes; see `decode_audio` for which formats skip the
+    temporary file. Resampling to `sr` uses the `quality` tier (default
+    settings.RESAMPLE_QUALITY). `max_seconds` stops decoding after that much audio.
+    """
+    sr = sr or settings.SAMPLE_RATE
+    quality = quality or settings.RESAMPLE_QUALITY
+    try:
+        with stage('decode'):
+            y, file_sr = decode_audio(data, target_sr=sr if settings.DECODE_AT_TARGET_RATE else None,
+                                      max_seconds=max_seconds)
+        if file_sr != sr:
+            with stage('resample'):
+                y = resample_audio(y, file_sr, sr, quality=quality)
+        return y, sr
     except Exception as e:
         raise RuntimeError(f"Failed to read audio bytes: {e}")
 
 
 # ----------------------------- Helper steps -----------------------------
-def trim_silence(y: np.ndarray, top_db: int = 20) -> np.ndarray:
-    """Trim leading and trailing silence from audio using librosa.effects.trim."""
+def trim_bounds(y: np.ndarray, top_db: int = 20) -> Tuple[int, int]:
+    """Return the (start, end) sample indices `trim_silence` keeps."""
     try:
-        y_trim, _ = librosa.effects.trim(y, top_db=top_db)
-        return y_trim
+        _, index = librosa.effects.trim(y, top_db=top_db)
+        return int(index[0]), int(index[1])
     except Exception:
-        # If trimming fails, return original
-        return y
+        # If trimming fails, keep everything
+        return 0, len(y)
+
+
+def trim_silence(y: np.ndarray, top_db: int = 20) -> np.ndarray:
+    """Trim leading and trailing silence from audio using librosa.effects.trim."""
+    start, end = trim_bounds(y, top_db=top_db)
+    return y[start:end]
+
+
+# --------------------------- Voice activity ------------------------------
+# trim_silence only removes leading/trailing silence. The VAD below drops
+# pauses inside the recording too, from a single vectorized pass over
+# non-overlapping 20 ms frames:
+#   - 'frames':  keep only speech frames (pauses are cut out before segmentation)
+#   - 'windows': keep the layout, but drop 1 s windows whose speech ratio is
+#                below `min_speech_ratio` before they are featurized
+VAD_MODES = ('off', 'frames', 'windows')
+
+
+def speech_frames(y: np.ndarray, sr: int, frame_sec: float = 0.02, energy_db: float = 35.0,
+                  zcr_max: float = 0.35, hangover_sec: float = 0.1) -> Tuple[np.ndarray, int]:
+    """Frame-level energy / zero-crossing voice activity.
+
+    A frame is speech if its energy is within `energy_db` of the loudest frame
+    and it is either tonal (zero-crossing rate below `zcr_max`) or loud (within
+    half of `energy_db`), which rejects low-level broadband noise. Speech
+    regions are then extended by `hangover_sec` on each side so onsets and
+    short gaps survive. Returns (mask per frame, frame length in samples).
+    """
+    frame = max(1, int(frame_sec * sr))
+    n_frames = max(1, int(np.ceil(len(y) / frame)))
+    padded = np.zeros(n_frames * frame, dtype=np.float32)
+    padded[:len(y)] = y
+    frames = padded.reshape(n_frames, frame)
+
+    db = 10.0 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    ref = db.max()
+    speech = (db > ref - energy_db) & ((zcr < zcr_max) | (db > ref - energy_db / 2))
+
+    hangover = int(round(hangover_sec / frame_sec))
+    if hangover > 0 and speech.any():
+        speech = np.convolve(speech, np.ones(2 * hangover + 1), mode='same') > 0
+    return speech, frame
+
+
+def speech_sample_mask(y: np.ndarray, sr: int, **kwargs) -> np.ndarray:
+    """Per-sample boolean speech mask (see `speech_frames`)."""
+    speech, frame = speech_frames(y, sr, **kwargs)
+    return np.repeat(speech, frame)[:len(y)]
+
+
+def window_speech_ratios(mask: np.ndarray, ranges: List[Tuple[int, int]], win_samples: int) -> np.ndarray:
+    """Fraction of each window [a, b) that is speech (zero padding counts as non-speech)."""
+    csum = np.concatenate([[0], np.cumsum(mask, dtype=np.int64)])
+    a = np.array([r[0] for r in ranges], dtype=np.int64)
+    b = np.array([r[1] for r in ranges], dtype=np.int64)
+    return (csum[b] - csum[a]) / float(win_samples)
 
 
 def normalize_audio(y: np.ndarray) -> np.ndarray:
@@ -98,58 +328,270 @@ def split_segments(y: np.ndarray, sr: int, seg_length_sec: float = 1.5) -> List[
     return segments
 
 
-def apply_jitter(y: np.ndarray, sr: int) -> List[np.ndarray]:
-    """Return a list containing the original waveform plus a few jittered variants.
+# -------------------------- Augmentation engine --------------------------
+# Test-time augmentation for the full pipeline, applied in the spectral
+# domain on the one STFT computed for all segments at once instead of
+# running librosa.effects.time_stretch / pitch_shift per segment:
+#   - speed change (rate 0.9 - 1.1): frames resampled along the time axis
+#   - pitch shift (-1 to +1 semitone): bins resampled along the frequency axis
+#   - small additive Gaussian noise: complex noise added to the STFT
+# Parameters and noise come from two independent streams spawned from one
+# seed, so the same audio and seed always give the same variants (and the
+# same features) without the noise repeating the draws that chose the plan.
+AUGMENT_KINDS = ('speed', 'pitch', 'noise')
+
+
+def augmentation_seed(y: np.ndarray) -> int:
+    """Per-request seed derived from the audio itself (stable across processes)."""
+    return zlib.crc32(np.ascontiguousarray(y).tobytes())
+
+
+def augmentation_rngs(seed: int) -> Tuple[np.random.Generator, np.random.Generator]:
+    """Independent (plan, noise) generators for one augmentation seed."""
+    plan_seq, noise_seq = np.random.SeedSequence(seed).spawn(2)
+    return np.random.default_rng(plan_seq), np.random.default_rng(noise_seq)
+
+
+def augmentation_plan(n_variants: int, seed: int) -> List[Tuple[str, float]]:
+    """(kind, parameter) for each augmented variant, cycling through AUGMENT_KINDS."""
+    rng = augmentation_rngs(seed)[0]
+    plan = []
+    for i in range(max(0, int(n_variants))):
+        kind = AUGMENT_KINDS[i % len(AUGMENT_KINDS)]
+        if kind == 'speed':
+            plan.append((kind, float(rng.uniform(0.9, 1.1))))
+        elif kind == 'pitch':
+            plan.append((kind, float(rng.uniform(-1.0, 1.0))))
+        else:
+            plan.append((kind, 1e-4))
+    return plan
+
+
+def _resample_axis(x: np.ndarray, positions: np.ndarray, axis: int) -> np.ndarray:
+    """Linearly interpolate `x` at fractional `positions` along `axis` (zero beyond the end)."""
+    n = x.shape[axis]
+    lo = np.floor(positions).astype(np.int64)
+    frac = (positions - lo).astype(x.dtype)
+    valid = lo < n - 1
+    lo = np.clip(lo, 0, n - 1)
+    hi = np.clip(lo + 1, 0, n - 1)
+    shape = [1] * x.ndim
+    shape[axis] = len(positions)
+    frac = frac.reshape(shape)
+    out = np.take(x, lo, axis=axis) * (1 - frac) + np.take(x, hi, axis=axis) * frac
+    # Exactly on the last frame/bin is still in range; anything after it is silence
+    last = np.isclose(positions, n - 1)
+    keep = (valid | last).reshape(shape)
+    return np.where(keep, out, 0)
+
+
+def augment_power(S: np.ndarray, P: np.ndarray, kind: str, param: float, rng: np.random.Generator,
+                  peaks: np.ndarray, window_energy: float) -> np.ndarray:
+    """Power spectrogram of one augmented variant of STFT `S` (segments, bins, frames) with power `P`."""
+    if kind == 'noise':
+        # White noise with std `param * peak` has E|N|^2 = std^2 * sum(window^2) per bin
+        std = (param * np.where(peaks > 0, peaks, 1.0)).astype(np.float32)
+        scale = (std * np.sqrt(window_energy / 2.0))[:, np.newaxis, np.newaxis]
+        noise = rng.standard_normal(S.shape, dtype=np.float32) + 1j * rng.standard_normal(S.shape, dtype=np.float32)
+        return np.abs(S + scale * noise) ** 2
+    if kind == 'speed':
+        # Output frame t reads input frame t * rate; the clip is then fixed back to its length
+        return _resample_axis(P, np.arange(P.shape[-1]) * param, axis=-1)
+    if kind == 'pitch':
+        # Frequencies scale by 2**(n_steps / 12), duration is unchanged
+        return _resample_axis(P, np.arange(P.shape[-2]) / 2.0 ** (param / 12.0), axis=-2)
+    raise ValueError(f"Unknown augmentation: {kind}")
+
+
+def augmented_rolling_means(segments: List[np.ndarray], sr: int, n_variants: int = 3, seed: int = 0,
+                            n_mfcc: int = 13, window_sec: float = 1.0, hop_sec: float = 0.5) -> np.ndarray:
+    """Per-segment embeddings averaged over the original and `n_variants` augmented variants.
+
+    Each variant embedding is the mean MFCC over rolling windows within the
+    segment, pooled from shared frames like `window_mfcc_means`; for the
+    original variant the result equals `window_mfcc_means` over the segment's
+    windows, averaged (close to, not identical with, `rolling_windows`). All segments and variants go through one batched STFT and one
+    mel projection per variant. Returns shape (num_segments, n_mfcc).
+    """
+    if len(segments) == 0:
+        return np.zeros((0, n_mfcc))
+    seg_len = len(segments[0])
+    win_samples = int(window_sec * sr)
+    hop_samples = int(hop_sec * sr)
+    starts = np.arange(0, max(1, seg_len - win_samples + 1), hop_samples)
+    n_win_frames = 1 + win_samples // MFCC_HOP_LENGTH
+    # Same end padding as window_mfcc_means, so every window is fully covered
+    last_frame = int(np.rint(starts.max() / MFCC_HOP_LENGTH)) + n_win_frames - 1
+    needed = max(seg_len, int(starts.max()) + win_samples, last_frame * MFCC_HOP_LENGTH)
+    batch = np.zeros((len(segments), needed), dtype=np.float32)
+    for i, seg in enumerate(segments):
+        batch[i, :len(seg)] = seg
+
+    S = librosa.stft(batch, n_fft=MFCC_N_FFT, hop_length=MFCC_HOP_LENGTH)
+    power = np.abs(S) ** 2
+    n_frames = S.shape[-1]
+    first = np.clip(np.rint(starts / MFCC_HOP_LENGTH).astype(np.int64), 0, max(0, n_frames - n_win_frames))
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=MFCC_N_FFT, n_mels=MFCC_N_MELS)
+    window_energy = float(np.sum(librosa.filters.get_window('hann', MFCC_N_FFT) ** 2))
+    peaks = np.abs(batch).max(axis=1)
+    rng = augmentation_rngs(seed)[1]
+
+    variants = [('original', 0.0)] + augmentation_plan(n_variants, seed)
+    total = np.zeros((len(segments), n_mfcc))
+    for kind, param in variants:
+        P = power if kind == 'original' else augment_power(S, power, kind, param, rng, peaks, window_energy)
+        # One GEMM over all segments' frames: (n_mels, segments, frames)
+        mel = np.moveaxis(np.tensordot(mel_basis, P, axes=([1], [1])), 0, 1)
+        log_mel = librosa.power_to_db(mel, top_db=None)
+        pooled = []
+        for f0 in first:
+            block = log_mel[..., f0:f0 + n_win_frames]
+            # librosa's per-window top_db floor
+            floor = block.max(axis=(-2, -1), keepdims=True) - MFCC_TOP_DB
+            pooled.append(np.maximum(block, floor).mean(axis=-1))
+        window_means = np.mean(pooled, axis=0)
+        total += scipy.fft.dct(window_means, axis=-1, type=2, norm='ortho')[:, :n_mfcc]
+    return total / len(variants)
+
+
+# ---------------------------- Feature engine -----------------------------
+# MFCCs are computed once over a whole (conditioned) signal and pooled per
+# window from frame indices, instead of calling librosa.feature.mfcc on every
+# window. Parameters mirror librosa.feature.mfcc defaults so per-window means
+# stay comparable with the old per-window computation.
+MFCC_N_FFT = 2048
+MFCC_HOP_LENGTH = 512
+MFCC_N_MELS = 128
+MFCC_TOP_DB = 80.0
+
+
+def log_mel_frames(y: np.ndarray, sr: int, n_fft: int = MFCC_N_FFT,
+                   hop_length: int = MFCC_HOP_LENGTH, n_mels: int = MFCC_N_MELS,
+                   amin: float = 1e-10) -> np.ndarray:
+    """Single STFT + mel pass over `y`. Returns unclipped log-mel frames (n_mels, n_frames)."""
+    S = librosa.feature.melspectrogram(y=y, sr=sr, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels)
+    return librosa.power_to_db(S, amin=amin, top_db=None)
+
+
+def pool_window_mfcc(log_mel: np.ndarray, starts: np.ndarray, win_samples: int, n_mfcc: int = 13,
+                     hop_length: int = MFCC_HOP_LENGTH, top_db: float = MFCC_TOP_DB) -> np.ndarray:
+    """Mean MFCC per window from precomputed log-mel frames.
+
+    Each window starting at sample `s` covers the `1 + win_samples // hop_length`
+    frames nearest to it (the frame count librosa produces for a window of that
+    length). Frame sums come from a cumulative sum over the frame axis; only
+    windows where librosa's per-window `top_db` floor would clip something are
+    gathered and clipped explicitly. The DCT is linear, so it is applied once
+    to the pooled log-mel means. Returns shape (num_windows, n_mfcc).
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    n_mels, n_frames = log_mel.shape
+    n_win_frames = 1 + win_samples // hop_length
+    first = np.rint(starts / hop_length).astype(np.int64)
+    first = np.clip(first, 0, max(0, n_frames - n_win_frames))
+
+    csum = np.zeros((n_mels, n_frames + 1), dtype=np.float64)
+    np.cumsum(log_mel, axis=1, out=csum[:, 1:])
+    pooled = (csum[:, first + n_win_frames] - csum[:, first]) / n_win_frames
+
+    if top_db is not None:
+        frame_idx = first[:, np.newaxis] + np.arange(n_win_frames)
+        win_max = log_mel.max(axis=0)[frame_idx].max(axis=1)
+        win_min = log_mel.min(axis=0)[frame_idx].min(axis=1)
+        floor = win_max - top_db
+        clipped = win_min < floor
+        if np.any(clipped):
+            gathered = log_mel[:, frame_idx[clipped]]
+            gathered = np.maximum(gathered, floor[clipped][np.newaxis, :, np.newaxis])
+            pooled[:, clipped] = gathered.mean(axis=-1)
+
+    mfcc = scipy.fft.dct(pooled, axis=0, type=2, norm='ortho')[:n_mfcc]
+    return mfcc.T
+
+
+def window_mfcc_means(y: np.ndarray, sr: int, starts, win_samples: int, n_mfcc: int = 13) -> np.ndarray:
+    """Approximate per-window MFCC means for (possibly overlapping) windows `y[s:s + win_samples]`.
+
+    Frames are computed once over `y` and shared between overlapping windows
+    (the pooling `augmented_rolling_means` uses per segment).
+    Unlike a standalone per-window call, frames at a window edge see the
+    neighbouring audio rather than zero padding, and window starts are
+    snapped to the nearest hop, so values differ slightly from per-window
+    MFCCs. `y` is zero-padded at the end so every window is fully covered.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    if starts.size == 0:
+        return np.zeros((0, n_mfcc))
+    n_win_frames = 1 + win_samples // MFCC_HOP_LENGTH
+    last_frame = int(np.rint(starts.max() / MFCC_HOP_LENGTH)) + n_win_frames - 1
+    needed = max(int(starts.max()) + win_samples, last_frame * MFCC_HOP_LENGTH)
+    if len(y) < needed:
+        y = np.pad(y, (0, needed - len(y)))
+    log_mel = log_mel_frames(y, sr)
+    return pool_window_mfcc(log_mel, starts, win_samples, n_mfcc=n_mfcc)
+
+
+def batch_window_log_mel(windows: List[np.ndarray], sr: int, win_samples: int = None,
+                         amin: float = 1e-10) -> np.ndarray:
+    """Unclipped log-mel frames for a list of equal-length windows.
+
+    The windows are laid out on the hop grid with at least `n_fft // 2` zeros
+    between them, so every frame sees exactly the zero padding a standalone
+    `librosa.feature.mfcc(y=w)` call would, and the whole batch goes through
+    a single STFT/mel pass. Windows shorter than `win_samples` (default: the
+    first window's length) are zero padded. Returns shape
+    (num_windows, n_mels, frames_per_window).
+    """
+    win_samples = win_samples or len(windows[0])
+    hop = MFCC_HOP_LENGTH
+    stride = int(np.ceil((win_samples + MFCC_N_FFT // 2) / hop)) * hop
 
-    Jittering options (one randomly applied per augmented copy):
-      - speed change (0.9 - 1.1)
-      - pitch shift (-1 to +1 semitone)
-      - small additive Gaussian noise
+    buf = np.zeros(len(windows) * stride, dtype=np.result_type(windows[0].dtype, np.float32))
+    for i, w in enumerate(windows):
+        buf[i * stride:i * stride + len(w)] = w
+    log_mel = log_mel_frames(buf, sr, amin=amin)
+    first = np.arange(len(windows)) * (stride // hop)
+    frame_idx = first[:, np.newaxis] + np.arange(1 + win_samples // hop)
+    return np.transpose(log_mel[:, frame_idx], (1, 0, 2))
 
-    The original waveform is always included first.
-    """
-    variants = [y]
 
-    # Speed change variant
-    try:
-        rate = float(np.random.uniform(0.9, 1.1))
-        y_stretch = librosa.effects.time_stretch(y, rate)
-        # Resample or trim/pad back to original length
-        y_stretch = librosa.util.fix_length(y_stretch, size=len(y))
-        variants.append(y_stretch)
-    except Exception:
-        pass
+def pool_window_log_mel(frames: np.ndarray, n_mfcc: int = 13, top_db: float = MFCC_TOP_DB) -> np.ndarray:
+    """Mean MFCC per window from (num_windows, n_mels, frames) log-mel blocks.
 
-    # Pitch shift variant
-    try:
-        n_steps = float(np.random.uniform(-1.0, 1.0))
-        y_pitch = librosa.effects.pitch_shift(y, sr, n_steps=n_steps)
-        y_pitch = librosa.util.fix_length(y_pitch, size=len(y))
-        variants.append(y_pitch)
-    except Exception:
-        pass
+    Applies librosa's `top_db` floor relative to each window's own maximum,
+    averages over frames, then applies the (linear) DCT once per window.
+    """
+    if top_db is not None:
+        floor = frames.max(axis=(1, 2)) - top_db
+        frames = np.maximum(frames, floor[:, np.newaxis, np.newaxis])
+    pooled = frames.mean(axis=2)
+    return scipy.fft.dct(pooled, axis=1, type=2, norm='ortho')[:, :n_mfcc]
 
-    # Additive noise variant
-    try:
-        noise_amp = 1e-4 * np.max(np.abs(y)) if np.max(np.abs(y)) > 0 else 1e-4
-        y_noise = y + np.random.normal(0, noise_amp, size=y.shape)
-        variants.append(y_noise)
-    except Exception:
-        pass
 
-    # Ensure uniqueness and limit count
-    unique_variants = []
-    for v in variants:
-        if not any(np.array_equal(v, u) for u in unique_variants):
-            unique_variants.append(v)
+def batch_window_mfcc_means(windows: List[np.ndarray], sr: int, n_mfcc: int = 13,
+                            win_samples: int = None) -> np.ndarray:
+    """Per-window MFCC means for a list of equal-length windows.
 
-    return unique_variants
+    The windows are copied into one buffer, so they may be overlapping views
+    of the same signal. Equivalent to `np.mean(librosa.feature.mfcc(y=w), axis=1)` for each window,
+    computed with one STFT/mel pass (see `batch_window_log_mel`, which also
+    zero pads windows shorter than `win_samples`). Returns shape (num_windows, n_mfcc).
+    """
+    if len(windows) == 0:
+        return np.zeros((0, n_mfcc))
+    with stage('mfcc'):
+        return pool_window_log_mel(batch_window_log_mel(windows, sr, win_samples), n_mfcc=n_mfcc)
 
 
 def rolling_windows(y: np.ndarray, sr: int, window_sec: float = 1.0, hop_sec: float = 0.5,
                     n_mfcc: int = 13) -> np.ndarray:
     """Compute per-window embeddings (MFCC mean) across rolling windows.
 
+    Each window is cut at its exact sample offset and gets its own frames
+    (one batched pass, see `batch_window_mfcc_means`), so the result matches
+    a per-window `librosa.feature.mfcc` call. Overlapping audio is framed once
+    per window; `window_mfcc_means` is the cheaper shared-frame approximation.
+    A clip shorter than one window is zero padded to a single window.
     Returns a 2D array of shape (num_windows, n_mfcc). Caller can aggregate.
     """
     win_samples = int(window_sec * sr)
@@ -157,22 +599,9 @@ def rolling_windows(y: np.ndarray, sr: int, window_sec: float = 1.0, hop_sec: fl
     if win_samples <= 0:
         return np.zeros((0, n_mfcc))
 
-    windows = []
-    for start in range(0, max(1, len(y) - win_samples + 1), hop_samples):
-        w = y[start:start + win_samples]
-        if len(w) < win_samples:
-            w = librosa.util.fix_length(w, size=win_samples)
-        mfcc = librosa.feature.mfcc(y=w, sr=sr, n_mfcc=n_mfcc)
-        mfcc_mean = np.mean(mfcc, axis=1)
-        windows.append(mfcc_mean)
-
-    if len(windows) == 0:
-        # Fallback: compute for a single padded window
-        w = librosa.util.fix_length(y, size=win_samples)
-        mfcc = librosa.feature.mfcc(y=w, sr=sr, n_mfcc=n_mfcc)
-        return np.mean(mfcc, axis=1)[np.newaxis, :]
-
-    return np.stack(windows, axis=0)
+    starts = range(0, max(1, len(y) - win_samples + 1), hop_samples)
+    return batch_window_mfcc_means([y[s:s + win_samples] for s in starts], sr, n_mfcc=n_mfcc,
+                                   win_samples=win_samples)
 
 
 def prepare_fixed_windows(y: np.ndarray, sr: int, window_sec: float = 1.0) -> List[np.ndarray]:
@@ -195,7 +624,8 @@ def prepare_fixed_windows(y: np.ndarray, sr: int, window_sec: float = 1.0) -> Li
 
 
 # ------------------------- High-level pipeline API -----------------------
-def extract_mfcc(y: np.ndarray, sr: int = None, n_mfcc: int = 13, fast: bool = False) -> np.ndarray:
+def extract_mfcc(y: np.ndarray, sr: int = None, n_mfcc: int = 13, fast: bool = False,
+                 n_variants: int = None, seed: int = None) -> np.ndarray:
     """Full preprocessing + embedding extraction.
 
     Steps implemented (in order):
@@ -203,7 +633,8 @@ def extract_mfcc(y: np.ndarray, sr: int = None, n_mfcc: int = 13, fast: bool = F
       2. Normalization (peak)
       3. Pre-emphasis (coef=0.97)
       4. Segment splitting (1.5s segments, pad if needed)
-      5. Jittering: keep original + augmented variants
+      5. Jittering: keep original + `n_variants` augmented variants
+         (default settings.AUGMENT_VARIANTS), seeded by `seed` or by the audio
       6. Rolling embeddings: overlapping windows per segment (1s window, 0.5s hop)
       7. Fixed-window segmentation helper for model inputs (1s windows)
 
@@ -221,19 +652,16 @@ def extract_mfcc(y: np.ndarray, sr: int = None, n_mfcc: int = 13, fast: bool = F
 
         # Use single 1s non-overlapping windows (fewer MFCC calls)
         segments = split_segments(y_proc, sr, seg_length_sec=1.0)
-        window_embs = []
-        for seg in segments:
-            try:
-                mf = librosa.feature.mfcc(y=seg, sr=sr, n_mfcc=n_mfcc)
-                window_embs.append(np.mean(mf, axis=1))
-            except Exception:
-                window_embs.append(np.zeros(n_mfcc))
+        try:
+            window_embs = batch_window_mfcc_means(segments, sr, n_mfcc=n_mfcc)
+        except Exception:
+            window_embs = np.zeros((len(segments), n_mfcc))
 
         if len(window_embs) == 0:
             mf = librosa.feature.mfcc(y=y_proc, sr=sr, n_mfcc=n_mfcc)
             return np.mean(mf, axis=1)
 
-        return np.mean(np.stack(window_embs, axis=0), axis=0)
+        return np.mean(window_embs, axis=0)
 
     # Original (slower, higher-accuracy) pipeline
     sr = sr or settings.SAMPLE_RATE
@@ -250,30 +678,16 @@ def extract_mfcc(y: np.ndarray, sr: int = None, n_mfcc: int = 13, fast: bool = F
     # 4. Segment splitting (1.5s)
     segments = split_segments(y_proc, sr, seg_length_sec=1.5)
 
-    segment_embeddings = []
-    for seg in segments:
-        # 5. Jittering -> produce list of variants (original + aug)
-        variants = apply_jitter(seg, sr)
-
-        variant_embeddings = []
-        for v in variants:
-            # 6. Rolling embeddings: 1s windows with 0.5s hop
-            win_embs = rolling_windows(v, sr, window_sec=1.0, hop_sec=0.5, n_mfcc=n_mfcc)
-            # Aggregate per-variant by mean pooling over windows
-            if win_embs.size == 0:
-                continue
-            pooled = np.mean(win_embs, axis=0)
-            variant_embeddings.append(pooled)
-
-        # If no variant embeddings were produced, fallback to MFCC of the seg
-        if len(variant_embeddings) == 0:
-            mf = librosa.feature.mfcc(y=seg, sr=sr, n_mfcc=n_mfcc)
-            segment_embeddings.append(np.mean(mf, axis=1))
-            continue
-
-        # Aggregate across variants for this segment (mean)
-        segment_emb = np.mean(np.stack(variant_embeddings, axis=0), axis=0)
-        segment_embeddings.append(segment_emb)
+    # 5-6. Jittered variants of every segment, batched in the spectral domain,
+    # mean-pooled over rolling windows and then over variants
+    n_variants = settings.AUGMENT_VARIANTS if n_variants is None else n_variants
+    if seed is None:
+        seed = settings.AUGMENT_SEED if settings.AUGMENT_SEED is not None else augmentation_seed(y)
+    try:
+        segment_embeddings = augmented_rolling_means(segments, sr, n_variants=n_variants, seed=seed,
+                                                     n_mfcc=n_mfcc, window_sec=1.0, hop_sec=0.5)
+    except Exception:
+        segment_embeddings = np.zeros((0, n_mfcc))
 
     # Aggregate across segments to a single feature vector (mean pooling)
     if len(segment_embeddings) == 0:
@@ -281,21 +695,25 @@ def extract_mfcc(y: np.ndarray, sr: int = None, n_mfcc: int = 13, fast: bool = F
         mf = librosa.feature.mfcc(y=y_proc, sr=sr, n_mfcc=n_mfcc)
         return np.mean(mf, axis=1)
 
-    final_embedding = np.mean(np.stack(segment_embeddings, axis=0), axis=0)
+    final_embedding = np.mean(segment_embeddings, axis=0)
 
     # final_embedding is shape (n_mfcc,) - compatible with existing predict API
     return final_embedding
 
 
-def prepare_model_windows_from_audio(y: np.ndarray, sr: int, window_sec: float = 1.0) -> List[np.ndarray]:
+def prepare_model_windows_from_audio(y: np.ndarray, sr: int, window_sec: float = 1.0,
+                                     pre_emphasis: bool = True, return_lengths: bool = False):
     """Convenience function: run trimming/normalize/preemph and produce
     fixed windows ready for a frame-wise model (e.g., HuBERT).
 
     Returns list of 1-sec windows (numpy arrays) each exactly length sr*window_sec.
+    With `return_lengths`, returns (windows, lengths) where lengths are the
+    real (unpadded) samples in each window, for building attention masks.
     """
     y_proc = trim_silence(y, top_db=20)
     y_proc = normalize_audio(y_proc)
-    y_proc = pre_emphasize(y_proc, coef=0.97)
+    if pre_emphasis:
+        y_proc = pre_emphasize(y_proc, coef=0.97)
 
     # Split into longer segments first to keep consistent behavior
     segments = split_segments(y_proc, sr, seg_length_sec=1.5)
@@ -303,76 +721,125 @@ def prepare_model_windows_from_audio(y: np.ndarray, sr: int, window_sec: float =
     for seg in segments:
         seg_windows = prepare_fixed_windows(seg, sr, window_sec=window_sec)
         windows.extend(seg_windows)
+    if return_lengths:
+        lengths = [b - a for a, b in _window_layout(len(y_proc), sr, 1.5, window_sec)]
+        return windows, lengths
     return windows
 
 
-def preprocess_audio(y: np.ndarray, sr: int, window_sec: float = 1.0, n_mfcc: int = 13, fast: bool = False):
-    """Run the full preprocessing pipeline and return a dictionary with
-    processed windows and summary statistics useful for debugging/UI.
-
-    Returns a dict with keys:
-      - 'sr', 'original_samples', 'num_segments', 'num_windows'
-      - 'mfcc_means': list of per-window mean MFCC vectors (as lists)
-      - 'windows': list of numpy arrays (the fixed-length windows)
+def _window_layout(n_samples: int, sr: int, seg_length_sec: float, window_sec: float) -> List[Tuple[int, int]]:
+    """Sample range [a, b) of every window `split_segments` + `prepare_fixed_windows` produce."""
+    seg_samples = int(seg_length_sec * sr)
+    win_samples = int(window_sec * sr)
+    ranges = []
+    for seg_start in range(0, max(1, n_samples), seg_samples):
+        seg_end = min(seg_start + seg_samples, n_samples)
+        for start in range(0, seg_samples, win_samples):
+            a = seg_start + start
+            ranges.append((min(a, seg_end), min(a + win_samples, seg_end)))
+    return ranges
+
+
+def prepare_windows(y: np.ndarray, sr: int, window_sec: float = 1.0, fast: bool = False,
+                    vad: str = None, min_speech_ratio: float = None) -> dict:
+    """Trim, VAD, normalize, pre-emphasize and cut `y` into fixed windows.
+
+    This is everything `preprocess_audio` does before MFCC. Besides the
+    windows it returns 'window_ends': the sample index in `y` up to which each
+    window's audio comes from (used to report how much audio anytime
+    inference consumed).
     """
-    # Fast preprocessing: fewer windows and skip augmentations
-    if fast:
-        y_proc = trim_silence(y, top_db=20)
+    # Fast preprocessing: 1 s segments; full: 1.5 s segments split into windows
+    seg_length_sec = 1.0 if fast else 1.5
+    if vad is None:
+        vad = settings.VAD_FAST if fast else settings.VAD_FULL
+    if vad not in VAD_MODES:
+        raise ValueError(f"Unknown VAD mode: {vad} (expected one of {', '.join(VAD_MODES)})")
+    if min_speech_ratio is None:
+        min_speech_ratio = settings.VAD_MIN_SPEECH_RATIO
+
+    # Trim/normalize/pre-emphasis
+    with stage('trim'):
+        trim_start, trim_end = trim_bounds(y, top_db=20)
+    y_proc = y[trim_start:trim_end]
+    trimmed_samples = len(y_proc)
+    windows_before = len(_window_layout(trimmed_samples, sr, seg_length_sec, window_sec))
+    mask = None
+    positions = None  # input index of each kept sample, when VAD cut samples out
+    if vad != 'off' and trimmed_samples > 0:
+        with stage('vad'):
+            mask = speech_sample_mask(y_proc, sr)
+        if vad == 'frames' and mask.any():
+            y_proc = y_proc[mask]
+            positions = np.flatnonzero(mask)
+    with stage('windowing'):
         y_proc = normalize_audio(y_proc)
         y_proc = pre_emphasize(y_proc, coef=0.97)
 
-        segments = split_segments(y_proc, sr, seg_length_sec=1.0)
+        # Split into segments then fixed windows
+        segments = split_segments(y_proc, sr, seg_length_sec=seg_length_sec)
         windows = []
         for seg in segments:
             seg_windows = prepare_fixed_windows(seg, sr, window_sec=window_sec)
             windows.extend(seg_windows)
-
-        mfcc_means = []
-        for w in windows:
-            try:
-                mf = librosa.feature.mfcc(y=w, sr=sr, n_mfcc=n_mfcc)
-                mfcc_means.append(np.mean(mf, axis=1).tolist())
-            except Exception:
-                mfcc_means.append([0.0] * n_mfcc)
-
-        return {
-            'sr': int(sr),
-            'original_samples': int(len(y)),
-            'num_segments': int(len(segments)),
-            'num_windows': int(len(windows)),
-            'mfcc_means': mfcc_means,
-            'windows': windows,
-        }
-
-    # Original full pipeline
-    # Trim/normalize/pre-emphasis
-    y_proc = trim_silence(y, top_db=20)
-    y_proc = normalize_audio(y_proc)
-    y_proc = pre_emphasize(y_proc, coef=0.97)
-
-    # Split into segments then fixed windows
-    segments = split_segments(y_proc, sr, seg_length_sec=1.5)
-    windows = []
-    for seg in segments:
-        seg_windows = prepare_fixed_windows(seg, sr, window_sec=window_sec)
-        windows.extend(seg_windows)
-
-    # Compute per-window MFCC mean embeddings
-    mfcc_means = []
-    for w in windows:
-        try:
-            mf = librosa.feature.mfcc(y=w, sr=sr, n_mfcc=n_mfcc)
-            mf_mean = np.mean(mf, axis=1)
-            mfcc_means.append(mf_mean.tolist())
-        except Exception:
-            # if MFCC fails, append zeros
-            mfcc_means.append([0.0] * n_mfcc)
+        ranges = _window_layout(len(y_proc), sr, seg_length_sec, window_sec)
+
+    removed_samples = trimmed_samples - len(y_proc)
+    if vad == 'windows' and mask is not None:
+        ratios = window_speech_ratios(mask, ranges, int(window_sec * sr))
+        keep = ratios >= min_speech_ratio
+        if not keep.any():
+            keep[int(np.argmax(ratios))] = True
+        removed_samples = int(sum(b - a for (a, b), k in zip(ranges, keep) if not k))
+        windows = [w for w, k in zip(windows, keep) if k]
+        ranges = [r for r, k in zip(ranges, keep) if k]
+
+    ends = np.array([b for _, b in ranges], dtype=np.int64)
+    if positions is not None and len(positions):
+        ends = positions[np.clip(ends - 1, 0, len(positions) - 1)] + 1
+    window_ends = (trim_start + ends).tolist()
 
     return {
         'sr': int(sr),
         'original_samples': int(len(y)),
         'num_segments': int(len(segments)),
         'num_windows': int(len(windows)),
-        'mfcc_means': mfcc_means,
         'windows': windows,
+        'window_ends': window_ends,
+        'vad': {
+            'mode': vad,
+            'input_seconds': round(trimmed_samples / float(sr), 3),
+            'speech_seconds': round(float(mask.sum()) / sr, 3) if mask is not None else None,
+            'removed_seconds': round(removed_samples / float(sr), 3),
+            'windows_before': windows_before,
+            'windows_removed': max(0, windows_before - len(windows)),
+        },
     }
+
+
+def preprocess_audio(y: np.ndarray, sr: int, window_sec: float = 1.0, n_mfcc: int = 13, fast: bool = False,
+                     vad: str = None, min_speech_ratio: float = None):
+    """Run the full preprocessing pipeline and return a dictionary with
+    processed windows and summary statistics useful for debugging/UI.
+
+    `vad` is one of VAD_MODES (default: settings.VAD_FAST / settings.VAD_FULL
+    for the fast / full pipeline).
+
+    Returns a dict with keys:
+      - 'sr', 'original_samples', 'num_segments', 'num_windows'
+      - 'mfcc_means': list of per-window mean MFCC vectors (as lists)
+      - 'windows': list of numpy arrays (the fixed-length windows)
+      - 'vad': how much audio and how many windows voice activity detection removed
+    """
+    summary = prepare_windows(y, sr, window_sec=window_sec, fast=fast, vad=vad, min_speech_ratio=min_speech_ratio)
+    summary.pop('window_ends')
+    windows = summary['windows']
+
+    # Compute per-window MFCC mean embeddings in one pass over all windows
+    try:
+        mfcc_means = batch_window_mfcc_means(windows, sr, n_mfcc=n_mfcc).tolist()
+    except Exception:
+        # if MFCC fails, use zeros
+        mfcc_means = [[0.0] * n_mfcc for _ in windows]
+    summary['mfcc_means'] = mfcc_means
+    return summary
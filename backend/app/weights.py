@@ -0,0 +1,205 @@
+"""
+Memory-mapped model artifacts: a flat tensor file with a JSON header.
+
+Usage (from backend/):
+    python -m app.weights convert ../ml/saved_models/cnn_bn_final.pt      # -> cnn_bn_final.weights
+    python -m app.weights convert transformer_wide.pt out.weights --nhead 12 --activation gelu
+    python -m app.weights info ../ml/saved_models/cnn_bn_final.weights
+
+Then point MODEL_PATH at the `.weights` file (app.models.load_module
+recognises it by its magic bytes, whatever the name).
+
+Layout:
+  - 8 bytes   MAGIC
+  - 8 bytes   header length (little-endian uint64)
+  - header    JSON: architecture (a name in app.models.ARCHITECTURES), its
+              constructor kwargs, input_shape, a digest of the tensor data
+              and, per tensor, dtype, shape and byte offset. Padded so
+              the data starts on an ALIGN boundary
+  - data      the state_dict tensors back to back, each ALIGN-aligned
+
+Loading maps the file copy-on-write, wraps each tensor as a view of the
+mapping, builds the module on the meta device and assigns the views as
+its parameters. Nothing is unpickled or copied: every uvicorn worker
+serving the same file shares its page-cache pages read-only, and startup
+costs a header parse instead of a deserialization. (The int8 backend
+quantizes a private copy, and moving the module to a GPU copies it too.)
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+MAGIC = b'AURWGT01'
+ALIGN = 64
+FORMAT_VERSION = 1
+SUFFIX = '.weights'
+DTYPES = {
+    torch.float32: 'float32',
+    torch.float16: 'float16',
+    torch.float64: 'float64',
+    torch.int64: 'int64',
+    torch.int32: 'int32',
+    torch.uint8: 'uint8',
+    torch.bool: 'bool',
+}
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def is_weights_file(path) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _read_header(path) -> tuple:
+    """(header, byte offset of the tensor data)."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a {SUFFIX} artifact")
+        length = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(length))
+    if header.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported artifact version {header.get('version')}")
+    return header, len(MAGIC) + 8 + length
+
+
+def read_header(path) -> dict:
+    return _read_header(path)[0]
+
+
+def save(module: torch.nn.Module, path, metadata: dict = None) -> dict:
+    """Write `module` (a registered architecture) as a `.weights` artifact. Returns the header."""
+    from app.models import INPUT_SHAPE, describe
+    architecture, config = describe(module)
+    state = {k: v.detach().cpu().contiguous() for k, v in module.state_dict().items()}
+
+    tensors, offset = {}, 0
+    digest = hashlib.sha256()
+    for name, t in state.items():
+        if t.dtype not in DTYPES:
+            raise ValueError(f"{name}: unsupported dtype {t.dtype}")
+        nbytes = t.numel() * t.element_size()
+        tensors[name] = {'dtype': DTYPES[t.dtype], 'shape': list(t.shape), 'offset': offset}
+        digest.update(name.encode('utf-8'))
+        digest.update(t.numpy().tobytes())
+        offset = _aligned(offset + nbytes)
+    header = {
+        'format': 'auraldine-weights',
+        'version': FORMAT_VERSION,
+        'architecture': architecture,
+        'config': config,
+        'input_shape': list(getattr(module, 'input_shape', INPUT_SHAPE)),
+        'digest': digest.hexdigest()[:16],
+        'tensors': tensors,
+        'data_bytes': offset,
+        'metadata': metadata or {},
+    }
+
+    encoded = json.dumps(header).encode('utf-8')
+    encoded += b' ' * (_aligned(len(MAGIC) + 8 + len(encoded)) - len(MAGIC) - 8 - len(encoded))
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        base = f.tell()
+        for name, t in state.items():
+            f.seek(base + tensors[name]['offset'])
+            f.write(t.numpy().tobytes())
+        f.truncate(base + offset)
+    os.replace(tmp, path)
+    return header
+
+
+def load_state_dict(path) -> tuple:
+    """(header, state_dict) with every tensor a zero-copy view of the mapped file."""
+    header, base = _read_header(path)
+    # Copy-on-write: pages are shared with every other process mapping the
+    # file until written to, and a stray write can't corrupt the artifact
+    data = np.memmap(path, dtype=np.uint8, mode='c', offset=base, shape=(header['data_bytes'],))
+    state = {}
+    for name, spec in header['tensors'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        view = data[spec['offset']:spec['offset'] + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+        state[name] = torch.from_numpy(view)
+    return header, state
+
+
+def load(path, device='cpu') -> torch.nn.Module:
+    """Rebuild the module from a `.weights` artifact, parameters backed by the mapped file."""
+    from app.models import build
+    header, state = load_state_dict(path)
+    module = build(header['architecture'], header['config'])
+    module.load_state_dict(state, strict=True, assign=True)
+    module.input_shape = tuple(header['input_shape'])
+    return module.to(device).eval()
+
+
+def convert(src, dst=None, **kwargs) -> tuple:
+    """Re-save a pickled module or notebook state_dict as `.weights`.
+
+    `kwargs` are the architecture settings a state_dict can't tell (see
+    app.models.module_from_state_dict). Returns (dst, source module).
+    """
+    from app.models import module_from_state_dict
+    module = torch.load(src, map_location='cpu', weights_only=False)
+    if isinstance(module, dict):
+        module = module_from_state_dict(module.get('state_dict', module), **kwargs)
+    dst = Path(dst) if dst else Path(src).with_suffix(SUFFIX)
+    save(module, dst, metadata={'source': Path(src).name, 'converted': time.strftime('%Y-%m-%dT%H:%M:%S')})
+    return dst, module.eval()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert models to memory-mapped .weights artifacts.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('convert', help='re-save a .pt model as a .weights artifact')
+    p.add_argument('src', type=Path)
+    p.add_argument('dst', type=Path, nargs='?', help=f'default: src with a {SUFFIX} suffix')
+    p.add_argument('--nhead', type=int, help='Transformer heads (not recoverable from a state_dict)')
+    p.add_argument('--activation', choices=('relu', 'gelu'), help='Transformer activation')
+    p = sub.add_parser('info', help='print the header of a .weights artifact')
+    p.add_argument('path', type=Path)
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        header = read_header(args.path)
+        params = sum(int(np.prod(t['shape'], dtype=np.int64)) for t in header['tensors'].values())
+        print(f"{args.path}: {header['architecture']} {header['config']}")
+        print(f"  input {tuple(header['input_shape'])}, {len(header['tensors'])} tensors, {params:,} values, "
+              f"{header['data_bytes'] / 2 ** 20:.1f} MB, digest {header['digest']}")
+        for key, value in header['metadata'].items():
+            print(f"  {key}: {value}")
+        return 0
+
+    if not args.src.exists():
+        print(f"Model file not found: {args.src}")
+        return 1
+    kwargs = {k: v for k, v in (('nhead', args.nhead), ('activation', args.activation)) if v is not None}
+    started = time.perf_counter()
+    dst, module = convert(args.src, args.dst, **kwargs)
+    # Check the artifact reproduces the original model
+    from app.inference import EagerBackend, example_input
+    x = example_input(batch_size=2).numpy()
+    diff = np.abs(EagerBackend(module).run(x) - EagerBackend(load(dst)).run(x)).max()
+    print(f"Wrote {dst} ({dst.stat().st_size / 2 ** 20:.1f} MB) in {time.perf_counter() - started:.2f}s, "
+          f"max abs logit difference {diff:.2e}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
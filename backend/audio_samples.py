@@ -0,0 +1,37 @@
+"""Synthetic audio (and a tiny HuBERT config) shared by the test modules and the benchmarks."""
+import io
+
+import numpy as np
+import soundfile as sf
+
+
+def speech_like(duration: float, sr: int = 16000, seed: int = 0, vary: bool = False) -> np.ndarray:
+    """Voiced/unvoiced bursts on top of a low noise floor.
+
+    With `vary` the burst rate and pitch are drawn from the seed as well, so
+    clips with different seeds differ in more than their noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    rate, pitch = (rng.uniform(2, 5), rng.uniform(100, 250)) if vary else (3, 150)
+    envelope = 0.05 + 0.8 * (np.sin(2 * np.pi * rate * t) > 0)
+    f0 = pitch + 50 * np.sin(2 * np.pi * 0.5 * t)
+    y = envelope * (0.4 * np.sin(2 * np.pi * f0 * t) + 0.05 * rng.standard_normal(t.size))
+    return y.astype(np.float32)
+
+
+def wav_bytes(seconds=1.0, sr=16000, freq=220.0, fmt='WAV'):
+    """A sine tone encoded as 16-bit WAV (or another soundfile `fmt`, e.g. 'FLAC')."""
+    t = np.arange(int(seconds * sr)) / sr
+    buf = io.BytesIO()
+    sf.write(buf, (0.3 * np.sin(2 * np.pi * freq * t)).astype(np.float32), sr, format=fmt, subtype='PCM_16')
+    return buf.getvalue()
+
+
+def small_config(**kwargs):
+    """A randomly initialised HuBERT small enough for CPU tests (needs transformers)."""
+    from transformers import HubertConfig
+    # Default conv strides/kernels, so frame counts match HuBERT-base (49 per second)
+    return HubertConfig(hidden_size=32, num_hidden_layers=4, num_attention_heads=2, intermediate_size=64,
+                        conv_dim=(16,) * 7, num_conv_pos_embeddings=16, num_conv_pos_embedding_groups=2,
+                        **kwargs)
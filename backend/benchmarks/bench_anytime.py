@@ -0,0 +1,104 @@
+"""Latency and agreement of anytime (early-exit) inference on long uploads.
+
+Usage (from backend/):
+    python benchmarks/bench_anytime.py [--durations 10 30 60] [--margins 0.2 0.3 0.5]
+    python benchmarks/bench_anytime.py --model models/model.pth
+
+Each clip is a WAV upload run through pipeline.predict_upload (whole clip)
+and pipeline.anytime_upload (caches disabled). Without --model the
+classifier is a seeded random linear softmax over the 13 pooled MFCCs, so
+the posterior drifts as windows accumulate the way a real one does; the
+service's dummy mode is always confident and would stop after
+ANYTIME_PATIENCE windows. `agree` is the fraction of clips where the anytime
+answer equals the whole-clip answer.
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import pipeline
+from app.config import settings
+from app.model_service import ModelService, STATE_MAPPING
+from audio_samples import speech_like
+
+
+class LinearService(ModelService):
+    """ModelService whose 'model' is a fixed random softmax(W x / T)."""
+
+    def __init__(self, seed=0, temperature=100.0):
+        super().__init__()
+        rng = np.random.default_rng(seed)
+        self.weights = rng.standard_normal((13, len(STATE_MAPPING)))
+        self.temperature = temperature
+        self.model = self
+        self.model_version = f'linear-{seed}'
+
+    def predict_proba(self, features):
+        logits = np.asarray(features) @ self.weights / self.temperature
+        logits -= logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=-1, keepdims=True)
+
+
+def wav(y, sr):
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format='WAV')
+    return buf.getvalue()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, 1000.0 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 30, 60])
+    parser.add_argument('--margins', type=float, nargs='+', default=[0.2, 0.3, 0.5])
+    parser.add_argument('--patience', type=int, default=settings.ANYTIME_PATIENCE)
+    parser.add_argument('--max-seconds', type=float, default=settings.ANYTIME_MAX_SECONDS)
+    parser.add_argument('--clips', type=int, default=5, help='clips per duration')
+    parser.add_argument('--model', help='real model weights instead of the random linear classifier')
+    parser.add_argument('--full', action='store_true', help='full (1.5 s segment) pipeline instead of fast')
+    args = parser.parse_args()
+    settings.CACHE_ENABLED = False
+    settings.ANYTIME_PATIENCE = args.patience
+    settings.ANYTIME_MAX_SECONDS = args.max_seconds
+    sr = settings.SAMPLE_RATE
+    fast = not args.full
+
+    if args.model:
+        service = ModelService(args.model)
+        service.load_model()
+    else:
+        service = LinearService()
+    pipeline.set_model_service(service)
+    pipeline.predict_upload(wav(speech_like(2.0, sr), sr), fast=fast)  # JIT warmup
+
+    print(f"{'audio s':>7} {'mode':<14} {'p50 ms':>8} {'max ms':>8} {'used s':>7} {'early':>6} {'agree':>6}")
+    for duration in args.durations:
+        clips = [wav(speech_like(duration, sr, seed=i, vary=True), sr) for i in range(args.clips)]
+        full = [timed(pipeline.predict_upload, c, fast=fast) for c in clips]
+        times = [ms for _, ms in full]
+        print(f"{duration:>7.0f} {'whole clip':<14} {np.median(times):>8.0f} {max(times):>8.0f} {duration:>7.1f} "
+              f"{'-':>6} {'-':>6}")
+        for margin in args.margins:
+            settings.ANYTIME_MARGIN = margin
+            runs = [timed(pipeline.anytime_upload, c, fast=fast) for c in clips]
+            times = [ms for _, ms in runs]
+            used = np.mean([r['seconds_used'] for r, _ in runs])
+            early = np.mean([r['stopped'] == 'confident' for r, _ in runs])
+            agree = np.mean([r['state'] == f['state'] for (r, _), (f, _) in zip(runs, full)])
+            print(f"{duration:>7.0f} {'margin ' + str(margin):<14} {np.median(times):>8.0f} {max(times):>8.0f} "
+                  f"{used:>7.1f} {early:>6.0%} {agree:>6.0%}")
+
+
+if __name__ == '__main__':
+    main()
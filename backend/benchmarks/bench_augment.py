@@ -0,0 +1,126 @@
+"""Full (FAST_PREPROCESS=0) pipeline: per-segment apply_jitter vs the batched spectral engine.
+
+Usage (from backend/):
+    python benchmarks/bench_augment.py [--durations 10 30 60]
+    python benchmarks/bench_augment.py --data /data/labeled_clips [--variants 3]
+
+Two baselines are timed, because the original `apply_jitter` called
+`time_stretch(y, rate)` / `pitch_shift(y, sr, ...)` positionally, which
+librosa >= 0.10 rejects, so only its noise variant ever ran:
+  - jitter (as shipped): original + noise
+  - jitter (intended):   original + speed + pitch + noise, keyword arguments
+Feature drift is the relative L2 distance of the final vectors. With --data
+(audio files whose names contain the state, e.g. `kerala_012.wav`) the
+accuracy delta is measured with a leave-one-out nearest-centroid classifier
+on each pipeline's features.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import librosa
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.utils import (
+    extract_mfcc, normalize_audio, pre_emphasize, read_audio_bytes, rolling_windows,
+    split_segments, trim_silence,
+)
+from audio_samples import speech_like
+
+STATES = ('andhra', 'gujara', 'jharkhand', 'karnataka', 'kerala', 'tamil')
+
+
+def legacy_jitter(y, sr, rng, intended):
+    variants = [y]
+    if intended:
+        rate = float(rng.uniform(0.9, 1.1))
+        variants.append(librosa.util.fix_length(librosa.effects.time_stretch(y, rate=rate), size=len(y)))
+        n_steps = float(rng.uniform(-1.0, 1.0))
+        variants.append(librosa.util.fix_length(librosa.effects.pitch_shift(y, sr=sr, n_steps=n_steps), size=len(y)))
+    noise_amp = 1e-4 * np.max(np.abs(y)) if np.max(np.abs(y)) > 0 else 1e-4
+    variants.append(y + rng.normal(0, noise_amp, size=y.shape))
+    unique = []
+    for v in variants:
+        if not any(np.array_equal(v, u) for u in unique):
+            unique.append(v)
+    return unique
+
+
+def legacy_full(y, sr, intended, seed=0):
+    rng = np.random.default_rng(seed)
+    y_proc = pre_emphasize(normalize_audio(trim_silence(y, top_db=20)), coef=0.97)
+    segment_embeddings = []
+    for seg in split_segments(y_proc, sr, seg_length_sec=1.5):
+        pooled = [np.mean(rolling_windows(v, sr, window_sec=1.0, hop_sec=0.5), axis=0)
+                  for v in legacy_jitter(seg, sr, rng, intended)]
+        segment_embeddings.append(np.mean(pooled, axis=0))
+    return np.mean(segment_embeddings, axis=0)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, 1000.0 * (time.perf_counter() - start)
+
+
+def rel(a, b):
+    return float(np.linalg.norm(a - b) / np.linalg.norm(b))
+
+
+def loo_nearest_centroid(features, labels):
+    features = np.asarray(features)
+    features = (features - features.mean(0)) / (features.std(0) + 1e-9)
+    correct = 0
+    for i in range(len(labels)):
+        mask = np.arange(len(labels)) != i
+        classes = sorted(set(labels[mask]))
+        centroids = np.stack([features[mask][labels[mask] == c].mean(0) for c in classes])
+        correct += classes[int(np.argmin(np.linalg.norm(centroids - features[i], axis=1)))] == labels[i]
+    return correct / len(labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 30, 60])
+    parser.add_argument('--variants', type=int, default=3)
+    parser.add_argument('--sr', type=int, default=16000)
+    parser.add_argument('--data', type=Path, help='labeled audio folder for the accuracy delta')
+    args = parser.parse_args()
+    sr = args.sr
+
+    extract_mfcc(speech_like(2.0, sr), sr=sr)  # JIT warmup
+    print(f"{'audio s':>7} {'shipped ms':>11} {'intended ms':>12} {'engine ms':>10} {'speedup':>8} "
+          f"{'drift vs shipped':>17} {'drift vs intended':>18}")
+    for duration in args.durations:
+        y = speech_like(duration, sr, seed=int(duration))
+        shipped, t_shipped = timed(legacy_full, y, sr, intended=False)
+        intended, t_intended = timed(legacy_full, y, sr, intended=True)
+        engine, t_engine = timed(extract_mfcc, y, sr=sr, fast=False, n_variants=args.variants, seed=0)
+        print(f"{duration:>7.0f} {t_shipped:>11.0f} {t_intended:>12.0f} {t_engine:>10.0f} "
+              f"{t_intended / t_engine:>7.1f}x {rel(engine, shipped):>17.4f} {rel(engine, intended):>18.4f}")
+
+    if args.data:
+        files, labels = [], []
+        for path in sorted(args.data.rglob('*')):
+            label = next((s for s in STATES if s in path.name.lower()), None)
+            if label and path.is_file():
+                files.append(path)
+                labels.append(label)
+        labels = np.array(labels)
+        feats = {'shipped': [], 'intended': [], 'engine': []}
+        for path in files:
+            y, _ = read_audio_bytes(path.read_bytes(), sr)
+            feats['shipped'].append(legacy_full(y, sr, intended=False))
+            feats['intended'].append(legacy_full(y, sr, intended=True))
+            feats['engine'].append(extract_mfcc(y, sr=sr, fast=False, n_variants=args.variants))
+        print(f"\n{len(files)} labeled clips, leave-one-out nearest-centroid accuracy:")
+        accuracy = {k: loo_nearest_centroid(v, labels) for k, v in feats.items()}
+        for name, acc in accuracy.items():
+            print(f"  {name:<9} {acc:.3f}")
+        print(f"  delta (engine - intended): {accuracy['engine'] - accuracy['intended']:+.3f}")
+
+
+if __name__ == '__main__':
+    main()
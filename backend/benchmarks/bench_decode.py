@@ -0,0 +1,110 @@
+"""Compare per-request decode latency and syscalls: temp-file vs in-memory.
+
+Usage (from backend/):
+    python benchmarks/bench_decode.py [--repeat 50] [--duration 5]
+
+The "legacy" path reproduces the original read_audio_bytes behaviour
+(NamedTemporaryFile + librosa.load + unlink). The "current" path is
+app.utils.read_audio_bytes. Syscall counts come from /proc/self/io
+(read/write syscalls) plus Python audit events for file opens and
+unlinks, so they are only reported on Linux.
+"""
+import argparse
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import librosa
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.config import settings
+from app.utils import read_audio_bytes, sniff_container
+
+
+_AUDIT_COUNTS = {'open': 0, 'unlink': 0}
+
+
+def _audit_hook(event, args):
+    if event == 'open':
+        _AUDIT_COUNTS['open'] += 1
+    elif event in ('os.remove', 'os.unlink'):
+        _AUDIT_COUNTS['unlink'] += 1
+
+
+def _proc_io():
+    try:
+        with open('/proc/self/io', 'r') as f:
+            stats = dict(line.split(':', 1) for line in f.read().splitlines())
+        return int(stats['syscr']), int(stats['syscw'])
+    except Exception:
+        return None
+
+
+def legacy_read_audio_bytes(data: bytes, sr: int = None):
+    """The original temp-file based implementation, kept for comparison."""
+    sr = sr or settings.SAMPLE_RATE
+    with tempfile.NamedTemporaryFile(suffix='.webm', delete=False) as tmp:
+        tmp.write(data)
+        tmp_path = tmp.name
+    try:
+        y, file_sr = librosa.load(tmp_path, sr=None)
+        if file_sr != sr:
+            y = librosa.resample(y, orig_sr=file_sr, target_sr=sr)
+        return y, sr
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+def make_clip(fmt: str, duration: float, sr: int) -> bytes:
+    t = np.arange(int(duration * sr)) / sr
+    y = 0.3 * np.sin(2 * np.pi * 220.0 * t) + 0.01 * np.random.default_rng(0).standard_normal(t.size)
+    buf = io.BytesIO()
+    sf.write(buf, y.astype(np.float32), sr, format=fmt)
+    return buf.getvalue()
+
+
+def measure(fn, data: bytes, repeat: int):
+    fn(data)  # warm up codecs / resampler
+    _AUDIT_COUNTS.update(open=0, unlink=0)
+    io_before = _proc_io()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(data)
+    elapsed = time.perf_counter() - start
+    io_after = _proc_io()
+
+    result = {
+        'ms_per_call': 1000.0 * elapsed / repeat,
+        'opens_per_call': _AUDIT_COUNTS['open'] / repeat,
+        'unlinks_per_call': _AUDIT_COUNTS['unlink'] / repeat,
+    }
+    if io_before and io_after:
+        result['read_syscalls_per_call'] = (io_after[0] - io_before[0]) / repeat
+        result['write_syscalls_per_call'] = (io_after[1] - io_before[1]) / repeat
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--sr', type=int, default=48000)
+    args = parser.parse_args()
+
+    sys.addaudithook(_audit_hook)
+
+    for fmt in ('WAV', 'FLAC', 'OGG'):
+        data = make_clip(fmt, args.duration, args.sr)
+        print(f'{fmt} ({sniff_container(data)}), {len(data)} bytes, {args.duration}s @ {args.sr} Hz')
+        for name, fn in (('legacy', legacy_read_audio_bytes), ('current', read_audio_bytes)):
+            res = measure(fn, data, args.repeat)
+            cols = '  '.join(f'{k}={v:.2f}' for k, v in res.items())
+            print(f'  {name:8s} {cols}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Epoch read time: one `.pt` file per clip vs the memory-mapped feature store.
+
+Usage (from backend/):
+    python benchmarks/bench_feature_store.py [--clips 2000] [--frames 300] [--dtypes float32 float16]
+    python benchmarks/bench_feature_store.py --workers 4 --dir /data/scratch
+
+Writes --clips random (frames, 768) sequences the way the notebooks do
+(`torch.save` per clip), converts them into a store, then times one full
+pass of a DataLoader (batch 32, notebook-style collate) over each. `cold`
+drops the files from the page cache first (posix_fadvise DONTNEED), which
+is what the first epoch of a large corpus sees; `warm` is a second pass.
+"""
+import argparse
+import functools
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.feature_store import FeatureStoreDataset, build_store, collate
+
+STATES = ['andhra', 'gujrat', 'jharkhand', 'karnataka', 'kerala', 'tamil']
+
+
+class PtDataset(Dataset):
+    """The notebooks' SeqDataset: torch.load per item."""
+
+    def __init__(self, files, max_len):
+        self.files = files
+        self.max_len = max_len
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, idx):
+        path = self.files[idx]
+        label = next(i for i, s in enumerate(STATES) if s in path.name)
+        return torch.load(path)[:self.max_len], torch.tensor(label)
+
+
+def drop_cache(root: Path):
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            fd = os.open(os.path.join(dirpath, name), os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def epoch_seconds(dataset, workers, max_len):
+    loader = DataLoader(dataset, batch_size=32, shuffle=True, num_workers=workers,
+                        collate_fn=functools.partial(collate, max_len=max_len))
+    start = time.perf_counter()
+    for _ in loader:
+        pass
+    return time.perf_counter() - start
+
+
+def du_mb(root: Path) -> float:
+    return sum(p.stat().st_size for p in root.rglob('*') if p.is_file()) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clips', type=int, default=2000)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--dtypes', nargs='+', default=['float32', 'float16'])
+    parser.add_argument('--workers', type=int, default=0, help='DataLoader workers')
+    parser.add_argument('--dir', help='scratch directory (default: system temp)')
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(dir=args.dir))
+    try:
+        src = scratch / 'pt'
+        src.mkdir()
+        rng = np.random.default_rng(0)
+        files = []
+        for i in range(args.clips):
+            path = src / f"{STATES[i % len(STATES)]}_{i:05d}.pt"
+            frames = int(rng.integers(args.frames // 2, args.frames + 1))
+            torch.save(torch.from_numpy(rng.standard_normal((frames, args.dim)).astype(np.float32)), path)
+            files.append(path)
+
+        datasets = [('per-file .pt', src, PtDataset(files, args.frames))]
+        for dtype in args.dtypes:
+            store = scratch / dtype
+            build_store(src, store, convert=True, workers=os.cpu_count(), dtype=dtype, max_frames=args.frames)
+            datasets.append((f'store {dtype}', store, FeatureStoreDataset(store, max_len=args.frames)))
+
+        print(f"{args.clips} clips, DataLoader workers {args.workers}")
+        print(f"{'layout':<16} {'MB':>8} {'cold s':>8} {'warm s':>8} {'clips/s warm':>13}")
+        for name, root, dataset in datasets:
+            drop_cache(root)
+            cold = epoch_seconds(dataset, args.workers, args.frames)
+            warm = epoch_seconds(dataset, args.workers, args.frames)
+            print(f"{name:<16} {du_mb(root):>8.0f} {cold:>8.2f} {warm:>8.2f} {args.clips / warm:>13.0f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
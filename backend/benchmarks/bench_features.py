@@ -0,0 +1,60 @@
+"""Time per-window MFCC (original) vs the single-pass feature engine.
+
+Usage (from backend/):
+    python benchmarks/bench_features.py [--durations 10 60 180]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import librosa
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.utils import preprocess_audio, rolling_windows
+
+
+def per_window_rolling(y, sr, win, hop, n_mfcc=13):
+    return np.stack([np.mean(librosa.feature.mfcc(y=y[s:s + win], sr=sr, n_mfcc=n_mfcc), axis=1)
+                     for s in range(0, max(1, len(y) - win + 1), hop)])
+
+
+def per_window_means(windows, sr, n_mfcc=13):
+    return [np.mean(librosa.feature.mfcc(y=w, sr=sr, n_mfcc=n_mfcc), axis=1) for w in windows]
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return 1000.0 * (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 60, 180])
+    parser.add_argument('--sr', type=int, default=16000)
+    args = parser.parse_args()
+    sr = args.sr
+    rng = np.random.default_rng(0)
+
+    # Warm up numba/FFT plans so the first row is not penalised
+    warm = rng.standard_normal(sr).astype(np.float32)
+    rolling_windows(warm, sr)
+    per_window_rolling(warm, sr, sr, sr // 2)
+
+    print(f'{"duration_s":>10} {"rolling_old_ms":>15} {"rolling_new_ms":>15} {"windows_old_ms":>15} {"preprocess_new_ms":>18}')
+    for dur in args.durations:
+        y = (0.1 * rng.standard_normal(int(dur * sr))).astype(np.float32)
+        windows = preprocess_audio(y, sr, fast=True)['windows']
+        row = (
+            timed(per_window_rolling, y, sr, sr, sr // 2),
+            timed(rolling_windows, y, sr, 1.0, 0.5),
+            timed(per_window_means, windows, sr),
+            timed(preprocess_audio, y, sr, fast=True),
+        )
+        print(f'{dur:>10.0f} ' + ' '.join(f'{v:>15.1f}' for v in row[:3]) + f' {row[3]:>18.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Requests/s and bytes on the wire for /recommend-cuisine/.
+
+Usage (from backend/):
+    python benchmarks/bench_http_cache.py [--requests 2000] [--state kerala]
+
+Compares the original handler (JSONResponse rebuilt on every call) with the
+pre-serialized response, for identity, gzip and brotli encodings and for
+conditional revalidation (If-None-Match -> 304). Requests go through the
+ASGI app in-process, so the numbers are server-side cost without network.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.main import app
+from app.routes import STATE_CUISINES
+
+legacy = FastAPI()
+
+
+@legacy.get("/recommend-cuisine/")
+async def legacy_recommend_cuisine(state: str = None):
+    if state and state in STATE_CUISINES:
+        cuisines = STATE_CUISINES[state]
+        return JSONResponse({"state": state, "cuisines": cuisines, "count": len(cuisines)})
+    return JSONResponse({"all_cuisines": STATE_CUISINES, "total_states": len(STATE_CUISINES)})
+
+
+def wire_bytes(response: httpx.Response, raw: bytes) -> int:
+    status_line = len(f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n")
+    headers = sum(len(k) + len(v) + 4 for k, v in response.headers.raw)
+    return status_line + headers + 2 + len(raw)
+
+
+async def run(target, n, params, headers):
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def once():
+            async with client.stream('GET', '/recommend-cuisine/', params=params, headers=headers) as r:
+                raw = b''.join([chunk async for chunk in r.aiter_raw()])
+                return r, raw
+        response, raw = await once()
+        started = time.perf_counter()
+        for _ in range(n):
+            await once()
+        elapsed = time.perf_counter() - started
+    return n / elapsed, response.status_code, wire_bytes(response, raw), len(raw)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--state', help='benchmark ?state=... instead of the full catalogue')
+    args = parser.parse_args()
+    params = {'state': args.state} if args.state else {}
+
+    async def etag_of(encoding):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            r = await client.get('/recommend-cuisine/', params=params, headers={'Accept-Encoding': encoding})
+            return r.headers['etag']
+
+    scenarios = [
+        ('original', legacy, {'Accept-Encoding': 'identity'}),
+        ('prepared identity', app, {'Accept-Encoding': 'identity'}),
+        ('prepared gzip', app, {'Accept-Encoding': 'gzip'}),
+        ('prepared br', app, {'Accept-Encoding': 'br, gzip'}),
+        ('revalidate 304', app, {'Accept-Encoding': 'br, gzip',
+                                 'If-None-Match': asyncio.run(etag_of('br, gzip'))}),
+    ]
+    print(f"{'scenario':<20} {'status':>6} {'req/s':>9} {'body B':>8} {'wire B':>8}")
+    for name, target, headers in scenarios:
+        rps, status, wire, body = asyncio.run(run(target, args.requests, params, headers))
+        print(f"{name:<20} {status:>6} {rps:>9.0f} {body:>8} {wire:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Throughput of the HuBERT sequence feature stage.
+
+Usage (from backend/):
+    python benchmarks/bench_hubert.py [--durations 5 10 30] [--layers 12 9 6] [--threads 4]
+    python benchmarks/bench_hubert.py --model-dir ml/hubert-base-ls960
+
+Without --model-dir a randomly initialised HuBERT-base config is used (same
+shapes and FLOPs as the real weights). For every clip length it compares:
+  - per window:   one forward pass per 1 s window, all windows, every layer
+  - one batch:    all windows as one padded batch with attention masks
+  - stage:        HubertFeatureExtractor as served (only the windows that fill
+                  300 frames, encoder truncated after --layers)
+Throughput is seconds of audio featurized per wall-clock second.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.hubert import HUBERT_SAMPLE_RATE, HubertFeatureExtractor
+from app.utils import prepare_model_windows_from_audio
+from audio_samples import speech_like
+
+
+def best_ms(fn, repeat):
+    fn()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return 1000.0 * best
+
+
+def build(args, layer):
+    if args.model_dir:
+        return HubertFeatureExtractor(model_dir=args.model_dir, layer=layer, device='cpu')
+    return HubertFeatureExtractor.from_config(layer=layer, device='cpu')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[5, 10, 30])
+    parser.add_argument('--layers', type=int, nargs='+', default=[12, 9, 6])
+    parser.add_argument('--model-dir', help='local save_pretrained directory instead of a random config')
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    torch.set_num_threads(args.threads)
+    sr = HUBERT_SAMPLE_RATE
+
+    full = build(args, layer=0)
+    stages = {layer: build(args, layer) for layer in args.layers}
+    print(f"{args.threads} threads, {full.layer} layers, hidden {full.hidden_size}")
+    print(f"{'audio s':>7} {'windows':>7} {'path':<16} {'ms':>8} {'audio s/s':>10}")
+    for duration in args.durations:
+        y = speech_like(duration, sr)
+        windows, lengths = prepare_model_windows_from_audio(y, sr, pre_emphasis=False, return_lengths=True)
+
+        def per_window():
+            for w, n in zip(windows, lengths):
+                if n:
+                    full.embed_windows([w[:n]])
+
+        rows = [('per window', best_ms(per_window, args.repeat)),
+                ('one batch', best_ms(lambda: full.embed_windows(windows, lengths), args.repeat))]
+        for layer, stage in stages.items():
+            rows.append((f'stage layer {layer}', best_ms(lambda: stage(y, sr), args.repeat)))
+        for name, ms in rows:
+            print(f"{duration:>7.0f} {len(windows):>7} {name:<16} {ms:>8.0f} {duration / (ms / 1000):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Latency of the eager, TorchScript and ONNX Runtime backends per batch size.
+
+Usage (from backend/):
+    python benchmarks/bench_inference.py [--model ../ml/saved_models/cnn_bn_final.pt]
+        [--batch-sizes 1 8 32] [--repeats 30] [--threads N]
+
+Without --model (or if the file is missing) a randomly initialised CNN1D_BN
+is used; latency does not depend on the weights.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import inference
+from app.models import CNN1D_BN, INPUT_SHAPE, load_module
+
+
+def percentile_ms(fn, x, repeats):
+    fn(x)  # warmup
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(x)
+        times.append(1000.0 * (time.perf_counter() - start))
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', type=Path)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    args = parser.parse_args()
+    torch.set_num_threads(args.threads)
+
+    if args.model and args.model.exists():
+        module = load_module(str(args.model), 'cpu')
+    else:
+        torch.manual_seed(0)
+        module = CNN1D_BN(num_classes=6).eval()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            'eager': inference.EagerBackend(module),
+            'torchscript': inference.TorchScriptBackend.from_module(module),
+        }
+        try:
+            onnx_path = Path(tmp) / 'model.onnx'
+            inference.export_onnx(module, onnx_path)
+            backends['onnx'] = inference.OnnxBackend(onnx_path, num_threads=args.threads)
+        except ImportError:
+            print("onnxruntime not installed, skipping the onnx backend")
+
+        print(f"threads={args.threads} input={INPUT_SHAPE}")
+        print(f"{'backend':<12} {'batch':>5} {'p50 ms':>9} {'p95 ms':>9} {'ms/item':>9} {'max |diff|':>11}")
+        rng = np.random.default_rng(0)
+        for n in args.batch_sizes:
+            x = rng.normal(size=(n,) + INPUT_SHAPE).astype(np.float32)
+            expected = backends['eager'].run(x)
+            for name, backend in backends.items():
+                p50, p95 = percentile_ms(backend.run, x, args.repeats)
+                diff = float(np.max(np.abs(backend.run(x) - expected)))
+                print(f"{name:<12} {n:>5} {p50:>9.2f} {p95:>9.2f} {p50 / n:>9.2f} {diff:>11.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Model load time and per-worker memory: torch.load vs memory-mapped .weights artifacts.
+
+Usage (from backend/):
+    python benchmarks/bench_model_load.py [--workers 4] [--arch cnn transformer] [--model path/to/model.pt]
+
+For every architecture (randomly initialised, or --model) the same weights
+are saved three ways and loaded by --workers spawned processes at once, the
+way uvicorn workers start:
+  - pickle:      torch.save(module), unpickled by torch.load
+  - state_dict:  torch.save(state_dict), rebuilt by app.models.load_module
+  - weights:     app.weights artifact, mmap'ed and assigned to a meta-device module
+Each worker imports torch first, then times load_module + one forward pass,
+and reads /proc/self/smaps_rollup while every worker is still alive:
+  - rss:      resident growth (counts shared file pages in full, per worker)
+  - pss:      proportional share (shared pages divided among the workers)
+  - private:  pages only this worker holds, i.e. what another replica costs
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+ARCHS = {
+    'cnn': ('CNN1D_BN', {}),
+    'bilstm': ('BiLSTM', {'hidden_size': 512, 'num_layers': 2}),
+    'transformer': ('TransformerModel', {'num_layers': 6, 'dim_feedforward': 2048}),
+}
+FORMATS = ('pickle', 'state_dict', 'weights')
+
+
+def memory_mb() -> dict:
+    """Rss, Pss and private (clean + dirty) of this process in MB."""
+    out = {}
+    with open('/proc/self/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                out[parts[0].rstrip(':')] = int(parts[1]) / 1024.0
+    return {'rss': out.get('Rss', 0.0), 'pss': out.get('Pss', 0.0),
+            'private': out.get('Private_Clean', 0.0) + out.get('Private_Dirty', 0.0)}
+
+
+def worker(path: str, barrier, results):
+    import torch
+    torch.set_num_threads(1)
+    from app.inference import EagerBackend, example_input
+    from app.models import load_module
+    x = example_input(batch_size=1).numpy()
+    before = memory_mb()
+    started = time.perf_counter()
+    module = load_module(path)
+    loaded = time.perf_counter() - started
+    EagerBackend(module).run(x)
+    barrier.wait()
+    after = memory_mb()
+    results.put({'load_ms': 1000.0 * loaded, **{k: after[k] - before[k] for k in after}})
+    barrier.wait()  # keep every mapping alive until all workers have measured
+
+
+def measure(path: Path, workers: int) -> dict:
+    ctx = multiprocessing.get_context('spawn')
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(str(path), barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return {k: float(np.median([r[k] for r in rows])) for k in rows[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--arch', nargs='+', choices=sorted(ARCHS), default=sorted(ARCHS))
+    parser.add_argument('--model', type=Path, help='a saved model instead of random weights')
+    args = parser.parse_args(argv)
+
+    import torch
+    from app import weights
+    from app.models import build, load_module
+
+    modules = {}
+    if args.model:
+        modules[args.model.stem] = load_module(str(args.model))
+    else:
+        torch.manual_seed(0)
+        for key in args.arch:
+            name, config = ARCHS[key]
+            modules[key] = build(name, config, device='cpu').eval()
+
+    print(f"{args.workers} workers, medians per worker; memory in MB")
+    print(f"{'model':<12} {'format':<11} {'file MB':>8} {'load ms':>8} {'rss':>7} {'pss':>7} {'private':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for key, module in modules.items():
+            paths = {'pickle': Path(tmp) / f'{key}.pickle.pt', 'state_dict': Path(tmp) / f'{key}.pt',
+                     'weights': Path(tmp) / f'{key}{weights.SUFFIX}'}
+            torch.save(module, paths['pickle'])
+            torch.save(module.state_dict(), paths['state_dict'])
+            weights.save(module, paths['weights'])
+            for fmt in FORMATS:
+                r = measure(paths[fmt], args.workers)
+                print(f"{key:<12} {fmt:<11} {paths[fmt].stat().st_size / 2 ** 20:>8.1f} {r['load_ms']:>8.1f} "
+                      f"{r['rss']:>7.1f} {r['pss']:>7.1f} {r['private']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
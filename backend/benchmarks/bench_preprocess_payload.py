@@ -0,0 +1,96 @@
+"""Serialization time and payload size of the /preprocess/ representations.
+
+Usage (from backend/):
+    python benchmarks/bench_preprocess_payload.py [--durations 5 30 120] [--repeats 50]
+
+For a synthetic clip of each duration the preprocessing summary is computed
+once, then every body is built --repeats times (median ms) from it:
+  - legacy_json:  the original handler (struct.pack preview, base64, JSON)
+  - json:         app.payloads.preprocess_json (vectorized preview)
+  - arrays:       application/vnd.auraldine.arrays
+  - npz:          application/x-npz
+  - arrays/-preview, arrays/-windows, json/-preview: with ?preview=0 / ?windows=0
+Sizes are the identity body and its gzip encoding (what json_response
+sends to a client that accepts gzip).
+"""
+import argparse
+import base64
+import gzip
+import io
+import statistics
+import struct
+import sys
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app import payloads, pipeline
+from app.config import settings
+from app.http_cache import dumps
+
+
+def legacy_json(summary: dict) -> bytes:
+    """The /preprocess/ body as the handler built it before app.payloads."""
+    preview_b64 = None
+    if summary['num_windows'] > 0:
+        first_w = summary['first_window']
+        scaled = (first_w * 32767).astype('int16')
+        buf = io.BytesIO()
+        with wave.open(buf, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(int(summary['sr']))
+            wf.writeframes(struct.pack('<' + 'h' * len(scaled), *scaled))
+        buf.seek(0)
+        preview_b64 = base64.b64encode(buf.read()).decode('ascii')
+    return dumps({
+        'sr': summary['sr'],
+        'original_samples': summary['original_samples'],
+        'num_segments': summary['num_segments'],
+        'num_windows': summary['num_windows'],
+        'mfcc_means': summary['mfcc_means'],
+        'vad': summary.get('vad'),
+        'preview_wav_b64': preview_b64,
+    })
+
+
+ENCODERS = {
+    'legacy_json': legacy_json,
+    'json': lambda s: dumps(payloads.preprocess_json(s)),
+    'arrays': lambda s: payloads.pack(*payloads.preprocess_arrays(s)),
+    'npz': lambda s: payloads.npz(*payloads.preprocess_arrays(s)),
+    'json/-preview': lambda s: dumps(payloads.preprocess_json(s, preview=False)),
+    'arrays/-preview': lambda s: payloads.pack(*payloads.preprocess_arrays(s, preview=False)),
+    'arrays/-windows': lambda s: payloads.pack(*payloads.preprocess_arrays(s, windows=False)),
+}
+
+
+def time_ms(fn, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(1000.0 * (time.perf_counter() - started))
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[5.0, 30.0, 120.0])
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args(argv)
+    settings.CACHE_ENABLED = False
+
+    print(f"{'clip':>6} {'format':<16} {'ms':>8} {'bytes':>9} {'gzip':>9}")
+    for seconds in args.durations:
+        summary = pipeline.preprocess_upload(payloads.synthetic_wav(seconds, sr=16000), fast=True)
+        summary.pop('timings', None)
+        for name, encode in ENCODERS.items():
+            body = encode(summary)
+            ms = time_ms(lambda: encode(summary), args.repeats)
+            print(f"{seconds:>5g}s {name:<16} {ms:>8.3f} {len(body):>9} {len(gzip.compress(body, 6)):>9}")
+
+
+if __name__ == '__main__':
+    main()
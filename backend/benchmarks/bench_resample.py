@@ -0,0 +1,103 @@
+"""Latency and spectral quality of the resampling tiers for browser sample rates.
+
+Usage (from backend/):
+    python benchmarks/bench_resample.py [--duration 10] [--rates 48000 44100] [--repeat 20]
+
+For every source rate and RESAMPLE_QUALITY tier (plus the original
+`librosa.resample` call) the table shows:
+  - ms:       resampling time for one clip of --duration seconds
+  - passband: worst PSD deviation from the hq tier below 0.6 / 0.9 x Nyquist (dB)
+  - -3 dB:    frequency where the tier's response has dropped 3 dB below hq
+  - alias:    level of an 11 kHz tone after resampling (it must not fold back)
+  - drift:    relative L2 distance of the pooled MFCC features from hq
+If ffmpeg is installed, decoding a WebM/Opus upload straight to SAMPLE_RATE is
+compared with the temporary-file decode followed by resampling.
+"""
+import argparse
+import io
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import librosa
+import numpy as np
+import scipy.signal
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.config import settings
+from app.utils import (
+    RESAMPLE_QUALITIES, _decode_ffmpeg, _decode_via_tempfile, preprocess_audio, resample_audio,
+)
+from audio_samples import speech_like
+
+
+def best_ms(fn, repeat):
+    fn()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return 1000.0 * best
+
+
+def response_db(y, reference, sr):
+    f, p = scipy.signal.welch(y, sr, nperseg=2048)
+    _, p_ref = scipy.signal.welch(reference, sr, nperseg=2048)
+    return f, 10 * np.log10(p / p_ref)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--rates', type=int, nargs='+', default=[48000, 44100])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    target = settings.SAMPLE_RATE
+    nyquist = target / 2
+
+    print(f"{'source':>7} {'tier':<8} {'ms':>7} {'pass 0.6':>9} {'pass 0.9':>9} {'-3 dB Hz':>9} "
+          f"{'alias dB':>9} {'drift':>7}")
+    for rate in args.rates:
+        noise = (0.1 * np.random.default_rng(0).standard_normal(int(rate * args.duration))).astype(np.float32)
+        t = np.arange(rate * 2) / rate
+        tone = (0.5 * np.sin(2 * np.pi * 11000 * t)).astype(np.float32)
+        speech = speech_like(args.duration, rate)
+        reference = resample_audio(noise, rate, target, 'hq')
+        ref_features = np.mean(preprocess_audio(resample_audio(speech, rate, target, 'hq'), target,
+                                                fast=True)['mfcc_means'], axis=0)
+        tiers = [('librosa', lambda y: librosa.resample(y, orig_sr=rate, target_sr=target))]
+        tiers += [(q, lambda y, q=q: resample_audio(y, rate, target, q)) for q in RESAMPLE_QUALITIES]
+        for name, fn in tiers:
+            ms = best_ms(lambda: fn(noise), args.repeat)
+            f, db = response_db(fn(noise), reference, target)
+            below = np.nonzero(db < -3.0)[0]
+            edge = f[below[0]] if below.size else nyquist
+            aliased = fn(tone)[1000:-1000]
+            alias = 20 * np.log10(np.std(aliased) / np.std(tone) + 1e-12)
+            features = np.mean(preprocess_audio(fn(speech), target, fast=True)['mfcc_means'], axis=0)
+            drift = np.linalg.norm(features - ref_features) / np.linalg.norm(ref_features)
+            print(f"{rate:>7} {name:<8} {ms:>7.2f} {np.abs(db[f < 0.6 * nyquist]).max():>9.3f} "
+                  f"{np.abs(db[f < 0.9 * nyquist]).max():>9.3f} {edge:>9.0f} {alias:>9.1f} {drift:>7.4f}")
+
+    if shutil.which('ffmpeg') is None:
+        print("\nffmpeg not installed: skipping decode-at-target-rate comparison")
+        return
+    wav = io.BytesIO()
+    sf.write(wav, speech_like(args.duration, 48000), 48000, format='WAV')
+    webm = subprocess.run(['ffmpeg', '-v', 'error', '-i', 'pipe:0', '-c:a', 'libopus', '-f', 'webm', 'pipe:1'],
+                          input=wav.getvalue(), stdout=subprocess.PIPE, check=True).stdout
+    print(f"\nWebM/Opus {args.duration:.0f} s upload -> {target} Hz")
+    print(f"{'path':<28} {'ms':>8}")
+    legacy = best_ms(lambda: resample_audio(*_decode_via_tempfile(webm), target, 'hq'), max(3, args.repeat // 4))
+    print(f"{'tempfile decode + resample':<28} {legacy:>8.1f}")
+    for quality in RESAMPLE_QUALITIES:
+        ms = best_ms(lambda: _decode_ffmpeg(webm, target, quality), max(3, args.repeat // 4))
+        print(f"{'ffmpeg at target (' + quality + ')':<28} {ms:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
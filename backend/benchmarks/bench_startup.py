@@ -0,0 +1,91 @@
+"""Cold start to ready time and first-request latency of a fresh server process.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--runs 2] [--numba-cache-dir /tmp/numba-cache]
+
+Starts `uvicorn app.main:app` once with STARTUP_WARMUP=1 and once with
+STARTUP_WARMUP=0 per run, and reports for each:
+  - live:  process start -> /health/live answers
+  - ready: process start -> /health/ready returns 200
+  - first: latency of the first /predict/ request, then of the second
+With --numba-cache-dir the cache is shared between runs, so run 2 onwards
+shows a container restart with a persisted cache (run 1 compiles from scratch
+if the directory is empty).
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+from app.payloads import synthetic_wav
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(client, url, started, timeout=300.0, status=200):
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(url).status_code == status:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def measure(warmup: bool, numba_cache_dir: str = None) -> dict:
+    port = free_port()
+    env = dict(os.environ, STARTUP_WARMUP=str(int(warmup)), PYTHONUNBUFFERED='1')
+    if numba_cache_dir:
+        env['NUMBA_CACHE_DIR'] = numba_cache_dir
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f'http://127.0.0.1:{port}'
+    # Two different clips (and different from the warmup clip) so neither is a cache hit
+    clips = [synthetic_wav(seconds=5.0, sr=22050), synthetic_wav(seconds=5.0, sr=24000)]
+    try:
+        with httpx.Client(timeout=300.0) as client:
+            live = wait_for(client, base + '/health/live', started)
+            ready = wait_for(client, base + '/health/ready', started)
+            latencies = []
+            for i, clip in enumerate(clips):
+                t = time.perf_counter()
+                response = client.post(base + '/predict/', files={'file': (f'clip{i}.wav', clip, 'audio/wav')})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - t)
+        return {'live': live, 'ready': ready, 'first': latencies[0], 'second': latencies[1]}
+    finally:
+        proc.terminate()
+        proc.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=2)
+    parser.add_argument('--numba-cache-dir')
+    args = parser.parse_args()
+
+    print(f"{'run':>3} {'warmup':>6} {'live s':>7} {'ready s':>8} {'first ms':>9} {'second ms':>10}")
+    for run in range(1, args.runs + 1):
+        for warmup in (True, False):
+            r = measure(warmup, args.numba_cache_dir)
+            print(f"{run:>3} {'on' if warmup else 'off':>6} {r['live']:>7.2f} {r['ready']:>8.2f} "
+                  f"{1000 * r['first']:>9.0f} {1000 * r['second']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
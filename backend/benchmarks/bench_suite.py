@@ -0,0 +1,188 @@
+"""Pipeline and API benchmark suite, checked against a JSON baseline.
+
+Usage (from backend/):
+    python benchmarks/bench_suite.py --update                # record benchmarks/baseline.json
+    python benchmarks/bench_suite.py                         # compare; exit 1 on a regression
+    python benchmarks/bench_suite.py --quick --only predict_api --tolerance 0.5
+    python benchmarks/bench_suite.py --durations 1 10 120 --sample-rates 16000 48000 --json run.json
+
+Synthetic speech-like clips (voiced bursts with a drifting pitch over a
+noise floor) at every --durations x --sample-rates, timed per stage:
+  - read_audio_bytes:       WAV decode + resample to SAMPLE_RATE
+  - preprocess_fast/full:   preprocess_audio(fast=True / fast=False) on decoded audio
+  - extract_mfcc:           whole-clip MFCC
+  - predict_from_features:  one pooled feature vector through the ModelService
+  - predict_api:            POST /predict/ through the ASGI app (TestClient)
+Caches are disabled and every stage is warmed up once before timing. Each
+stage repeats until it has run --min-seconds (at least 3 times, at most
+--max-repeats) and records the median and minimum in ms.
+
+A stage regresses when its median exceeds the baseline median by more than
+--tolerance (relative) and --slack-ms (absolute, so sub-millisecond stages
+don't trip on timer noise). Baselines are machine-specific: the file keeps
+the host it was recorded on, and a mismatch is printed as a warning.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.config import settings
+from audio_samples import speech_like
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+STAGES = ('read_audio_bytes', 'preprocess_fast', 'preprocess_full', 'extract_mfcc',
+          'predict_from_features', 'predict_api')
+
+
+def wav(y, sr):
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+
+def measure(fn, min_seconds, max_repeats):
+    """Median and min wall time of fn() in ms, after one warmup call."""
+    fn()
+    times = []
+    spent = 0.0
+    while len(times) < 3 or (spent < min_seconds and len(times) < max_repeats):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+    return {'median_ms': round(1000.0 * float(np.median(times)), 3),
+            'min_ms': round(1000.0 * float(np.min(times)), 3),
+            'repeats': len(times)}
+
+
+def host_info() -> dict:
+    import librosa
+    return {
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+    }
+
+
+def run(args) -> dict:
+    from fastapi.testclient import TestClient
+    from app import logs, pipeline
+    from app.main import app
+    from app.utils import extract_mfcc, preprocess_audio, read_audio_bytes
+
+    settings.CACHE_ENABLED = False
+    # Per-request INFO lines would interleave with the table on stdout
+    logs.configure(level='WARNING', force=True)
+    target_sr = settings.SAMPLE_RATE
+    results = {}
+
+    def record(stage, key, fn):
+        if args.only and stage not in args.only:
+            return
+        results[f'{stage}/{key}'] = stats = measure(fn, args.min_seconds, args.max_repeats)
+        print(f"{stage:<22} {key:<14} {stats['median_ms']:>10.2f} {stats['min_ms']:>10.2f} {stats['repeats']:>5}")
+
+    print(f"{'stage':<22} {'clip':<14} {'median ms':>10} {'min ms':>10} {'runs':>5}")
+    with TestClient(app) as client:
+        service = pipeline.get_model_service()
+        for duration in args.durations:
+            decoded = None
+            for sr in args.sample_rates:
+                data = wav(speech_like(duration, sr, vary=True), sr)
+                key = f'{duration:g}s@{sr}'
+                record('read_audio_bytes', key, lambda: read_audio_bytes(data, sr=target_sr))
+                record('predict_api', key, lambda: client.post(
+                    '/predict/', files={'file': ('clip.wav', data, 'audio/wav')}).raise_for_status())
+                if decoded is None or sr == target_sr:
+                    decoded = read_audio_bytes(data, sr=target_sr)[0]
+
+            # The remaining stages take decoded SAMPLE_RATE audio, so they run once per duration
+            key = f'{duration:g}s@{target_sr}'
+            record('preprocess_fast', key, lambda: preprocess_audio(decoded, target_sr, fast=True))
+            record('preprocess_full', key, lambda: preprocess_audio(decoded, target_sr, fast=False))
+            record('extract_mfcc', key, lambda: extract_mfcc(decoded, sr=target_sr))
+            features = pipeline.featurize_upload(wav(decoded, target_sr))['features']
+            record('predict_from_features', key, lambda: service.predict_from_features(features))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, slack_ms: float):
+    """Rows of (name, baseline ms, current ms, ratio, regressed) for names in both runs."""
+    rows = []
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        base_ms, cur_ms = before['median_ms'], current['median_ms']
+        regressed = cur_ms > base_ms * (1 + tolerance) and cur_ms - base_ms > slack_ms
+        rows.append((name, base_ms, cur_ms, cur_ms / base_ms if base_ms else float('inf'), regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--durations', type=float, nargs='+', default=[1, 5, 30, 120])
+    parser.add_argument('--sample-rates', type=int, nargs='+', default=[16000, 44100, 48000])
+    parser.add_argument('--only', nargs='+', choices=STAGES, help='run only these stages')
+    parser.add_argument('--quick', action='store_true', help='1 s and 5 s clips at 16 kHz and 44.1 kHz only')
+    parser.add_argument('--min-seconds', type=float, default=1.0, help='time budget per stage and clip')
+    parser.add_argument('--max-repeats', type=int, default=50)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--update', action='store_true', help='write this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--slack-ms', type=float, default=2.0, help='allowed absolute slowdown')
+    parser.add_argument('--json', type=Path, help='also write this run here')
+    args = parser.parse_args()
+    if args.quick:
+        args.durations, args.sample_rates = [1, 5], [16000, 44100]
+
+    report = {'host': host_info(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'config': {'sample_rate': settings.SAMPLE_RATE, 'resample_quality': settings.RESAMPLE_QUALITY,
+                         'inference_backend': settings.INFERENCE_BACKEND},
+              'results': run(args)}
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    if args.update or not args.baseline.exists():
+        if args.update and args.only and args.baseline.exists():
+            # A partial run refreshes its own stages and keeps the rest of the baseline
+            previous = json.loads(args.baseline.read_text())
+            report['results'] = {**previous.get('results', {}), **report['results']}
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get('host') != report['host']:
+        print(f"\nWARNING: baseline was recorded on {baseline.get('host')}, this is {report['host']}")
+    rows = compare(report['results'], baseline, args.tolerance, args.slack_ms)
+    print(f"\n{'stage/clip':<40} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for name, base_ms, cur_ms, ratio, regressed in rows:
+        print(f"{name:<40} {base_ms:>10.2f} {cur_ms:>10.2f} {ratio:>7.2f}" + ('  REGRESSED' if regressed else ''))
+    missing = sorted(set(report['results']) - {r[0] for r in rows})
+    if missing:
+        print(f"No baseline for: {', '.join(missing)} (re-run with --update to add them)")
+    regressions = [r[0] for r in rows if r[4]]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond +{args.tolerance:.0%} and +{args.slack_ms:g} ms: "
+              f"{', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions in {len(rows)} comparisons")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
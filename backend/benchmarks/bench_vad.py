@@ -0,0 +1,85 @@
+"""Audio and compute removed by voice activity detection, per VAD mode.
+
+Usage (from backend/):
+    python benchmarks/bench_vad.py [--duration 30] [--pause-ratios 0 0.25 0.5]
+    python benchmarks/bench_vad.py --data /data/clips [--full]
+
+Synthetic clips alternate speech bursts with pauses so that `pause ratio` of
+the audio is near-silent. For every VAD mode the table shows the VAD pass
+itself, the whole preprocess_audio call, the audio and windows removed, and
+the relative L2 distance of the pooled feature vector from VAD off.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.utils import VAD_MODES, preprocess_audio, read_audio_bytes, speech_frames
+from audio_samples import speech_like
+
+
+def with_pauses(duration, pause_ratio, sr, seed=0):
+    rng = np.random.default_rng(seed)
+    parts, total, i = [], 0.0, 0
+    while total < duration:
+        speech = float(rng.uniform(1.0, 3.0))
+        parts.append(speech_like(speech, sr, seed + i))
+        total += speech
+        if pause_ratio > 0:
+            pause = speech * pause_ratio / (1 - pause_ratio)
+            parts.append(0.001 * rng.standard_normal(int(pause * sr)).astype(np.float32))
+            total += pause
+        i += 1
+    parts.append(speech_like(1.0, sr, seed + i))  # speech at both ends, so trimming does not hide the pauses
+    return np.concatenate(parts)[:int(duration * sr)]
+
+
+def timed(fn, *args, repeats=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return out, 1000.0 * best
+
+
+def report(name, y, sr, fast):
+    _, vad_ms = timed(speech_frames, y, sr)
+    baseline = None
+    for mode in VAD_MODES:
+        summary, ms = timed(preprocess_audio, y, sr, fast=fast, vad=mode)
+        features = np.mean(summary['mfcc_means'], axis=0)
+        baseline = features if baseline is None else baseline
+        drift = float(np.linalg.norm(features - baseline) / np.linalg.norm(baseline))
+        vad = summary['vad']
+        print(f"{name:<14} {mode:<8} {vad_ms if mode != 'off' else 0:>7.1f} {ms:>8.1f} "
+              f"{vad['removed_seconds']:>7.2f}/{vad['input_seconds']:<6.2f} "
+              f"{vad['windows_removed']:>4}/{vad['windows_before']:<4} {drift:>7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--pause-ratios', type=float, nargs='+', default=[0.0, 0.25, 0.5])
+    parser.add_argument('--sr', type=int, default=16000)
+    parser.add_argument('--full', action='store_true', help='full (1.5 s segment) pipeline instead of fast')
+    parser.add_argument('--data', type=Path, help='folder of real recordings instead of synthetic clips')
+    args = parser.parse_args()
+    sr = args.sr
+
+    preprocess_audio(speech_like(2.0, sr), sr, fast=not args.full)  # JIT warmup
+    print(f"{'clip':<14} {'vad':<8} {'vad ms':>7} {'total ms':>8} {'removed s':>14} {'windows':>9} {'drift':>7}")
+    if args.data:
+        for path in sorted(p for p in args.data.rglob('*') if p.is_file()):
+            y, clip_sr = read_audio_bytes(path.read_bytes(), sr)
+            report(path.name[:14], y, clip_sr, not args.full)
+        return
+    for ratio in args.pause_ratios:
+        report(f"pauses {ratio:.0%}", with_pauses(args.duration, ratio, sr), sr, not args.full)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Anytime inference: early exit on a confident posterior and the audio budget."""
+import io
+
+import numpy as np
+import soundfile as sf
+from fastapi.testclient import TestClient
+
+from app import pipeline
+from app.anytime import anytime_predict
+from app.config import settings
+from app.main import app
+from app.model_service import STATE_MAPPING
+from app.utils import preprocess_audio, trim_bounds
+from audio_samples import speech_like
+
+SR = 16000
+
+
+class ScriptedService:
+    """Uniform, then confident (margin 0.64) from the `confident_from`-th pooled embedding it sees."""
+
+    def __init__(self, confident_from=None):
+        self.confident_from = confident_from
+        self.seen = []
+
+    def predict_proba(self, features):
+        probs = []
+        for row in features:
+            self.seen.append(np.array(row))
+            p = np.full(len(STATE_MAPPING), 1.0 / len(STATE_MAPPING))
+            if self.confident_from is not None and len(self.seen) >= self.confident_from:
+                p[:] = 0.3 / (len(STATE_MAPPING) - 1)
+                p[2] = 0.7
+            probs.append(p)
+        return np.array(probs)
+
+
+def test_stops_after_patience_confident_windows():
+    service = ScriptedService(confident_from=2)
+    result = anytime_predict(speech_like(30.0), SR, service, fast=True, margin=0.3, patience=3, chunk_windows=2)
+    assert result['stopped'] == 'confident'
+    assert result['windows_used'] == 4 and result['num_windows'] == 30
+    assert 3.5 <= result['seconds_used'] <= 4.5
+    assert result['state'] == STATE_MAPPING[2]
+    # Chunks of 2 then 4 windows: nothing after the second chunk is featurized
+    assert len(service.seen) == 6
+
+
+def test_unconfident_run_matches_full_clip_features():
+    y = speech_like(7.3)
+    for fast in (True, False):
+        result = anytime_predict(y, SR, ScriptedService(), fast=fast, patience=2, chunk_windows=3)
+        full = np.mean(preprocess_audio(y, SR, fast=fast)['mfcc_means'], axis=0)
+        assert result['stopped'] == 'complete'
+        assert result['windows_used'] == result['num_windows']
+        np.testing.assert_allclose(result['features'], full, rtol=1e-5, atol=1e-4)
+        # Everything up to the trimmed end of the clip was used
+        assert result['seconds_used'] == round(trim_bounds(y)[1] / SR, 3)
+
+
+def test_decode_budget(monkeypatch):
+    monkeypatch.setattr(settings, 'ANYTIME_MAX_SECONDS', 3.0)
+    monkeypatch.setattr(settings, 'ANYTIME_MARGIN', 1.0)  # never confident
+    buf = io.BytesIO()
+    sf.write(buf, speech_like(12.0), SR, format='WAV')
+    result = pipeline.anytime_upload(buf.getvalue(), fast=True)
+    assert result['stopped'] == 'budget'
+    assert result['seconds_decoded'] == 3.0 and result['audio_shape'] == (3 * SR,)
+
+
+def test_predict_reports_seconds_used(monkeypatch):
+    monkeypatch.setattr(settings, 'ANYTIME_INFERENCE', True)
+    monkeypatch.setattr(settings, 'ANYTIME_MAX_SECONDS', 4.0)
+    buf = io.BytesIO()
+    sf.write(buf, speech_like(10.0, seed=3), SR, format='WAV')
+    with TestClient(app) as client:
+        from app import routes
+        assert routes.startup_state.wait(60)
+        body = client.post('/predict/', files={'file': ('long.wav', buf.getvalue(), 'audio/wav')}).json()
+    assert 0 < body['seconds_used'] <= 4.0
+    assert isinstance(body['early_exit'], bool)
@@ -0,0 +1,54 @@
+"""Tests for the micro-batching inference scheduler."""
+import numpy as np
+
+from app.batching import MicroBatcher
+from app.model_service import ModelService, STATE_MAPPING
+
+
+def test_concurrent_submissions_share_a_batch():
+    calls = []
+
+    def predict_batch(x):
+        calls.append(x.shape[0])
+        return [(STATE_MAPPING[int(row[0])], float(row[1])) for row in x]
+
+    batcher = MicroBatcher(predict_batch, max_batch_size=8, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(np.array([i % len(STATE_MAPPING), i / 10.0])) for i in range(8)]
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.stop()
+
+    assert calls == [8]
+    for i, (state, conf) in enumerate(results):
+        assert state == STATE_MAPPING[i % len(STATE_MAPPING)]
+        assert abs(conf - i / 10.0) < 1e-6
+    stats = batcher.stats.snapshot()
+    assert stats['batch_size_counts'] == {'8': 1}
+    assert stats['requests'] == 8
+
+
+def test_max_wait_flushes_partial_batch():
+    batcher = MicroBatcher(lambda x: [('kerala', 1.0)] * len(x), max_batch_size=64, max_wait_ms=1)
+    try:
+        assert batcher.submit(np.zeros(13)).result(timeout=5) == ('kerala', 1.0)
+    finally:
+        batcher.stop()
+
+
+def test_batch_matches_single_predictions_without_model():
+    service = ModelService(model_path='/nonexistent/model.pt')
+    feats = np.random.default_rng(0).normal(scale=50, size=(5, 13))
+    assert service.predict_batch(feats) == [service.predict_from_features(f) for f in feats]
+
+
+def test_batch_matches_single_predictions_with_model():
+    import torch
+    torch.manual_seed(0)
+    service = ModelService(model_path='/nonexistent/model.pt')
+    service.model = torch.nn.Linear(13, len(STATE_MAPPING)).eval()
+    feats = np.random.default_rng(1).normal(size=(7, 13)).astype(np.float32)
+    batched = service.predict_batch(feats)
+    single = [service.predict_from_features(f) for f in feats]
+    assert [s for s, _ in batched] == [s for s, _ in single]
+    np.testing.assert_allclose([c for _, c in batched], [c for _, c in single], rtol=1e-5)
@@ -0,0 +1,61 @@
+"""The bulk scoring CLI: output rows, manifest resume and error rows."""
+import csv
+import json
+
+from app import bulk_score, pipeline
+from audio_samples import wav_bytes
+
+
+def make_clips(root):
+    (root / 'kerala').mkdir(parents=True)
+    for i, seconds in enumerate((1.0, 1.5)):
+        (root / 'kerala' / f'clip_{i}.wav').write_bytes(wav_bytes(seconds, freq=200.0 + 50 * i))
+    (root / 'tamil.wav').write_bytes(wav_bytes(2.0))
+    (root / 'broken.wav').write_bytes(b'RIFF not really a wav file')
+    (root / 'notes.txt').write_text('not audio')
+    return ['broken.wav', 'kerala/clip_0.wav', 'kerala/clip_1.wav', 'tamil.wav']
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_bulk_score_writes_rows_and_resumes(tmp_path, monkeypatch):
+    files = make_clips(tmp_path / 'audio')
+    out = tmp_path / 'scores.jsonl'
+    argv = [str(tmp_path / 'audio'), '--out', str(out), '--workers', '1']
+    assert bulk_score.main(argv) == 0
+
+    rows = {row['file']: row for row in read_jsonl(out)}
+    assert sorted(rows) == files
+    assert 'error' in rows['broken.wav'] and 'state' not in rows['broken.wav']
+    for name in files[1:]:
+        row = rows[name]
+        assert set(row) == set(bulk_score.RESULT_FIELDS) - {'error'}
+        assert 0.0 <= row['confidence'] <= 1.0 and row['num_windows'] >= 1
+    assert rows['tamil.wav']['audio_seconds'] == 2.0
+
+    # Everything is in the manifest, so a second run scores nothing
+    manifest = tmp_path / 'scores.jsonl.manifest'
+    assert sorted(entry['file'] for entry in read_jsonl(manifest)) == files
+    assert bulk_score.main(argv) == 0
+    assert len(read_jsonl(out)) == len(files)
+
+    # A new model version invalidates the manifest
+    monkeypatch.setattr(pipeline.get_model_service(), 'model_version', 'retrained')
+    assert bulk_score.main(argv) == 0
+    assert sorted(row['file'] for row in read_jsonl(out)) == sorted(files * 2)
+
+
+def test_bulk_score_csv(tmp_path):
+    files = make_clips(tmp_path / 'audio')
+    out = tmp_path / 'scores.csv'
+    assert bulk_score.main([str(tmp_path / 'audio'), '--out', str(out), '--workers', '1']) == 0
+    with open(out, newline='') as f:
+        reader = csv.DictReader(f)
+        rows = {row['file']: row for row in reader}
+    assert reader.fieldnames == bulk_score.RESULT_FIELDS
+    assert sorted(rows) == files
+    assert rows['broken.wav']['error'] and not rows['broken.wav']['state']
+    assert rows['tamil.wav']['state'] and not rows['tamil.wav']['error']
+    assert float(rows['kerala/clip_1.wav']['audio_seconds']) == 1.5
@@ -0,0 +1,67 @@
+"""Tests for the content-addressed pipeline cache."""
+import time
+
+import numpy as np
+
+from app import pipeline
+from app.cache import LRUCache
+from app.config import settings
+from audio_samples import wav_bytes
+
+
+def test_lru_evicts_oldest_when_over_budget():
+    cache = LRUCache('t', max_bytes=2500)
+    for i in range(3):
+        cache.put(i, np.zeros(100))  # 800 bytes each
+    cache.get(0)  # 0 becomes most recently used
+    cache.put(3, np.zeros(100))
+    assert cache.get(1) is None
+    assert cache.get(0) is not None and cache.get(3) is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_ttl_expiry():
+    cache = LRUCache('t', max_bytes=10_000, ttl_seconds=0.05)
+    cache.put('k', b'value')
+    assert cache.get('k') == b'value'
+    time.sleep(0.1)
+    assert cache.get('k') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_pipeline_tiers_hit_on_resubmission():
+    cache = pipeline.get_cache()
+    cache.clear()
+    service = pipeline.get_model_service()
+    data = wav_bytes()
+    before = cache.stats()
+
+    first = pipeline.predict_upload(data, fast=True)
+    second = pipeline.predict_upload(data, fast=True)
+    assert first['state'] == second['state']
+    after = cache.stats()
+    assert after['predictions']['hits'] == before['predictions']['hits'] + 1
+
+    # Same bytes through /preprocess/ reuse the decoded waveform
+    pipeline.preprocess_upload(data, fast=True)
+    assert cache.stats()['audio']['hits'] == after['audio']['hits'] + 1
+
+    # A different mode or model version must not reuse the prediction
+    pipeline.predict_upload(data, fast=False)
+    old_version, service.model_version = service.model_version, 'other-weights'
+    try:
+        pipeline.predict_upload(data, fast=True)
+    finally:
+        service.model_version = old_version
+    assert cache.stats()['predictions']['hits'] == after['predictions']['hits']
+
+
+def test_mode_covers_decode_settings(monkeypatch):
+    modes = {pipeline.preprocess_mode(True), pipeline.preprocess_mode(False)}
+    monkeypatch.setattr(settings, 'DECODE_AT_TARGET_RATE', not settings.DECODE_AT_TARGET_RATE)
+    modes |= {pipeline.preprocess_mode(True), pipeline.preprocess_mode(False)}
+    monkeypatch.setattr(settings, 'RESAMPLE_QUALITY', 'fast')
+    modes.add(pipeline.preprocess_mode(True))
+    monkeypatch.setattr(settings, 'AUGMENT_VARIANTS', settings.AUGMENT_VARIANTS + 1)
+    modes |= {pipeline.preprocess_mode(True), pipeline.preprocess_mode(False)}
+    assert len(modes) == 6
@@ -0,0 +1,93 @@
+"""Container sniffing, in-memory decoding and its fallbacks in app.utils."""
+import io
+
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app import utils
+from audio_samples import speech_like, wav_bytes
+
+SR = 16000
+
+
+def encoded(y, fmt, subtype):
+    buf = io.BytesIO()
+    sf.write(buf, y, SR, format=fmt, subtype=subtype)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize('data, container', [
+    (wav_bytes(0.2), 'wav'),
+    (wav_bytes(0.2, fmt='FLAC'), 'flac'),
+    (encoded(speech_like(0.2), 'OGG', 'VORBIS'), 'ogg'),
+    (encoded(speech_like(0.2), 'MP3', 'MPEG_LAYER_III'), 'mp3'),
+    (b'ID3\x04\x00\x00' + bytes(16), 'mp3'),
+    (b'\xff\xfb\x90\x64' + bytes(16), 'mp3'),
+    (b'\x1a\x45\xdf\xa3' + bytes(16), 'webm'),
+    (bytes(4) + b'ftypM4A ' + bytes(8), 'mp4'),
+    (b'RIFF\x00\x00\x00\x00AVI ', 'unknown'),
+    (b'not audio at all', 'unknown'),
+    (b'', 'unknown'),
+])
+def test_sniff_container(data, container):
+    assert utils.sniff_container(data) == container
+
+
+def test_stereo_downmix_matches_librosa(tmp_path):
+    left = speech_like(1.3, seed=1)
+    right = 0.5 * speech_like(1.3, seed=2)
+    path = tmp_path / 'stereo.wav'
+    sf.write(path, np.stack([left, right], axis=1), SR, subtype='FLOAT')
+    y, sr = utils.decode_audio(path.read_bytes())
+    expected, expected_sr = librosa.load(path, sr=None, mono=True)
+    assert (sr, y.dtype, y.shape) == (expected_sr, np.float32, expected.shape)
+    np.testing.assert_allclose(y, expected, rtol=1e-6, atol=1e-7)
+
+
+def failing(*args, **kwargs):
+    raise RuntimeError('libsndfile rejected it')
+
+
+def test_failed_in_memory_decode_falls_back_to_tempfile(monkeypatch):
+    data = wav_bytes(0.5)
+    expected, _ = utils.decode_audio(data)
+    suffixes = []
+    tempfile_decode = utils._decode_via_tempfile
+
+    def via_tempfile(data, suffix, max_seconds):
+        suffixes.append(suffix)
+        return tempfile_decode(data, suffix, max_seconds)
+
+    monkeypatch.setattr(utils, '_decode_in_memory', failing)
+    monkeypatch.setattr(utils.shutil, 'which', lambda name: None)
+    monkeypatch.setattr(utils, '_decode_via_tempfile', via_tempfile)
+    y, sr = utils.decode_audio(data, target_sr=SR)
+    assert suffixes == ['.wav'] and sr == SR
+    np.testing.assert_allclose(y, expected, atol=1e-6)
+
+
+def test_failed_in_memory_decode_prefers_ffmpeg_at_target_rate(monkeypatch):
+    calls = []
+    monkeypatch.setattr(utils, '_decode_in_memory', failing)
+    monkeypatch.setattr(utils.shutil, 'which', lambda name: '/usr/bin/' + name)
+    monkeypatch.setattr(utils, '_decode_ffmpeg',
+                        lambda data, sr, max_seconds: calls.append((sr, max_seconds)) or (np.zeros(8, np.float32), sr))
+    monkeypatch.setattr(utils, '_decode_via_tempfile', failing)
+    assert utils.decode_audio(wav_bytes(0.5), target_sr=8000, max_seconds=2.0)[1] == 8000
+    assert calls == [(8000, 2.0)]
+
+    # Without a target rate ffmpeg is skipped, and a failing ffmpeg falls through to the temp file
+    monkeypatch.setattr(utils, '_decode_via_tempfile', lambda data, suffix, max_seconds: ('tempfile', suffix))
+    assert utils.decode_audio(wav_bytes(0.5)) == ('tempfile', '.wav')
+    monkeypatch.setattr(utils, '_decode_ffmpeg', failing)
+    assert utils.decode_audio(b'\x1a\x45\xdf\xa3' + bytes(16), target_sr=SR) == ('tempfile', '.webm')
+    assert calls == [(8000, 2.0)]
+
+
+def test_unknown_container_skips_the_in_memory_decoder(monkeypatch):
+    monkeypatch.setattr(utils, '_decode_in_memory', lambda *args: pytest.fail('decoded in memory'))
+    monkeypatch.setattr(utils.shutil, 'which', lambda name: None)
+    monkeypatch.setattr(utils, '_decode_via_tempfile', lambda data, suffix, max_seconds: ('tempfile', suffix))
+    assert utils.decode_audio(b'not audio at all') == ('tempfile', '.webm')
@@ -0,0 +1,105 @@
+"""Memory-mapped HuBERT feature store: extraction, conversion, resume and the zero-copy reader."""
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+pytest.importorskip('transformers')
+
+from app.feature_store import FeatureStoreDataset, build_store, collate, info, main, read_index
+from app.hubert import HubertFeatureExtractor
+from audio_samples import small_config, speech_like
+
+SR = 16000
+
+STATES = ['andhra', 'gujrat', 'jharkhand', 'karnataka', 'kerala', 'tamil']
+
+
+def write_sequences(root, count=8, dim=16, unlabeled=2):
+    """Notebook-style `.pt` sequences of varying length, the last `unlabeled` without a state in the name."""
+    rng = np.random.default_rng(0)
+    arrays = {}
+    for i in range(count):
+        name = f"{STATES[i % len(STATES)]}_{i:04d}.pt" if i < count - unlabeled else f"clip_{i:04d}.pt"
+        x = rng.standard_normal((40 + 13 * i, dim)).astype(np.float32)
+        torch.save(torch.from_numpy(x), root / name)
+        arrays[name] = x
+    return arrays
+
+
+def test_convert_reads_back_zero_copy(tmp_path):
+    src = tmp_path / 'seq'
+    src.mkdir()
+    arrays = write_sequences(src)
+    store = tmp_path / 'store'
+    # A small chunk size forces several chunks per worker
+    stats = build_store(src, store, convert=True, workers=2, chunk_mb=0.01, max_frames=100)
+    assert (stats['done'], stats['errors']) == (8, 0)
+    assert info(store)['chunks'] > 2
+
+    ds = FeatureStoreDataset(store)
+    assert len(ds) == 6  # unlabeled clips are left out by default
+    for i, clip in enumerate(ds.clips):
+        x, label = ds[i]
+        np.testing.assert_array_equal(x.numpy(), arrays[clip][:100])
+        assert int(label) == STATES.index(clip.split('_')[0])
+        view = ds.array(i)
+        assert isinstance(view.base, np.memmap) or isinstance(view, np.memmap)
+
+    everything = FeatureStoreDataset(store, labeled_only=False)
+    assert len(everything) == 8 and (everything.labels == -1).sum() == 2
+
+
+def test_float16_store_and_collate(tmp_path):
+    src = tmp_path / 'seq'
+    src.mkdir()
+    arrays = write_sequences(src, count=4, unlabeled=0)
+    store = tmp_path / 'store'
+    build_store(src, store, convert=True, workers=0, dtype='float16', max_frames=0)
+    ds = FeatureStoreDataset(store)
+    x, _ = ds[0]
+    assert x.dtype == torch.float32
+    np.testing.assert_allclose(x.numpy(), arrays[ds.clips[0]], atol=1e-2)
+
+    batch, labels = collate([ds[i] for i in range(len(ds))], max_len=64)
+    assert batch.shape == (4, 64, 16) and labels.tolist() == ds.labels.tolist()
+    assert torch.all(batch[0, 40:] == 0)
+
+
+def test_extract_resumes_and_matches_serving_frames(tmp_path):
+    audio = tmp_path / 'audio'
+    (audio / 'kerala').mkdir(parents=True)
+    for i, duration in enumerate((1.5, 3.0, 2.2)):
+        sf.write(audio / 'kerala' / f'kerala_{i}.wav', speech_like(duration, seed=i), SR)
+    extractor = HubertFeatureExtractor.from_config(small_config(), max_frames=100, device='cpu')
+    store = tmp_path / 'store'
+
+    first = build_store(audio, store, workers=0, max_frames=100, extractor=extractor)
+    assert first['done'] == 3
+    sf.write(audio / 'tamil_9.wav', speech_like(1.0, seed=9), SR)
+    second = build_store(audio, store, workers=0, max_frames=100, extractor=extractor)
+    assert (second['done'], second['skipped']) == (1, 3)
+
+    entries = read_index(store)
+    assert [e['clip'] for e in entries] == ['kerala/kerala_0.wav', 'kerala/kerala_1.wav',
+                                            'kerala/kerala_2.wav', 'tamil_9.wav']
+    meta = json.loads((store / 'store.json').read_text())
+    assert meta['dim'] == 32 and meta['feature'] == 'sequence'
+
+    ds = FeatureStoreDataset(store)
+    y, _ = sf.read(audio / 'kerala' / 'kerala_1.wav', dtype='float32')
+    np.testing.assert_allclose(ds.array(1), extractor.frames(y, SR), atol=1e-5)
+    assert ds.lengths.max() == 100 and ds.labels.tolist() == [4, 4, 4, 5]
+
+
+def test_info_cli(tmp_path, capsys):
+    src = tmp_path / 'seq'
+    src.mkdir()
+    write_sequences(src, count=3, unlabeled=1)
+    assert main(['convert', str(src), str(tmp_path / 'store'), '--workers', '0']) == 0
+    capsys.readouterr()
+    assert main(['info', str(tmp_path / 'store')]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary['clips'] == 3 and summary['labels'] == {'0': 1, '1': 1, 'None': 1}
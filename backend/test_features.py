@@ -0,0 +1,117 @@
+"""Parity checks for the single-pass MFCC feature engine in app.utils."""
+import numpy as np
+import librosa
+
+from app.utils import (
+    preprocess_audio, rolling_windows, extract_mfcc, augmented_rolling_means, augmentation_plan,
+    augmentation_rngs, split_segments, speech_frames, window_mfcc_means,
+)
+from audio_samples import speech_like
+
+SR = 16000
+
+
+def per_window_means(windows, n_mfcc=13):
+    """The original implementation: one librosa.feature.mfcc call per window."""
+    return np.array([np.mean(librosa.feature.mfcc(y=w, sr=SR, n_mfcc=n_mfcc), axis=1) for w in windows])
+
+
+def test_preprocess_mfcc_means_match_per_window():
+    y = speech_like(7.3)
+    for fast in (True, False):
+        summary = preprocess_audio(y, SR, window_sec=1.0, n_mfcc=13, fast=fast)
+        expected = per_window_means(summary['windows'])
+        got = np.array(summary['mfcc_means'])
+        assert got.shape == expected.shape == (summary['num_windows'], 13)
+        np.testing.assert_allclose(got, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_extract_mfcc_fast_matches_per_window():
+    y = speech_like(4.2, seed=1)
+    summary = preprocess_audio(y, SR, fast=True)
+    expected = per_window_means(summary['windows']).mean(axis=0)
+    np.testing.assert_allclose(extract_mfcc(y, sr=SR, fast=True), expected, rtol=1e-4, atol=1e-3)
+
+
+def test_rolling_windows_match_per_window():
+    # 0.5 s hop = 15.625 STFT hops: windows must not be snapped to the frame grid
+    y = speech_like(7.3, seed=2)
+    win, hop = SR, SR // 2
+    windows = [y[s:s + win] for s in range(0, len(y) - win + 1, hop)]
+    expected = per_window_means(windows)
+    got = rolling_windows(y, SR, window_sec=1.0, hop_sec=0.5, n_mfcc=13)
+    assert got.shape == expected.shape
+    np.testing.assert_allclose(got, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_rolling_windows_short_clip_is_padded():
+    y = speech_like(0.4)
+    got = rolling_windows(y, SR, window_sec=1.0, hop_sec=0.5, n_mfcc=13)
+    expected = per_window_means([librosa.util.fix_length(y, size=SR)])
+    assert got.shape == (1, 13)
+    np.testing.assert_allclose(got, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_augmentation_without_variants_matches_shared_frame_windows():
+    segments = split_segments(speech_like(6.0, seed=3), SR, seg_length_sec=1.5)
+    starts = np.arange(0, len(segments[0]) - SR + 1, SR // 2)
+    expected = np.stack([window_mfcc_means(s, SR, starts, SR).mean(axis=0) for s in segments])
+    got = augmented_rolling_means(segments, SR, n_variants=0)
+    np.testing.assert_allclose(got, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_augmentation_is_seeded():
+    y = speech_like(5.0, seed=4)
+    a = extract_mfcc(y, sr=SR, fast=False, n_variants=3, seed=7)
+    np.testing.assert_array_equal(a, extract_mfcc(y, sr=SR, fast=False, n_variants=3, seed=7))
+    assert not np.array_equal(a, extract_mfcc(y, sr=SR, fast=False, n_variants=3, seed=8))
+    # Default seed comes from the audio, so repeated requests agree
+    np.testing.assert_array_equal(extract_mfcc(y, sr=SR, fast=False), extract_mfcc(y, sr=SR, fast=False))
+    assert [k for k, _ in augmentation_plan(5, seed=0)] == ['speed', 'pitch', 'noise', 'speed', 'pitch']
+    # The noise stream doesn't replay the draws that chose the plan
+    plan_rng, noise_rng = augmentation_rngs(0)
+    assert plan_rng.uniform() != noise_rng.uniform()
+
+
+def test_spectral_speed_variant_close_to_time_stretch(monkeypatch):
+    segments = split_segments(speech_like(4.5, seed=5), SR, seg_length_sec=1.5)
+    rate = 1.08
+    original = augmented_rolling_means(segments, SR, n_variants=0)
+    monkeypatch.setattr('app.utils.augmentation_plan', lambda n, seed: [('speed', rate)])
+    variant = 2 * augmented_rolling_means(segments, SR, n_variants=1) - original
+    stretched = [librosa.util.fix_length(librosa.effects.time_stretch(s, rate=rate), size=len(s)) for s in segments]
+    expected = np.stack([rolling_windows(s, SR, window_sec=1.0, hop_sec=0.5).mean(axis=0) for s in stretched])
+    rel = np.linalg.norm(variant - expected, axis=1) / np.linalg.norm(expected, axis=1)
+    assert rel.max() < 0.15
+
+
+def with_pauses(seed: int = 0) -> np.ndarray:
+    """2 s speech, 3 s pause, 2 s speech, 2 s pause, 1 s speech."""
+    rng = np.random.default_rng(seed)
+    pause = lambda sec: 0.001 * rng.standard_normal(int(sec * SR))
+    return np.concatenate([speech_like(2.0, seed=seed), pause(3.0), speech_like(2.0, seed=seed + 1),
+                           pause(2.0), speech_like(1.0, seed=seed + 2)]).astype(np.float32)
+
+
+def test_vad_flags_internal_pauses():
+    y = with_pauses()
+    speech, frame = speech_frames(y, SR)
+    assert frame == int(0.02 * SR)
+    seconds = np.arange(len(speech)) * frame / SR
+    assert speech[(seconds > 0.2) & (seconds < 1.8)].all()
+    assert not speech[(seconds > 2.5) & (seconds < 4.5)].any()
+    assert not speech[(seconds > 7.5) & (seconds < 8.5)].any()
+
+
+def test_vad_modes_remove_audio_and_windows():
+    y = with_pauses()
+    off = preprocess_audio(y, SR, fast=True, vad='off')
+    assert off['vad']['removed_seconds'] == 0 and off['num_windows'] == 10
+    for mode in ('frames', 'windows'):
+        out = preprocess_audio(y, SR, fast=True, vad=mode)
+        vad = out['vad']
+        assert 4.0 <= vad['removed_seconds'] <= 5.0, vad
+        assert vad['windows_removed'] >= 4
+        assert out['num_windows'] == len(out['mfcc_means']) == vad['windows_before'] - vad['windows_removed']
+    # Continuous speech is left alone
+    assert preprocess_audio(speech_like(4.0), SR, fast=True, vad='frames')['vad']['removed_seconds'] < 0.1
@@ -0,0 +1,69 @@
+"""HuBERT sequence feature stage, on a small randomly initialised config."""
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+
+pytest.importorskip('transformers')
+
+from app import pipeline
+from app.config import settings
+from app.hubert import HubertFeatureExtractor, frames_for_samples, set_hubert_extractor
+from app.utils import prepare_model_windows_from_audio
+from audio_samples import small_config, speech_like
+
+SR = 16000
+
+
+def test_truncated_encoder_matches_hidden_state_of_that_layer():
+    full = HubertFeatureExtractor.from_config(small_config(), layer=0, device='cpu')
+    truncated = HubertFeatureExtractor.from_config(small_config(), layer=2, device='cpu')
+    assert (full.layer, truncated.layer) == (4, 2)
+    x = torch.from_numpy(speech_like(1.0)[np.newaxis])
+    with torch.inference_mode():
+        expected = full.model(x, output_hidden_states=True).hidden_states[2]
+        actual = truncated.model(x).last_hidden_state
+    torch.testing.assert_close(actual, expected)
+
+
+def test_padded_batch_matches_unpadded_windows():
+    # A layer-normalized conv front end (HuBERT-large style) makes masking exact
+    extractor = HubertFeatureExtractor.from_config(
+        small_config(feat_extract_norm='layer', do_stable_layer_norm=True), device='cpu')
+    y = speech_like(2.0)
+    windows = [y[:SR], np.concatenate([y[SR:SR + SR // 2], np.zeros(SR // 2, dtype=np.float32)])]
+    batched = extractor.embed_windows(windows, [SR, SR // 2])
+    assert [b.shape[0] for b in batched] == [49, 24]
+    alone = extractor.embed_windows([y[SR:SR + SR // 2]])
+    np.testing.assert_allclose(batched[1], alone[0], atol=1e-4)
+
+
+def test_sequence_is_cropped_and_padded_like_training():
+    extractor = HubertFeatureExtractor.from_config(small_config(), max_frames=300, device='cpu')
+    # 1.5 s segments -> windows of 1 s and 0.5 s (49 and 24 frames)
+    lengths = [SR, SR // 2] * 10
+    assert extractor.windows_needed(lengths) == 9
+    long = extractor(speech_like(20.0), SR)
+    assert long.shape == (300, 32) and np.all(np.any(long != 0, axis=1))
+    y = speech_like(2.0)
+    _, lengths = prepare_model_windows_from_audio(y, SR, pre_emphasis=False, return_lengths=True)
+    valid = int(frames_for_samples(extractor.model, lengths).sum())
+    short = extractor(y, SR)
+    assert 90 <= valid < 300
+    assert np.any(short[:valid] != 0, axis=1).all() and not short[valid:].any()
+
+
+def test_pipeline_hubert_features(monkeypatch):
+    monkeypatch.setattr(settings, 'FEATURE_TYPE', 'hubert')
+    monkeypatch.setattr(settings, 'CACHE_ENABLED', False)
+    set_hubert_extractor(HubertFeatureExtractor.from_config(small_config(), device='cpu'))
+    try:
+        buf = io.BytesIO()
+        sf.write(buf, speech_like(3.0), SR, format='WAV')
+        result = pipeline.featurize_upload(buf.getvalue(), digest='x')
+        assert result['features'].shape == (settings.HUBERT_MAX_FRAMES, 32)
+        assert pipeline.preprocess_mode(True).startswith('hubert:')
+    finally:
+        set_hubert_extractor(None)
@@ -0,0 +1,120 @@
+"""Numeric parity of the eager, TorchScript and ONNX Runtime backends."""
+import numpy as np
+import pytest
+import torch
+
+from app import inference
+from app.config import settings
+from app.model_service import ModelService
+from app.models import BiLSTM, CNN1D_BN, INPUT_SHAPE, TransformerModel
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    torch.manual_seed(0)
+    module = CNN1D_BN(num_classes=6)
+    # Non-trivial running stats so BatchNorm folding is actually exercised
+    for bn in (module.conv[1], module.conv[4]):
+        bn.running_mean.uniform_(-0.5, 0.5)
+        bn.running_var.uniform_(0.5, 2.0)
+    path = tmp_path / 'cnn_bn_final.pt'
+    torch.save(module.state_dict(), path)
+    return path
+
+
+def features(batch_size, frames=INPUT_SHAPE[0]):
+    return np.random.default_rng(batch_size).normal(size=(batch_size, frames, INPUT_SHAPE[1])).astype(np.float32)
+
+
+def test_state_dict_loads_as_eager(model_path):
+    backend = inference.load_backend('eager', str(model_path))
+    assert isinstance(backend.module, CNN1D_BN)
+    assert backend.run(features(2)).shape == (2, 6)
+
+
+def test_torchscript_matches_eager(model_path):
+    eager = inference.load_backend('eager', str(model_path))
+    traced = inference.load_backend('torchscript', str(model_path))
+    for n in (1, 8):
+        np.testing.assert_allclose(traced.run(features(n)), eager.run(features(n)), rtol=1e-4, atol=1e-4)
+
+
+def test_exported_torchscript_is_loaded(model_path):
+    module = inference.load_module(str(model_path))
+    inference.export_torchscript(module, inference.artifact_path(str(model_path), 'torchscript'))
+    eager = inference.EagerBackend(module)
+    loaded = inference.load_backend('torchscript', str(model_path))
+    np.testing.assert_allclose(loaded.run(features(3)), eager.run(features(3)), rtol=1e-4, atol=1e-4)
+
+
+def test_onnx_matches_eager(model_path):
+    pytest.importorskip('onnxruntime')
+    with pytest.raises(FileNotFoundError):
+        inference.load_backend('onnx', str(model_path))
+    module = inference.load_module(str(model_path))
+    inference.export_onnx(module, inference.artifact_path(str(model_path), 'onnx'))
+    backend = inference.load_backend('onnx', str(model_path))
+    eager = inference.EagerBackend(module)
+    # Dynamic batch and frame axes
+    for n, frames in ((1, 300), (8, 300), (4, 120)):
+        x = features(n, frames)
+        np.testing.assert_allclose(backend.run(x), eager.run(x), rtol=1e-4, atol=1e-4)
+
+
+def test_model_service_falls_back_to_eager(model_path, monkeypatch):
+    monkeypatch.setattr(settings, 'INFERENCE_BACKEND', 'onnx')
+    monkeypatch.setattr(settings, 'MODEL_WARMUP', False)
+    service = ModelService(model_path=str(model_path))
+    service.load_model()
+    assert service.backend.name == 'eager'
+    assert service.model_version != 'dummy'
+
+
+def test_model_service_predictions_agree_across_backends(model_path, monkeypatch):
+    pytest.importorskip('onnxruntime')
+    monkeypatch.setattr(settings, 'MODEL_WARMUP', True)
+    module = inference.load_module(str(model_path))
+    inference.export_onnx(module, inference.artifact_path(str(model_path), 'onnx'))
+    x = features(5)
+    results = {}
+    for kind in inference.BACKENDS:
+        monkeypatch.setattr(settings, 'INFERENCE_BACKEND', kind)
+        service = ModelService(model_path=str(model_path))
+        service.load_model()
+        assert service.backend.name == kind
+        results[kind] = service.predict_batch(x)
+    for kind in inference.BACKENDS:
+        assert [s for s, _ in results[kind]] == [s for s, _ in results['eager']]
+        np.testing.assert_allclose([c for _, c in results[kind]], [c for _, c in results['eager']], rtol=1e-4)
+
+
+@pytest.mark.parametrize('module', [
+    CNN1D_BN(num_classes=6),
+    BiLSTM(num_classes=6, hidden_size=64, num_layers=2),
+    TransformerModel(num_classes=6, dim_feedforward=256, num_layers=1),
+], ids=['cnn_bn', 'bilstm', 'transformer'])
+def test_reduced_precision_stays_close_to_fp32(module, tmp_path):
+    path = tmp_path / 'head.pt'
+    torch.save(module.eval().state_dict(), path)
+    x = features(4, frames=50)
+    fp32 = inference.load_backend('eager', str(path))
+    assert type(fp32.module) is type(module)
+    expected = fp32.run(x)
+    for precision, atol in (('int8', 0.05), ('bf16', 0.1)):
+        backend = inference.load_backend('eager', str(path), precision=precision)
+        got = backend.run(x)
+        assert got.dtype == np.float32
+        np.testing.assert_allclose(got, expected, atol=atol)
+
+
+def test_reduced_precision_gets_its_own_model_version(model_path, monkeypatch):
+    monkeypatch.setattr(settings, 'MODEL_WARMUP', False)
+    versions = {}
+    for precision in inference.PRECISIONS:
+        monkeypatch.setattr(settings, 'INFERENCE_PRECISION', precision)
+        service = ModelService(model_path=str(model_path))
+        service.load_model()
+        assert service.backend.precision == precision
+        versions[precision] = service.model_version
+    assert len(set(versions.values())) == len(versions)
+    assert versions['int8'].startswith(versions['fp32'])
@@ -0,0 +1,59 @@
+"""Load generator: uploads, steps, saturation detection and the report."""
+import io
+import json
+
+import soundfile as sf
+
+from app import loadgen
+from app.cache import content_digest
+
+
+def step(level, rps, p95=10.0, error_rate=0.0, mode='concurrency', **extra):
+    return {mode: level, 'throughput_rps': rps, 'error_rate': error_rate, 'latency_ms': {'p95': p95}, **extra}
+
+
+def test_uploads_are_unique_and_decodable():
+    uploads = loadgen.make_uploads([1.0, 2.5], variants=2)
+    assert [u['seconds'] for u in uploads] == [1.0, 1.0, 2.5, 2.5]
+    target = loadgen.Target('predict', uploads)
+    requests = [target.next() for _ in range(8)]
+    files = [r['kwargs']['files']['file'] for r in requests]
+    assert files[0][0] == 'recording.wav' and files[0][2] == 'audio/wav'
+    assert len({content_digest(f[1]) for f in files}) == 8
+    y, sr = sf.read(io.BytesIO(files[6][1]))
+    assert (len(y), sr) == (40000, 16000)
+
+    same = loadgen.Target('predict', uploads, unique=False)
+    assert len({content_digest(same.next()['kwargs']['files']['file'][1]) for _ in range(8)}) == 4
+
+
+def test_find_saturation():
+    closed = [step(1, 10.0), step(2, 19.0), step(4, 30.0), step(8, 31.0), step(16, 20.0, error_rate=0.2)]
+    sat = loadgen.find_saturation(closed, 'concurrency')
+    assert (sat['concurrency'], sat['sustainable'], sat['sustainable_rps']) == (8, 4, 30.0)
+    assert loadgen.replicas_for(100, closed, sat) == 4
+    assert loadgen.find_saturation(closed, 'concurrency', slo_ms=5)['sustainable'] is None
+
+    opened = [step(5, 5.0, mode='rate', offered_rps=5.1), step(10, 9.8, mode='rate', offered_rps=10.2),
+              step(20, 12.0, p95=900.0, mode='rate', offered_rps=19.5)]
+    sat = loadgen.find_saturation(opened, 'rate')
+    assert (sat['rate'], sat['sustainable_rps']) == (20, 9.8) and 'short of offered' in sat['reason']
+    assert loadgen.find_saturation(opened[:2], 'rate') is None
+
+
+def test_in_process_run(tmp_path, capsys):
+    out = tmp_path / 'load.json'
+    assert loadgen.main(['--in-process', '--concurrency', '1', '2', '--requests', '4', '--durations', '1',
+                         '--warmup', '1', '--target-rps', '5', '--out', str(out)]) == 0
+    report = json.loads(out.read_text())
+    assert [s['concurrency'] for s in report['steps']] == [1, 2]
+    for s in report['steps']:
+        assert (s['sent'], s['ok'], s['error_rate'], s['statuses']) == (4, 4, 0.0, {'200': 4})
+        assert {'p50', 'p95', 'p99'} <= set(s['latency_ms']) and s['throughput_rps'] > 0
+    assert report['meta']['endpoint'] == '/predict/' and report['replicas'] >= 1
+    assert 'concurrency' in capsys.readouterr().out
+
+    assert loadgen.main(['--in-process', '--endpoint', 'recommend', '--rate', '50', '--requests', '10',
+                         '--out', str(out)]) == 0
+    (only,) = json.loads(out.read_text())['steps']
+    assert only['sent'] == 10 and only['statuses'] == {'200': 10} and 'offered_rps' in only
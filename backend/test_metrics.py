@@ -0,0 +1,90 @@
+"""Stage timings, Prometheus exposition and structured logging."""
+import io
+import json
+import logging
+import re
+
+from fastapi.testclient import TestClient
+
+from app import logs, metrics, pipeline
+from app.config import settings
+from app.main import app
+from audio_samples import wav_bytes
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in Prometheus text output (None if absent)."""
+    want = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    for line in text.splitlines():
+        m = re.match(r'^([a-z_]+)(\{[^}]*\})? (\S+)$', line)
+        if m and m.group(1) == name and all(p in (m.group(2) or '') for p in want.split(',') if p):
+            return float(m.group(3))
+    return None
+
+
+def test_histogram_exposition():
+    h = metrics.Histogram('test_seconds', 'Test.', (0.1, 1.0), ('stage',))
+    for v in (0.05, 0.5, 0.5, 3.0):
+        h.observe(v, stage='a"b')
+    lines = list(h.samples())
+    assert lines[:3] == ['test_seconds_bucket{stage="a\\"b",le="0.1"} 1',
+                         'test_seconds_bucket{stage="a\\"b",le="1"} 3',
+                         'test_seconds_bucket{stage="a\\"b",le="+Inf"} 4']
+    assert lines[3] == 'test_seconds_sum{stage="a\\"b"} 4.05'
+    assert lines[4] == 'test_seconds_count{stage="a\\"b"} 4'
+
+
+def test_nested_entry_points_report_stages_once():
+    settings.CACHE_ENABLED, cache_enabled = False, settings.CACHE_ENABLED
+    try:
+        result = pipeline.predict_upload(wav_bytes(2.0, sr=22050), fast=True)
+    finally:
+        settings.CACHE_ENABLED = cache_enabled
+    timings = result['timings']
+    # predict_upload calls featurize_upload: one set of timings, on the outer result only
+    assert {'decode', 'resample', 'trim', 'windowing', 'mfcc'} <= set(timings)
+    assert all(v >= 0 for v in timings.values())
+    with metrics.collect() as outer:
+        with metrics.collect() as inner:
+            with metrics.stage('x'):
+                pass
+    assert inner is None and set(outer) == {'x'}
+
+
+def test_metrics_endpoint_after_predict():
+    with TestClient(app) as client:
+        before = metrics.STAGE_SECONDS.count(stage='decode')
+        response = client.post('/predict/', files={'file': ('clip.wav', wav_bytes(seconds=1.5, sr=16000),
+                                                            'audio/wav')})
+        assert response.status_code == 200
+        client.get('/health/live')
+        text = client.get('/metrics').text
+
+    assert '# TYPE auraldine_stage_seconds histogram' in text
+    assert metrics.STAGE_SECONDS.count(stage='decode') >= before
+    for stage in ('serialization', 'inference'):
+        assert sample(text, 'auraldine_stage_seconds_count', stage=stage) >= 1
+    assert sample(text, 'auraldine_requests_total', method='POST', route='/predict/', status='200') >= 1
+    assert sample(text, 'auraldine_requests_total', method='GET', route='/health/live', status='200') >= 1
+    assert sample(text, 'auraldine_request_bytes_count', method='POST', route='/predict/') >= 1
+    assert sample(text, 'auraldine_audio_seconds_bucket', endpoint='predict', le='2') >= 1
+
+
+def test_structured_log_lines():
+    out = io.StringIO()
+    logs.configure(fmt='json', stream=out, force=True)
+    try:
+        logs.get_logger('predict').info("Prediction", extra={'state': 'kerala', 'duration_ms': 12})
+        logs.get_logger('predict').debug("not at INFO")
+        logs.flush()
+        record = json.loads(out.getvalue().strip())
+        assert (record['level'], record['logger'], record['msg']) == ('info', 'predict', 'Prediction')
+        assert (record['state'], record['duration_ms']) == ('kerala', 12)
+
+        logs.configure(fmt='text', stream=out, force=True)
+        logs.get_logger('stream').warning("Stream failed", extra={'code': 1011})
+        logs.flush()
+        assert out.getvalue().splitlines()[-1].endswith('WARNING [stream] Stream failed code=1011')
+    finally:
+        logs.configure(force=True)
+    assert logging.getLogger('auraldine').level == logging.INFO
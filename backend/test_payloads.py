@@ -0,0 +1,59 @@
+"""/preprocess/ representations: JSON, binary arrays and .npz."""
+import base64
+import io
+import json
+import struct
+import wave
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import payloads, routes
+from app.main import app
+from audio_samples import wav_bytes
+
+
+def test_wav_preview_matches_wave_module():
+    y = np.random.default_rng(0).uniform(-1, 1, 16000).astype(np.float32)
+    scaled = (y * 32767).astype('int16')
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(struct.pack('<' + 'h' * len(scaled), *scaled))
+    assert payloads.wav_bytes(y, 16000) == buf.getvalue()
+    # Out-of-range samples clip instead of wrapping around
+    assert np.frombuffer(payloads.wav_bytes(np.array([1.5, -2.0]), 16000)[44:], '<i2').tolist() == [32767, -32767]
+
+
+def test_negotiated_representations_agree():
+    files = {'file': ('clip.wav', wav_bytes(3.0, sr=22050, freq=240.0), 'audio/wav')}
+    with TestClient(app) as client:
+        assert routes.startup_state.wait(60)
+        as_json = client.post('/preprocess/', files=files)
+        as_arrays = client.post('/preprocess/', files=files, headers={'Accept': payloads.ARRAYS})
+        as_npz = client.post('/preprocess/', files=files, headers={'Accept': 'application/x-npz'})
+        bare = client.post('/preprocess/?preview=0&windows=0', files=files,
+                           headers={'Accept': 'application/octet-stream'})
+        slim = client.post('/preprocess/?preview=false', files=files)
+
+    assert as_json.headers['content-type'] == 'application/json' and 'Accept' in as_json.headers['vary']
+    expected = as_json.json()
+    means = np.array(expected['mfcc_means'], dtype=np.float32)
+    wav = base64.b64decode(expected['preview_wav_b64'])
+
+    assert as_arrays.headers['content-type'] == payloads.ARRAYS
+    meta, arrays = payloads.unpack(as_arrays.content)
+    assert meta == {k: expected[k] for k in ('sr', 'original_samples', 'num_segments', 'num_windows', 'vad')}
+    np.testing.assert_array_equal(arrays['mfcc_means'], means)
+    assert arrays['preview_wav'].tobytes() == wav
+    assert len(as_arrays.content) < len(as_json.content)
+
+    with np.load(io.BytesIO(as_npz.content), allow_pickle=False) as f:
+        assert json.loads(str(f['meta'])) == meta
+        np.testing.assert_array_equal(f['mfcc_means'], means)
+        assert f['preview_wav'].tobytes() == wav
+
+    assert payloads.unpack(bare.content) == (meta, {})
+    assert slim.json()['preview_wav_b64'] is None and slim.json()['mfcc_means'] == expected['mfcc_means']
@@ -0,0 +1,68 @@
+"""Resampling quality tiers: latency/quality trade-off and spectral parity with librosa."""
+import io
+import shutil
+
+import librosa
+import numpy as np
+import pytest
+import scipy.signal
+import soundfile as sf
+
+from app.utils import RESAMPLE_QUALITIES, _decode_ffmpeg, read_audio_bytes, resample_audio
+
+TARGET = 16000
+
+
+def noise(sr, seconds=4.0, seed=0):
+    return (0.1 * np.random.default_rng(seed).standard_normal(int(sr * seconds))).astype(np.float32)
+
+
+def passband_deviation_db(y, reference, sr, edge):
+    """Largest |PSD ratio| in dB below `edge` * Nyquist."""
+    f, p = scipy.signal.welch(y, sr, nperseg=1024)
+    _, p_ref = scipy.signal.welch(reference, sr, nperseg=1024)
+    return float(np.max(np.abs(10 * np.log10(p / p_ref))[f < edge * sr / 2]))
+
+
+@pytest.mark.parametrize('orig_sr', [48000, 44100])
+def test_hq_tier_matches_librosa(orig_sr):
+    y = noise(orig_sr, seconds=1.3)
+    np.testing.assert_array_equal(resample_audio(y, orig_sr, TARGET, 'hq'),
+                                  librosa.resample(y, orig_sr=orig_sr, target_sr=TARGET))
+
+
+@pytest.mark.parametrize('orig_sr', [48000, 44100])
+@pytest.mark.parametrize('quality,edge', [('mq', 0.9), ('fast', 0.6)])
+def test_tiers_spectral_parity(orig_sr, quality, edge):
+    y = noise(orig_sr)
+    reference = resample_audio(y, orig_sr, TARGET, 'hq')
+    out = resample_audio(y, orig_sr, TARGET, quality)
+    assert out.shape == reference.shape
+    assert passband_deviation_db(out, reference, TARGET, edge) < 0.5
+    # A tone above the new Nyquist must not fold back into the band
+    t = np.arange(orig_sr * 2) / orig_sr
+    tone = (0.5 * np.sin(2 * np.pi * 11000 * t)).astype(np.float32)
+    aliased = resample_audio(tone, orig_sr, TARGET, quality)[1000:-1000]
+    assert 20 * np.log10(np.std(aliased) / np.std(tone)) < -90
+
+
+def test_read_audio_bytes_uses_tier():
+    buf = io.BytesIO()
+    y = noise(48000, seconds=1.0)
+    sf.write(buf, y, 48000, format='WAV', subtype='FLOAT')
+    for quality in RESAMPLE_QUALITIES:
+        out, sr = read_audio_bytes(buf.getvalue(), sr=TARGET, quality=quality)
+        assert sr == TARGET
+        np.testing.assert_array_equal(out, resample_audio(y, 48000, TARGET, quality))
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+def test_ffmpeg_decodes_at_target_rate():
+    buf = io.BytesIO()
+    y = noise(48000, seconds=2.0)
+    sf.write(buf, y, 48000, format='WAV', subtype='FLOAT')
+    out, sr = _decode_ffmpeg(buf.getvalue(), TARGET, quality='hq')
+    reference = resample_audio(y, 48000, TARGET, 'hq')
+    assert sr == TARGET and abs(len(out) - len(reference)) <= 1
+    n = min(len(out), len(reference))
+    assert passband_deviation_db(out[:n], reference[:n], TARGET, 0.9) < 0.5
@@ -0,0 +1,122 @@
+"""API tests using FastAPI's TestClient."""
+import io
+import json
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from audio_samples import wav_bytes
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_predict_batch_multiple_files():
+    files = [('files', (f'clip{i}.wav', wav_bytes(freq=200 + 50 * i), 'audio/wav')) for i in range(4)]
+    files.append(('files', ('broken.wav', b'not audio at all', 'audio/wav')))
+    with TestClient(app) as client:
+        lines = ndjson(client.post('/predict/batch/', files=files))
+    results = [l for l in lines if l['type'] == 'result']
+    assert sorted(r['index'] for r in results) == list(range(5))
+    assert sum('error' in r for r in results) == 1
+    assert all(r['state'] for r in results if 'error' not in r)
+    summary = lines[-1]
+    assert (summary['type'], summary['scored'], summary['errors']) == ('summary', 4, 1)
+
+
+def test_predict_batch_archives():
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, 'w') as zf:
+        zf.writestr('a.wav', wav_bytes())
+        zf.writestr('notes.txt', 'ignored')
+        zf.writestr('sub/b.flac', wav_bytes(freq=330))
+    tar_buf = io.BytesIO()
+    with tarfile.open(fileobj=tar_buf, mode='w:gz') as tf:
+        data = wav_bytes(freq=440)
+        info = tarfile.TarInfo('c.wav')
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+
+    with TestClient(app) as client:
+        for name, payload, expected in (('clips.zip', zip_buf.getvalue(), 2), ('clips.tar.gz', tar_buf.getvalue(), 1)):
+            lines = ndjson(client.post('/predict/batch/', files=[('files', (name, payload, 'application/octet-stream'))]))
+            assert lines[-1]['scored'] == expected
+            assert all(l['file'].startswith(name + '/') for l in lines if l['type'] == 'result')
+
+
+def test_predict_batch_skips_oversized_members(monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, 'UPLOAD_MAX_MB', 0.1)
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('ok.wav', wav_bytes(freq=250))
+        zf.writestr('bomb.wav', b'\0' * (4 << 20))  # 4 MB that deflates to a few KB
+    tar_buf = io.BytesIO()
+    with tarfile.open(fileobj=tar_buf, mode='w:gz') as tf:
+        info = tarfile.TarInfo('bomb.wav')
+        info.size = 4 << 20
+        tf.addfile(info, io.BytesIO(b'\0' * info.size))
+    assert len(zip_buf.getvalue()) < 64 * 1024
+
+    with TestClient(app) as client:
+        lines = ndjson(client.post('/predict/batch/', files=[
+            ('files', ('clips.zip', zip_buf.getvalue(), 'application/zip')),
+            ('files', ('clips.tar.gz', tar_buf.getvalue(), 'application/gzip'))]))
+    errors = {l['file']: l['error'] for l in lines if l.get('error')}
+    assert set(errors) == {'clips.zip/bomb.wav', 'clips.tar.gz/bomb.wav'}
+    assert all('uncompressed' in e for e in errors.values())
+    assert lines[-1]['scored'] == 1 and lines[-1]['errors'] == 2
+
+
+def test_recommend_cuisine_etag_and_compression():
+    import gzip
+    from app.routes import STATE_CUISINES
+    with TestClient(app) as client:
+        plain = client.get('/recommend-cuisine/', headers={'Accept-Encoding': 'identity'})
+        assert plain.status_code == 200
+        assert 'content-encoding' not in plain.headers
+        assert plain.json() == {'all_cuisines': STATE_CUISINES, 'total_states': len(STATE_CUISINES)}
+        assert plain.headers['cache-control'].startswith('public, max-age=')
+        etag = plain.headers['etag']
+
+        again = client.get('/recommend-cuisine/', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+        assert again.status_code == 304 and again.content == b''
+        assert again.headers['etag'] == etag
+
+        # httpx would transparently decode, so read the raw stream
+        with client.stream('GET', '/recommend-cuisine/', headers={'Accept-Encoding': 'gzip'}) as r:
+            raw = b''.join(r.iter_raw())
+            assert r.headers['content-encoding'] == 'gzip'
+            assert r.headers['etag'] != etag
+            gz_etag = r.headers['etag']
+        assert gzip.decompress(raw) == plain.content
+        assert len(raw) < len(plain.content)
+        assert client.get('/recommend-cuisine/', headers={'If-None-Match': gz_etag}).status_code == 304
+
+        one = client.get('/recommend-cuisine/', params={'state': 'kerala'})
+        assert one.json()['state'] == 'kerala' and one.json()['count'] == len(STATE_CUISINES['kerala'])
+        assert one.headers['etag'] not in (etag, gz_etag)
+
+
+def test_negotiate_encoding():
+    from app.http_cache import negotiate_encoding, brotli
+    assert negotiate_encoding('') is None
+    assert negotiate_encoding('identity') is None
+    assert negotiate_encoding('gzip;q=0') is None
+    assert negotiate_encoding('gzip, deflate') == 'gzip'
+    assert negotiate_encoding('br;q=0.5, gzip;q=0.8') == 'gzip'
+    assert negotiate_encoding('gzip, deflate, br') == ('br' if brotli is not None else 'gzip')
+
+
+def test_preprocess_response_is_compressed_when_accepted():
+    files = {'file': ('clip.wav', wav_bytes(seconds=3.0), 'audio/wav')}
+    with TestClient(app) as client:
+        compressed = client.post('/preprocess/', files=files, headers={'Accept-Encoding': 'gzip'})
+        plain = client.post('/preprocess/', files=files, headers={'Accept-Encoding': 'identity'})
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert 'content-encoding' not in plain.headers
+    assert compressed.json() == plain.json()
+    assert compressed.json()['num_windows'] == len(plain.json()['mfcc_means'])
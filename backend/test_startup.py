@@ -0,0 +1,101 @@
+"""Liveness/readiness endpoints and the background startup sequence."""
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import pipeline, startup
+from app.config import settings
+from app.main import app
+from app.startup import StartupState
+
+
+class SlowModelService:
+    def __init__(self):
+        self.release = threading.Event()
+        self.loaded = False
+
+    def load_model(self):
+        self.release.wait(5)
+        self.loaded = True
+
+
+def test_startup_state_turns_ready_after_load_and_warmup(monkeypatch):
+    monkeypatch.setattr(settings, 'STARTUP_WARMUP', True)
+    service = SlowModelService()
+    state = StartupState()
+    state.start(service, background=True)
+    state.start(service, background=True)  # idempotent
+    assert not state.wait(0.05)
+    assert state.snapshot()['status'] == 'starting'
+    assert state.phase == 'loading_model'
+
+    service.release.set()
+    assert state.wait(60)
+    snapshot = state.snapshot()
+    assert service.loaded
+    assert snapshot['status'] == 'ready'
+    assert snapshot['cold_start_to_ready_ms'] > 0
+    assert {'preprocess_fast', 'preprocess_full', 'decode_resample', 'streaming'} <= set(snapshot['timings_ms']['warmup'])
+
+
+def test_startup_failure_is_reported():
+    class Broken:
+        def load_model(self):
+            raise RuntimeError('boom')
+    state = StartupState()
+    state.start(Broken(), background=False)
+    assert not state.ready
+    assert state.snapshot()['status'] == 'failed'
+    assert state.error == 'boom'
+
+
+def test_failed_startup_answers_at_once_and_retries(monkeypatch):
+    from app import routes
+
+    class Flaky:
+        calls = 0
+
+        def load_model(self):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError('boom')
+
+    monkeypatch.setattr(settings, 'STARTUP_WARMUP', False)
+    monkeypatch.setattr(settings, 'BACKGROUND_LOAD', False)
+    monkeypatch.setattr(settings, 'STARTUP_RETRY_SECONDS', 0.2)
+    service, state = Flaky(), StartupState()
+    monkeypatch.setattr(routes, 'startup_state', state)
+    monkeypatch.setattr(routes, 'model_service', service)
+    state.start(service)
+    assert state.phase == 'failed'
+
+    # No thread parked for READY_WAIT_SECONDS, and no retry before the backoff
+    started = time.perf_counter()
+    assert asyncio.run(routes._ready()) is False
+    assert time.perf_counter() - started < 1.0 and service.calls == 1
+
+    time.sleep(0.25)
+    assert asyncio.run(routes._ready()) is True
+    assert service.calls == 2 and state.snapshot()['attempts'] == 2 and state.error is None
+
+
+def test_health_endpoints():
+    with TestClient(app) as client:
+        assert client.get('/health/live').json() == {'status': 'alive'}
+        from app import routes
+        assert routes.startup_state.wait(60)
+        ready = client.get('/health/ready')
+        assert ready.status_code == 200
+        assert ready.json()['phase'] == 'ready'
+
+
+def test_worker_initializer_runs_the_warmup_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(startup, 'warm_pipeline', lambda: calls.append(1))
+    monkeypatch.setattr('torch.set_num_threads', lambda n: None)
+    pipeline.init_worker()
+    assert calls == []
+    pipeline.init_worker(warm=True)
+    assert calls == [1]
@@ -0,0 +1,86 @@
+"""Tests for incremental streaming features and the /predict/stream/ WebSocket."""
+import numpy as np
+import librosa
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import settings
+from app.main import app
+from app.streaming import StreamingFeatureState
+from app.utils import preprocess_audio
+from audio_samples import speech_like
+
+SR = 16000
+
+
+def clip(input_sr):
+    y = speech_like(5.3)
+    if input_sr != SR:
+        y = librosa.resample(y, orig_sr=SR, target_sr=input_sr)
+    # Leading silence and a quiet tail exercise the trim bounds
+    return np.concatenate([np.zeros(input_sr // 3), y, np.full(input_sr // 2, 1e-3)]).astype(np.float32)
+
+
+def test_incremental_features_match_batch_path():
+    for input_sr in (SR, 48000):
+        y = clip(input_sr)
+        y_batch = y if input_sr == SR else librosa.resample(y, orig_sr=input_sr, target_sr=SR)
+        for fast in (True, False):
+            stream = StreamingFeatureState(input_sr, fast=fast, sr=SR)
+            for i in range(0, len(y), 3000):
+                stream.append(y[i:i + 3000].tobytes())
+            out = stream.finalize()
+            ref = preprocess_audio(y_batch, SR, window_sec=1.0, n_mfcc=13, fast=fast)
+            assert out['num_windows'] == ref['num_windows']
+            assert out['windows_reused'] > 0
+            np.testing.assert_allclose(out['mfcc_means'], ref['mfcc_means'], rtol=1e-4, atol=1e-3)
+            np.testing.assert_allclose(out['features'], np.mean(ref['mfcc_means'], axis=0), rtol=1e-4, atol=1e-3)
+
+
+def test_louder_audio_realigns_windows():
+    y = clip(SR)
+    y[-SR // 2:] = 0.95 * np.sin(np.arange(SR // 2))  # raises the trim threshold late
+    stream = StreamingFeatureState(SR, fast=True, sr=SR)
+    for i in range(0, len(y), 4000):
+        stream.append(y[i:i + 4000].tobytes())
+    ref = preprocess_audio(y, SR, fast=True)
+    np.testing.assert_allclose(stream.finalize()['mfcc_means'], ref['mfcc_means'], rtol=1e-4, atol=1e-3)
+
+
+def test_websocket_streams_interim_and_final():
+    y = clip(SR)
+    pcm = (y * 32767).astype('<i2')
+    with TestClient(app) as client:
+        with client.websocket_connect('/predict/stream/') as ws:
+            ws.send_json({'type': 'start', 'sample_rate': SR, 'encoding': 's16le'})
+            assert ws.receive_json()['type'] == 'ready'
+            interim = 0
+            for i in range(0, len(pcm), SR // 2):
+                ws.send_bytes(pcm[i:i + SR // 2].tobytes())
+                if i + SR // 2 >= 2 * SR and interim == 0:
+                    msg = ws.receive_json()
+                    assert msg['type'] == 'interim'
+                    interim += 1
+            ws.send_json({'type': 'stop'})
+            msg = ws.receive_json()
+            while msg['type'] == 'interim':
+                msg = ws.receive_json()
+            assert msg['type'] == 'final'
+            assert msg['state'] and 'cuisines' in msg
+            assert abs(msg['audio_seconds'] - len(y) / SR) < 1e-3
+
+
+def test_websocket_closes_past_the_duration_cap(monkeypatch):
+    monkeypatch.setattr(settings, 'UPLOAD_MAX_SECONDS', 2.0)
+    pcm = (clip(SR) * 32767).astype('<i2')
+    with TestClient(app) as client:
+        with client.websocket_connect('/predict/stream/') as ws:
+            ws.send_json({'type': 'start', 'sample_rate': SR, 'encoding': 's16le'})
+            assert ws.receive_json()['type'] == 'ready'
+            ws.send_bytes(pcm.tobytes())  # about 6 s in one message
+            msg = ws.receive_json()
+            assert msg['type'] == 'error' and '2s limit' in msg['detail']
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+            assert closed.value.code == 1009
@@ -0,0 +1,82 @@
+"""Memory-mapped .weights artifacts and the architecture registry."""
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from app import models, weights
+from app.config import settings
+from app.inference import EagerBackend, example_input
+from app.model_service import ModelService
+
+
+def heads():
+    torch.manual_seed(0)
+    return [models.CNN1D_BN(), models.BiLSTM(hidden_size=64, num_layers=2, dropout=0.2),
+            models.TransformerModel(nhead=12, dim_feedforward=256, num_layers=1, activation='gelu')]
+
+
+def mapped_ranges(path):
+    real = os.path.realpath(path)
+    with open('/proc/self/maps') as f:
+        for line in f:
+            if line.rstrip().endswith(real):
+                lo, hi = line.split()[0].split('-')
+                yield int(lo, 16), int(hi, 16)
+
+
+@pytest.mark.parametrize('index', range(3))
+def test_round_trip_is_exact_and_mapped(tmp_path, index):
+    module = heads()[index].eval()
+    path = tmp_path / 'head.weights'
+    header = weights.save(module, path)
+    assert weights.is_weights_file(path) and not weights.is_weights_file(__file__)
+
+    loaded = models.load_module(str(path))
+    assert type(loaded) is type(module)
+    assert models.describe(loaded) == (header['architecture'], header['config'])
+    x = example_input(batch_size=2).numpy()
+    np.testing.assert_array_equal(EagerBackend(loaded).run(x), EagerBackend(module).run(x))
+
+    if os.path.exists('/proc/self/maps'):
+        ranges = list(mapped_ranges(path))
+        ptr = loaded.fc.weight.data_ptr()
+        assert any(lo <= ptr < hi for lo, hi in ranges)
+    # Copy-on-write: writing to a loaded parameter never reaches the file
+    with torch.no_grad():
+        loaded.fc.weight.zero_()
+    again = models.load_module(str(path))
+    torch.testing.assert_close(again.fc.weight, module.fc.weight)
+
+
+def test_model_service_loads_weights(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'MODEL_WARMUP', False)
+    module = heads()[0].eval()
+    torch.save(module.state_dict(), tmp_path / 'cnn_bn_final.pt')
+    header = weights.save(module, tmp_path / 'cnn_bn_final.weights')
+
+    from_pt = ModelService(model_path=str(tmp_path / 'cnn_bn_final.pt'))
+    from_weights = ModelService(model_path=str(tmp_path / 'cnn_bn_final.weights'))
+    from_pt.load_model()
+    from_weights.load_model()
+    assert from_weights.backend.name == 'eager' and from_weights.model_version == header['digest']
+    x = example_input(batch_size=3).numpy()
+    np.testing.assert_allclose(from_weights.predict_proba(x), from_pt.predict_proba(x), rtol=1e-6)
+
+
+def test_convert_cli(tmp_path, capsys):
+    module = heads()[2].eval()
+    src = tmp_path / 'transformer.pt'
+    torch.save({'state_dict': module.state_dict()}, src)
+    assert weights.main(['convert', str(src), '--nhead', '12', '--activation', 'gelu']) == 0
+    assert 'max abs logit difference 0.00e+00' in capsys.readouterr().out
+
+    dst = tmp_path / 'transformer.weights'
+    header = weights.read_header(dst)
+    assert header['architecture'] == 'TransformerModel' and header['metadata']['source'] == 'transformer.pt'
+    assert (header['config']['nhead'], header['config']['activation']) == (12, 'gelu')
+    assert weights.main(['info', str(dst)]) == 0
+    assert 'TransformerModel' in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        models.build('ResNet', {})
@@ -186,6 +186,63 @@ class AccentAPI {
     }
   }
 
+  /**
+   * Open a streaming prediction session over WebSocket.
+   * Send mono Float32 PCM chunks with sendPCM() while recording; finish()
+   * resolves with the final prediction (same shape as sendForAnalysis()).
+   */
+  openPredictionStream(sampleRate, onInterim) {
+    const base = (this.baseURL && this.baseURL !== '') ? this.baseURL : 'http://localhost:8000';
+    const endpoint = base.replace(/^http/, 'ws') + '/predict/stream/';
+    console.log('📡 Opening prediction stream:', endpoint);
+
+    const socket = new WebSocket(endpoint);
+    socket.binaryType = 'arraybuffer';
+    const pending = [];
+    let resolveFinal, rejectFinal;
+    const finalResult = new Promise((resolve, reject) => {
+      resolveFinal = resolve;
+      rejectFinal = reject;
+    });
+
+    socket.onopen = () => {
+      socket.send(JSON.stringify({ type: 'start', sample_rate: sampleRate, encoding: 'f32le' }));
+      pending.splice(0).forEach(chunk => socket.send(chunk));
+    };
+    socket.onmessage = (event) => {
+      const msg = JSON.parse(event.data);
+      if (msg.type === 'interim' && onInterim) {
+        onInterim(msg);
+      } else if (msg.type === 'final') {
+        resolveFinal({
+          region: this.getRegionNameFromState(msg.state),
+          language: msg.language || this.getLanguageFromState(msg.state),
+          confidence: msg.confidence,
+          characteristics: this.getCharacteristicsFromState(msg.state),
+          duration_ms: msg.duration_ms || 0,
+          cuisines: msg.cuisines || [],
+          state: msg.state
+        });
+      } else if (msg.type === 'error') {
+        rejectFinal(new Error(`Stream error: ${msg.detail}`));
+      }
+    };
+    socket.onerror = () => rejectFinal(new Error('Prediction stream failed'));
+
+    return {
+      sendPCM(float32Chunk) {
+        const buf = float32Chunk.slice().buffer;
+        if (socket.readyState === WebSocket.OPEN) socket.send(buf);
+        else pending.push(buf);
+      },
+      finish() {
+        if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: 'stop' }));
+        else socket.addEventListener('open', () => socket.send(JSON.stringify({ type: 'stop' })));
+        return finalResult;
+      }
+    };
+  }
+
   /**
    * Get mock prediction for demo/testing
    */
@@ -9,6 +9,10 @@ class AudioRecorder {
     this.recordingStartTime = null;
     this.recordingDuration = 0;
     this.stream = null;
+    // Optional raw PCM tap for streaming prediction: onPCM(Float32Array, sampleRate)
+    this.onPCM = null;
+    this.pcmContext = null;
+    this.pcmProcessor = null;
     this.recordingHistory = this.loadRecordingHistory();
     console.log('✅ AudioRecorder initialized');
   }
@@ -57,6 +61,7 @@ class AudioRecorder {
     };
 
     this.mediaRecorder.start();
+    this.startPCMTap();
     this.isRecording = true;
     this.recordingStartTime = Date.now();
     
@@ -71,10 +76,37 @@ class AudioRecorder {
     return true;
   }
 
+  // Forward raw PCM chunks to onPCM while recording (used for streaming)
+  startPCMTap() {
+    if (!this.onPCM) return;
+    this.pcmContext = new (window.AudioContext || window.webkitAudioContext)();
+    const source = this.pcmContext.createMediaStreamSource(this.stream);
+    this.pcmProcessor = this.pcmContext.createScriptProcessor(4096, 1, 1);
+    this.pcmProcessor.onaudioprocess = (event) => {
+      if (this.isRecording && this.onPCM) {
+        this.onPCM(event.inputBuffer.getChannelData(0), this.pcmContext.sampleRate);
+      }
+    };
+    source.connect(this.pcmProcessor);
+    this.pcmProcessor.connect(this.pcmContext.destination);
+  }
+
+  stopPCMTap() {
+    if (this.pcmProcessor) {
+      this.pcmProcessor.disconnect();
+      this.pcmProcessor = null;
+    }
+    if (this.pcmContext) {
+      this.pcmContext.close();
+      this.pcmContext = null;
+    }
+  }
+
   // Stop recording
   stopRecording() {
     if (this.mediaRecorder && this.isRecording) {
       this.mediaRecorder.stop();
+      this.stopPCMTap();
       this.isRecording = false;
       this.recordingDuration = Math.round((Date.now() - this.recordingStartTime) / 1000);
       console.log(`✅ Recording stopped after ${this.recordingDuration}s`);
@@ -292,6 +292,17 @@ class UIManager {
         return;
       }
       
+      // Opt-in streaming: send PCM to /predict/stream/ while the user speaks
+      this.predictionStream = null;
+      this.recorder.onPCM = window.STREAMING_PREDICT ? (chunk, sampleRate) => {
+        if (!this.predictionStream) {
+          this.predictionStream = this.api.openPredictionStream(sampleRate, (interim) => {
+            statusText.textContent = `Recording... (${interim.language}, ${(interim.confidence * 100).toFixed(0)}%)`;
+          });
+        }
+        this.predictionStream.sendPCM(chunk);
+      } : null;
+
       const started = await this.recorder.startRecording();
       if (started) {
         console.log('✅ Recording started');
@@ -316,6 +327,20 @@ class UIManager {
       recordingInfo.classList.add('hidden');
       
       console.log('⏳ Processing audio, waiting for backend response...');
+
+      if (this.predictionStream) {
+        try {
+          const startTime = Date.now();
+          this.currentPrediction = await this.predictionStream.finish();
+          this.currentPrediction.processingTime = Date.now() - startTime;
+          this.predictionStream = null;
+          this.displayResults();
+          return;
+        } catch (streamErr) {
+          console.warn('Streaming prediction failed, falling back to upload', streamErr);
+          this.predictionStream = null;
+        }
+      }
       
       // Add delay to ensure mediaRecorder finishes writing chunks
       await new Promise(resolve => setTimeout(resolve, 200));